@@ -0,0 +1,62 @@
+"""
+Условные запросы (ETag / If-None-Match) для чтения профилей
+
+ETag строится из id профиля и его content_version, который растет при
+каждом изменении содержимого. Версию можно прочитать без загрузки
+JSON-данных профиля, поэтому ответ 304 не требует чтения и
+сериализации профиля. Представления, зависящие не только от содержимого
+(например, от текущей даты), передают дополнительные части ETag.
+"""
+
+from typing import Dict, Any, Optional, Tuple
+
+from fastapi import Response
+from sqlalchemy.orm import Session
+
+from database.models import EmailProfile
+
+
+def profile_version(db: Session, email: str) -> Optional[Tuple[int, int]]:
+    """(id, content_version) профиля или None, если профиля нет"""
+    row = db.query(EmailProfile.id, EmailProfile.content_version).filter(
+        EmailProfile.email == email
+    ).first()
+    if row is None:
+        return None
+    return row.id, row.content_version or 1
+
+
+def make_etag(kind: str, version: Tuple[int, int], *parts: Any) -> str:
+    """ETag представления профиля (разные эндпоинты - разные представления)"""
+    profile_id, content_version = version
+    suffix = ''.join(f'-{part}' for part in parts)
+    return f'"{kind}-{profile_id}-{content_version}{suffix}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадает ли заголовок If-None-Match с текущим ETag (слабое сравнение)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    """Заголовки кэширования для ответа с ETag"""
+    return {
+        'ETag': etag,
+        # Клиент может хранить ответ, но обязан проверять его актуальность
+        'Cache-Control': 'private, no-cache'
+    }
+
+
+def not_modified(etag: str) -> Response:
+    """Ответ 304 Not Modified"""
+    return Response(status_code=304, headers=etag_headers(etag))
@@ -0,0 +1,226 @@
+"""
+Свежесть разделов профиля
+
+Каждый раздел профиля (общие данные, академические данные, PDF,
+цифровой двойник) собирается отдельно, поэтому время обновления
+хранится по разделам в profile.data['_freshness'] и сравнивается с TTL
+раздела из настроек. Для профилей, сохраненных до появления метаданных,
+используются имеющиеся отметки времени разделов.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional
+
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from database.models import EmailProfile
+
+logger = logging.getLogger(__name__)
+
+FRESHNESS_KEY = '_freshness'
+VOLATILITY_KEY = '_volatility'
+
+# Сглаживание оценки изменчивости раздела и оценка для новых разделов
+VOLATILITY_ALPHA = 0.3
+DEFAULT_VOLATILITY = 0.5
+
+# Отметки времени не считаются изменением содержимого
+_TIMESTAMP_KEYS = ('last_updated', 'timestamp')
+
+SECTIONS = ('general', 'academic', 'pdf', 'twin')
+
+# Ключ данных, по которому определяется наличие раздела в профиле
+SECTION_MARKERS = {
+    'general': 'sources',
+    'academic': 'academic_profile',
+    'pdf': 'pdf_documents',
+    'twin': 'digital_twin'
+}
+
+
+def section_ttl(section: str) -> timedelta:
+    """TTL раздела профиля"""
+    hours = {
+        'general': settings.PROFILE_TTL_GENERAL_HOURS,
+        'academic': settings.PROFILE_TTL_ACADEMIC_HOURS,
+        'pdf': settings.PROFILE_TTL_PDF_HOURS,
+        'twin': settings.PROFILE_TTL_TWIN_HOURS
+    }[section]
+    return timedelta(hours=hours)
+
+
+def mark_fresh(data: Dict[str, Any], *sections: str,
+               timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+    """Отметка разделов как обновленных (изменяет и возвращает data)"""
+    stamp = (timestamp or datetime.utcnow()).isoformat()
+    freshness = dict(data.get(FRESHNESS_KEY) or {})
+    for section in sections:
+        freshness[section] = stamp
+    data[FRESHNESS_KEY] = freshness
+    return data
+
+
+def _strip_timestamps(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: _strip_timestamps(item) for key, item in value.items()
+            if not (key == FRESHNESS_KEY or key == VOLATILITY_KEY or key.endswith(_TIMESTAMP_KEYS))
+        }
+    if isinstance(value, list):
+        return [_strip_timestamps(item) for item in value]
+    return value
+
+
+def content_changed(old_data: Dict[str, Any], updates: Dict[str, Any]) -> bool:
+    """Изменилось ли содержимое раздела при обновлении (без учета отметок времени)"""
+    return any(
+        _strip_timestamps(old_data.get(key)) != _strip_timestamps(value)
+        for key, value in updates.items()
+    )
+
+
+def record_volatility(data: Dict[str, Any], changed: bool, *sections: str) -> Dict[str, Any]:
+    """Обновление оценки изменчивости разделов (EWMA доли обновлений с изменениями)"""
+    volatility = dict(data.get(VOLATILITY_KEY) or {})
+    for section in sections:
+        previous = volatility.get(section, DEFAULT_VOLATILITY)
+        volatility[section] = round(
+            (1 - VOLATILITY_ALPHA) * previous + VOLATILITY_ALPHA * (1.0 if changed else 0.0), 4
+        )
+    data[VOLATILITY_KEY] = volatility
+    return data
+
+
+def section_volatility(data: Dict[str, Any], section: str) -> float:
+    """Оценка изменчивости раздела от 0 (не меняется) до 1 (меняется при каждом обновлении)"""
+    return (data.get(VOLATILITY_KEY) or {}).get(section, DEFAULT_VOLATILITY)
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    # Все сравнения ведутся в наивном UTC
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def section_updated_at(profile: EmailProfile, section: str) -> Optional[datetime]:
+    """Время последнего обновления раздела"""
+    data = profile.data if isinstance(profile.data, dict) else {}
+
+    stamp = _parse_timestamp((data.get(FRESHNESS_KEY) or {}).get(section))
+    if stamp:
+        return stamp
+
+    # Профили без метаданных свежести
+    if section == 'academic':
+        stamp = _parse_timestamp(data.get('academic_collection_timestamp'))
+    elif section == 'twin':
+        stamp = _parse_timestamp((data.get('digital_twin') or {}).get('creation_timestamp'))
+    return stamp or _parse_timestamp(profile.updated_at or profile.created_at)
+
+
+def section_freshness(profile: EmailProfile, section: str,
+                      now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Состояние свежести одного раздела"""
+    data = profile.data if isinstance(profile.data, dict) else {}
+    now = now or datetime.utcnow()
+    ttl = section_ttl(section)
+
+    if not data.get(SECTION_MARKERS[section]):
+        return {'present': False, 'updated_at': None, 'age_seconds': None,
+                'ttl_seconds': ttl.total_seconds(), 'stale': False}
+
+    updated_at = section_updated_at(profile, section)
+    age = (now - updated_at).total_seconds() if updated_at else None
+    stale = age is None or age > ttl.total_seconds()
+
+    # Двойник строится из академических данных и устаревает вместе с ними
+    if section == 'twin' and not stale and data.get('academic_profile'):
+        academic_at = section_updated_at(profile, 'academic')
+        stale = bool(academic_at and updated_at and academic_at > updated_at)
+
+    return {
+        'present': True,
+        'updated_at': updated_at.isoformat() if updated_at else None,
+        'age_seconds': round(age, 1) if age is not None else None,
+        'ttl_seconds': ttl.total_seconds(),
+        'stale': stale
+    }
+
+
+def profile_freshness(profile: EmailProfile) -> Dict[str, Dict[str, Any]]:
+    """Состояние свежести всех разделов профиля"""
+    now = datetime.utcnow()
+    return {section: section_freshness(profile, section, now) for section in SECTIONS}
+
+
+def stale_sections(profile: EmailProfile, sections=SECTIONS) -> List[str]:
+    """Присутствующие в профиле разделы с истекшим TTL"""
+    now = datetime.utcnow()
+    result = []
+    for section in sections:
+        state = section_freshness(profile, section, now)
+        if state['present'] and state['stale']:
+            result.append(section)
+    return result
+
+
+def freshness_index(db: Session, batch_size: int = 500) -> Dict[str, Any]:
+    """Сводка по кэшу профилей: доля разделов с истекшим TTL"""
+    now = datetime.utcnow()
+    summary = {
+        section: {
+            'present': 0,
+            'stale': 0,
+            'stale_ratio': 0.0,
+            'ttl_hours': section_ttl(section).total_seconds() / 3600,
+            'max_age_hours': 0.0
+        }
+        for section in SECTIONS
+    }
+    total_profiles = 0
+    profiles_with_stale = 0
+
+    # Только нужные колонки: строки не попадают в identity map сессии
+    query = db.query(
+        EmailProfile.data, EmailProfile.updated_at, EmailProfile.created_at
+    ).yield_per(batch_size)
+    for profile in query:
+        total_profiles += 1
+        has_stale = False
+        for section in SECTIONS:
+            state = section_freshness(profile, section, now)
+            if not state['present']:
+                continue
+            stats = summary[section]
+            stats['present'] += 1
+            if state['stale']:
+                stats['stale'] += 1
+                has_stale = True
+            if state['age_seconds'] is not None:
+                stats['max_age_hours'] = max(stats['max_age_hours'], state['age_seconds'] / 3600)
+        if has_stale:
+            profiles_with_stale += 1
+
+    for stats in summary.values():
+        if stats['present']:
+            stats['stale_ratio'] = round(stats['stale'] / stats['present'], 4)
+        stats['max_age_hours'] = round(stats['max_age_hours'], 1)
+
+    return {
+        'total_profiles': total_profiles,
+        'profiles_with_stale_sections': profiles_with_stale,
+        'sections': summary,
+        'generated_at': now.isoformat()
+    }
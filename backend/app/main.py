@@ -1,24 +1,45 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, BackgroundTasks, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime
+from contextlib import nullcontext
+import asyncio
 import logging
 from dataclasses import asdict
 
 from database.connection import get_db
-from database.models import EmailProfile, SearchHistory
-from modules.data_collector import DataCollector
+from database.models import EmailProfile, SearchHistory, public_profile_data
+from database.write_buffer import write_buffer
 from modules.file_processor import FileProcessor
-from modules.academic_intelligence import AcademicIntelligenceCollector
-from modules.digital_twin import DigitalTwinCreator
 from modules.automated_intelligence_system import AutomatedIntelligenceSystem
+from app.middleware import RequestTimingMiddleware, CompressionMiddleware, latency_tracker
+from app.single_flight import single_flight
+from app.freshness import freshness_index, profile_freshness, stale_sections
+from app.refresh import collect_general, collect_academic, collect_twin, twin_changed_analyzers, queue_refresh, update_profile_data
+from app.scheduler import refresh_scheduler
+from app.twin_batch import twin_batch_builder
+from modules.network_graph import network_graph_store
+from modules.entity_index import entity_index, ENTITY_KINDS
+from modules.fulltext_index import fulltext_index, DOCUMENT_KINDS
+from modules.http_cache import http_cache
+from modules.nlp_loader import nlp_loader
+from modules.nlp_pipeline import nlp_pipeline
+from app.etag import profile_version, make_etag, etag_matches, etag_headers, not_modified
+from app.responses import FastJSONResponse, fast_response
+from app.projection import (
+    PAGINATED_FIELDS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+    parse_fields, load_profile, paginate, paginate_profile, load_collection, decode_cursor
+)
+from modules.metrics import render_metrics, METRICS_CONTENT_TYPE
+from modules.tracing import start_trace, Trace
 from app.schemas import (
     EmailRequest, 
     EmailResponse, 
     BulkSearchResponse, 
     ProfileResponse,
+    CollectionPageResponse,
     StatsResponse
 )
 from config.settings import settings
@@ -30,7 +51,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Email Intelligence Collector API",
     description="API для сбора и анализа информации по email-адресам",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -42,6 +64,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сжатие крупных ответов (профили с результатами поиска и NLP-анализом)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Хронометраж запросов: гистограммы по эндпоинтам и записи ApiUsage
+app.add_middleware(RequestTimingMiddleware)
+
+@app.on_event("startup")
+async def startup_event():
+    write_buffer.start()
+    if settings.REFRESH_SCHEDULER_ENABLED:
+        refresh_scheduler.start()
+    if settings.NLP_WARM_UP_ON_STARTUP:
+        # Модели загружаются в фоне: воркер сразу принимает запросы, первый NLP-анализ дождется загрузки
+        asyncio.get_running_loop().run_in_executor(None, nlp_loader.warm_up)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await refresh_scheduler.stop()
+    twin_batch_builder.stop()
+    nlp_pipeline.shutdown()
+    # Финальная запись окна задержек, истории и статистики API
+    latency_tracker.flush()
+    write_buffer.stop()
+    fulltext_index.process_pending()
+
+def _trace_context(name: str, email: str, include_trace: bool):
+    """Трасса анализа, если она запрошена клиентом или включен экспорт"""
+    if include_trace or settings.TRACE_EXPORT_ENABLED:
+        return start_trace(name, email=email)
+    return nullcontext()
+
+def _finish_trace(trace: Optional[Trace], include_trace: bool) -> Optional[Dict[str, Any]]:
+    """Экспорт трассы в файл и дерево спанов для ответа"""
+    if trace is None:
+        return None
+    
+    trace_file = trace.save() if settings.TRACE_EXPORT_ENABLED else None
+    if not include_trace:
+        return None
+    
+    tree = trace.to_tree()
+    if trace_file:
+        tree['file'] = trace_file
+    return tree
+
 @app.get("/")
 async def root():
     return {"message": "Email Intelligence Collector API", "version": "1.0.0"}
@@ -67,43 +135,58 @@ async def search_email(
             ).first()
             
             if existing_profile:
-                logger.info(f"Found cached profile for {email}")
+                # Устаревшие данные отдаем сразу, обновление идет в фоне
+                stale = stale_sections(existing_profile, ('general', 'pdf'))
+                if stale:
+                    logger.info(f"Found stale profile for {email} ({', '.join(stale)}), refreshing in background")
+                    queue_refresh(background_tasks, email, *stale)
+                else:
+                    logger.info(f"Found cached profile for {email}")
+                
+                # Обращения к кэшу учитываются планировщиком обновления
+                write_buffer.add_search_history(
+                    email=email,
+                    search_type="single",
+                    results_found=existing_profile.source_count or 0
+                )
                 # Возвращаем данные из кэша, а не весь профиль
-                return EmailResponse(
+                return fast_response(
+                    EmailResponse,
                     status="success",
-                    source="cache",
-                    data=existing_profile.data  # Используем data напрямую
+                    source="stale" if stale else "cache",
+                    data=public_profile_data(existing_profile.data),
+                    stale_sections=stale or None
                 )
         
-        # Запускаем сбор данных в фоне
-        collector = DataCollector(email)
-        profile_data = await collector.collect_all()
-        
-        # Сохраняем в базу данных
-        profile = EmailProfile(
-            email=email,
-            data=profile_data,
-            source_count=len(profile_data.get('sources', []))
-        )
-        
-        db.merge(profile)
-        db.commit()
+        def load_saved():
+            # Профиль, сохраненный другим воркером, пока этот ждал блокировку
+            db.expire_all()
+            profile = db.query(EmailProfile).filter(EmailProfile.email == email).first()
+            return public_profile_data(profile.data) if profile else None
+        
+        # Одновременные запросы по тому же email ждут результат первого
+        with _trace_context('search', email, request.include_trace) as trace:
+            profile_data, shared = await single_flight.do(
+                f"search:{email}",
+                lambda: collect_general(db, email),
+                None if request.force_refresh else load_saved
+            )
         
         # Записываем историю поиска
-        search_history = SearchHistory(
+        write_buffer.add_search_history(
             email=email,
             search_type="single",
             results_found=len(profile_data.get('sources', []))
         )
-        db.add(search_history)
-        db.commit()
         
         logger.info(f"Successfully collected data for {email}")
         
-        return EmailResponse(
+        return fast_response(
+            EmailResponse,
             status="success",
-            source="fresh",
-            data=profile_data
+            source="shared" if shared else "fresh",
+            data=profile_data,
+            trace=_finish_trace(trace, request.include_trace)
         )
         
     except Exception as e:
@@ -125,13 +208,11 @@ async def bulk_search(
         results = await processor.process_file(file)
         
         # Записываем историю поиска
-        search_history = SearchHistory(
+        write_buffer.add_search_history(
             email="bulk_search",
             search_type="bulk",
             results_found=results['processed']
         )
-        db.add(search_history)
-        db.commit()
         
         logger.info(f"Bulk search completed: {results['processed']} emails processed")
         
@@ -142,19 +223,39 @@ async def bulk_search(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/profile/{email}", response_model=ProfileResponse)
-async def get_profile(email: str, db: Session = Depends(get_db)):
-    """Получение профиля по email"""
+async def get_profile(
+    email: str,
+    fields: Optional[str] = Query(None, description="Ключи data через запятую, например person_info,social_profiles"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Размер первой страницы списочных разделов"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Получение профиля по email (с проекцией полей и первыми страницами списков)"""
     try:
-        profile = db.query(EmailProfile).filter(
-            EmailProfile.email == email.lower().strip()
-        ).first()
+        email = email.lower().strip()
+        keys = parse_fields(fields)
+        version = profile_version(db, email)
+        if version is None:
+            raise HTTPException(404, "Профиль не найден")
+        
+        etag = make_etag("profile", version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
+        # Из базы читаются только запрошенные ключи data
+        profile = load_profile(db, email, keys)
         
         if not profile:
             raise HTTPException(404, "Профиль не найден")
         
-        return ProfileResponse(
+        pagination = paginate_profile(profile, limit) if limit else None
+        
+        return fast_response(
+            ProfileResponse,
+            headers=etag_headers(etag),
             status="success",
-            data=profile.to_dict()
+            data=profile,
+            pagination=pagination
         )
         
     except HTTPException:
@@ -163,10 +264,60 @@ async def get_profile(email: str, db: Session = Depends(get_db)):
         logger.error(f"Error getting profile for {email}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/profile/{email}/{field}", response_model=CollectionPageResponse)
+async def get_profile_collection(
+    email: str,
+    field: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Постраничная выдача списочного раздела профиля (search_results, websites, pdf_documents)"""
+    try:
+        if field not in PAGINATED_FIELDS:
+            raise HTTPException(404, f"Раздел не поддерживает постраничную выдачу: {field}")
+        
+        email = email.lower().strip()
+        version = profile_version(db, email)
+        if version is None:
+            raise HTTPException(404, "Профиль не найден")
+        
+        etag = make_etag(field, version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
+        offset = decode_cursor(cursor, field, version[1]) if cursor else 0
+        collection = load_collection(db, email, field)
+        if collection is None:
+            raise HTTPException(404, "Профиль не найден")
+        
+        content_version, items = collection
+        page, page_info = paginate(items, field, content_version, limit, offset)
+        
+        return fast_response(
+            CollectionPageResponse,
+            headers=etag_headers(etag),
+            status="success",
+            email=email,
+            field=field,
+            items=page,
+            **page_info
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting {field} for {email}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/stats", response_model=StatsResponse)
 async def get_stats(db: Session = Depends(get_db)):
     """Получение статистики системы"""
     try:
+        # Дописываем накопленную историю, чтобы статистика была актуальной
+        await write_buffer.flush_async()
+        
         total_profiles = db.query(EmailProfile).count()
         total_searches = db.query(SearchHistory).count()
         recent_searches = db.query(SearchHistory).order_by(
@@ -224,13 +375,272 @@ async def get_stats(db: Session = Depends(get_db)):
             total_searches=total_searches,
             search_engine_results=search_engine_results,
             search_engine_stats=search_engine_stats,
-            recent_searches=[search.to_dict() for search in recent_searches]
+            recent_searches=[search.to_dict() for search in recent_searches],
+            endpoint_latency=latency_tracker.get_stats()
         )
         
     except Exception as e:
         logger.error(f"Error getting stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/stats/latency")
+async def get_latency_stats():
+    """Перцентили времени ответа (p50/p95/p99) по эндпоинтам"""
+    return {
+        "status": "success",
+        "data": latency_tracker.get_stats(),
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/freshness")
+async def get_freshness_index(db: Session = Depends(get_db)):
+    """Сводка свежести кэша профилей: доля разделов с истекшим TTL"""
+    try:
+        return {
+            "status": "success",
+            "data": freshness_index(db)
+        }
+    except Exception as e:
+        logger.error(f"Error building freshness index: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/refresh-scheduler")
+async def get_refresh_scheduler(limit: int = 20, db: Session = Depends(get_db)):
+    """Состояние планировщика фонового обновления и ближайшие кандидаты"""
+    try:
+        await write_buffer.flush_async()
+        return {
+            "status": "success",
+            "stats": refresh_scheduler.get_stats(),
+            "plan": refresh_scheduler.plan(db, limit=limit)
+        }
+    except Exception as e:
+        logger.error(f"Error getting refresh scheduler state: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/refresh-scheduler/run")
+async def run_refresh_scheduler():
+    """Внеочередной проход планировщика фонового обновления"""
+    await write_buffer.flush_async()
+    result = await refresh_scheduler.run_cycle()
+    return {"status": "success", **result}
+
+@app.get("/api/twin-batch")
+async def get_twin_batch_status():
+    """Ход текущего или последнего пакетного перестроения цифровых двойников"""
+    return {"status": "success", "batch": twin_batch_builder.get_status()}
+
+@app.post("/api/twin-batch/run")
+async def run_twin_batch(resume: bool = False, reuse: bool = False, limit: Optional[int] = None):
+    """Запуск пакетного перестроения цифровых двойников в фоне"""
+    if not twin_batch_builder.start(resume=resume, reuse=reuse, limit=limit):
+        raise HTTPException(409, "Пакетное перестроение уже выполняется")
+    return {"status": "started", "batch": twin_batch_builder.get_status()}
+
+@app.post("/api/twin-batch/stop")
+async def stop_twin_batch():
+    """Остановка пакетного перестроения после текущего пакета"""
+    twin_batch_builder.stop()
+    return {"status": "stopping", "batch": twin_batch_builder.get_status()}
+
+@app.get("/api/network/stats")
+async def get_network_stats(db: Session = Depends(get_db)):
+    """Размер глобального графа связей и самые центральные узлы"""
+    try:
+        return {"status": "success", "network": network_graph_store.get_stats(db)}
+    except Exception as e:
+        logger.error(f"Error getting network stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/network/profile/{email}")
+async def get_network_profile(email: str, db: Session = Depends(get_db)):
+    """Метрики центральности владельца профиля в глобальном графе"""
+    try:
+        profile = db.query(EmailProfile).filter(EmailProfile.email == email.lower().strip()).first()
+        academic_profile = (profile.data or {}).get('academic_profile') if profile else None
+        metrics = network_graph_store.get_graph(db).profile_metrics(email, academic_profile)
+        if metrics is None:
+            raise HTTPException(404, "Профиль отсутствует в графе связей")
+        return {"status": "success", "email": email, "metrics": metrics}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting network metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/network/rebuild")
+async def rebuild_network(db: Session = Depends(get_db)):
+    """Полное построение графа связей по всем профилям (после обновления или миграции)"""
+    try:
+        await write_buffer.flush_async()
+        result = network_graph_store.rebuild(db)
+        return {"status": "success", **result}
+    except Exception as e:
+        logger.error(f"Error rebuilding network graph: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/entities/linked/{email}")
+async def get_linked_profiles(email: str, kinds: Optional[str] = None,
+                              limit: int = Query(100, ge=1, le=1000),
+                              db: Session = Depends(get_db)):
+    """Профили, разделяющие с email URL соцсети, телефон, имя пользователя или имя"""
+    try:
+        kind_list = [kind.strip() for kind in kinds.split(',') if kind.strip()] if kinds else None
+        if kind_list and any(kind not in ENTITY_KINDS for kind in kind_list):
+            raise HTTPException(400, f"Допустимые типы: {', '.join(ENTITY_KINDS)}")
+        email = email.lower().strip()
+        linked = entity_index.linked_profiles(db, email, kind_list, limit)
+        return {"status": "success", "email": email, "linked": linked, "total": len(linked)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting linked profiles: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/entities/lookup")
+async def lookup_entity(kind: str, value: str, db: Session = Depends(get_db)):
+    """Профили с заданным URL, телефоном, именем пользователя (platform:username) или именем"""
+    try:
+        if kind not in ENTITY_KINDS:
+            raise HTTPException(400, f"Допустимые типы: {', '.join(ENTITY_KINDS)}")
+        normalized, emails = entity_index.lookup(db, kind, value)
+        if normalized is None:
+            raise HTTPException(400, "Не удалось нормализовать значение")
+        return {"status": "success", "kind": kind, "value": normalized, "emails": emails}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error looking up entity: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/entities/stats")
+async def get_entity_stats(db: Session = Depends(get_db)):
+    """Размер индекса сущностей"""
+    try:
+        return {"status": "success", "index": entity_index.get_stats(db)}
+    except Exception as e:
+        logger.error(f"Error getting entity index stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/entities/rebuild")
+async def rebuild_entity_index(db: Session = Depends(get_db)):
+    """Построение индекса сущностей по существующим профилям"""
+    try:
+        result = entity_index.rebuild(db)
+        return {"status": "success", **result}
+    except Exception as e:
+        logger.error(f"Error rebuilding entity index: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/search-content")
+async def search_content(q: str = Query(..., min_length=1, max_length=500),
+                         email: Optional[str] = None,
+                         kinds: Optional[str] = None,
+                         limit: int = Query(20, ge=1, le=100),
+                         offset: int = Query(0, ge=0, le=10000)):
+    """Полнотекстовый поиск по сниппетам, заголовкам страниц и тексту PDF всех профилей"""
+    try:
+        kind_list = [kind.strip() for kind in kinds.split(',') if kind.strip()] if kinds else None
+        if kind_list and any(kind not in DOCUMENT_KINDS for kind in kind_list):
+            raise HTTPException(400, f"Допустимые типы: {', '.join(DOCUMENT_KINDS)}")
+        total, results = fulltext_index.search(
+            q, limit, offset, email.lower().strip() if email else None, kind_list
+        )
+        return {
+            "status": "success",
+            "query": q,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + len(results) if offset + len(results) < total else None,
+            "results": results
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching content: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/search-content/stats")
+async def get_search_content_stats():
+    """Размер полнотекстового индекса"""
+    try:
+        return {"status": "success", "index": fulltext_index.stats()}
+    except Exception as e:
+        logger.error(f"Error getting full-text index stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/search-content/rebuild")
+async def rebuild_search_content(db: Session = Depends(get_db)):
+    """Переиндексация содержимого всех профилей"""
+    try:
+        result = fulltext_index.rebuild(db)
+        return {"status": "success", **result}
+    except Exception as e:
+        logger.error(f"Error rebuilding full-text index: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/nlp/status")
+async def get_nlp_status():
+    """Состояние загрузки NLP-библиотек"""
+    return {"status": "success", "nlp": nlp_loader.status()}
+
+@app.post("/api/nlp/warm-up")
+async def warm_up_nlp():
+    """Загрузка NLP-библиотек и моделей заранее"""
+    try:
+        status = await asyncio.get_running_loop().run_in_executor(None, nlp_loader.warm_up)
+        return {"status": "success", "nlp": status}
+    except Exception as e:
+        logger.error(f"Error warming up NLP: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/http-cache/stats")
+async def get_http_cache_stats():
+    """Размер и попадания дискового HTTP-кэша страниц"""
+    try:
+        return {"status": "success", "cache": http_cache.get_stats()}
+    except Exception as e:
+        logger.error(f"Error getting HTTP cache stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/http-cache")
+async def clear_http_cache():
+    """Очистка дискового HTTP-кэша страниц"""
+    try:
+        return {"status": "success", "removed": http_cache.clear()}
+    except Exception as e:
+        logger.error(f"Error clearing HTTP cache: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/freshness/{email}")
+async def get_profile_freshness(email: str, db: Session = Depends(get_db)):
+    """Свежесть разделов профиля"""
+    try:
+        profile = db.query(EmailProfile).filter(
+            EmailProfile.email == email.lower().strip()
+        ).first()
+        
+        if not profile:
+            raise HTTPException(404, "Профиль не найден")
+        
+        return {
+            "status": "success",
+            "email": profile.email,
+            "sections": profile_freshness(profile)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting freshness for {email}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.delete("/api/profile/{email}")
 async def delete_profile(email: str, db: Session = Depends(get_db)):
     """Удаление профиля"""
@@ -271,75 +681,68 @@ async def academic_search(
             ).first()
             
             if existing_profile and existing_profile.data.get('academic_profile'):
-                logger.info(f"Found cached academic profile for {email}")
+                # Устаревшие данные отдаем сразу, обновление идет в фоне
+                stale = stale_sections(existing_profile, ('academic',))
+                if stale:
+                    logger.info(f"Found stale academic profile for {email}, refreshing in background")
+                    queue_refresh(background_tasks, email, *stale)
+                else:
+                    logger.info(f"Found cached academic profile for {email}")
+                
+                write_buffer.add_search_history(
+                    email=email,
+                    search_type="academic",
+                    results_found=len(existing_profile.data.get('academic_search_results', []))
+                )
                 return {
                     "status": "success",
-                    "source": "cache",
+                    "source": "stale" if stale else "cache",
                     "data": existing_profile.data.get('academic_profile'),
                     "search_results": existing_profile.data.get('academic_search_results', []),
                     "confidence_scores": existing_profile.data.get('academic_confidence_scores', {})
                 }
         
-        # Запускаем академический сбор данных
-        academic_collector = AcademicIntelligenceCollector()
-        academic_data = await academic_collector.collect_academic_profile(email)
-        
-        # Обновляем профиль в базе данных
-        existing_profile = db.query(EmailProfile).filter(
-            EmailProfile.email == email
-        ).first()
+        def load_saved():
+            # Академические данные, сохраненные другим воркером
+            db.expire_all()
+            profile = db.query(EmailProfile).filter(EmailProfile.email == email).first()
+            data = profile.data if profile and isinstance(profile.data, dict) else {}
+            if not data.get('academic_profile'):
+                return None
+            return {
+                'academic_profile': data['academic_profile'],
+                'search_results': data.get('academic_search_results', []),
+                'confidence_scores': data.get('academic_confidence_scores', {}),
+                'analysis_summary': data.get('academic_analysis_summary', {}),
+                'collection_timestamp': data.get('academic_collection_timestamp')
+            }
         
-        if existing_profile:
-            # Обновляем существующий профиль
-            if isinstance(existing_profile.data, dict):
-                existing_profile.data.update({
-                    'academic_profile': academic_data['academic_profile'],
-                    'academic_search_results': academic_data['search_results'],
-                    'academic_confidence_scores': academic_data['confidence_scores'],
-                    'academic_analysis_summary': academic_data['analysis_summary'],
-                    'academic_collection_timestamp': academic_data['collection_timestamp']
-                })
-            else:
-                existing_profile.data = {
-                    'academic_profile': academic_data['academic_profile'],
-                    'academic_search_results': academic_data['search_results'],
-                    'academic_confidence_scores': academic_data['confidence_scores'],
-                    'academic_analysis_summary': academic_data['analysis_summary'],
-                    'academic_collection_timestamp': academic_data['collection_timestamp']
-                }
-        else:
-            # Создаем новый профиль
-            existing_profile = EmailProfile(
-                email=email,
-                data={
-                    'academic_profile': academic_data['academic_profile'],
-                    'academic_search_results': academic_data['search_results'],
-                    'academic_confidence_scores': academic_data['confidence_scores'],
-                    'academic_analysis_summary': academic_data['analysis_summary'],
-                    'academic_collection_timestamp': academic_data['collection_timestamp']
-                },
-                source_count=len(academic_data['search_results'])
+        # Одновременные запросы по тому же email ждут результат первого
+        with _trace_context('academic_search', email, request.include_trace) as trace:
+            academic_data, shared = await single_flight.do(
+                f"academic:{email}",
+                lambda: collect_academic(db, email),
+                None if request.force_refresh else load_saved
             )
         
-        db.merge(existing_profile)
-        db.commit()
-        
         # Записываем историю поиска
-        search_history = SearchHistory(
+        write_buffer.add_search_history(
             email=email,
             search_type="academic",
             results_found=len(academic_data['search_results'])
         )
-        db.add(search_history)
-        db.commit()
         
         logger.info(f"Academic search completed for {email}")
         
-        return {
+        response = {
             "status": "success",
-            "source": "fresh",
+            "source": "shared" if shared else "fresh",
             "data": academic_data
         }
+        trace_tree = _finish_trace(trace, request.include_trace)
+        if trace_tree:
+            response["trace"] = trace_tree
+        return response
         
     except Exception as e:
         logger.error(f"Error in academic search for {request.email}: {str(e)}")
@@ -370,96 +773,46 @@ async def create_digital_twin(
         if not profile_data.get('academic_profile'):
             raise HTTPException(400, "Академические данные не найдены. Выполните академический поиск.")
         
-        # Проверяем кэш цифрового двойника
+        # Проверяем кэш цифрового двойника: он актуален, пока не изменились входные данные анализаторов
+        changed = []
         if not request.force_refresh and profile_data.get('digital_twin'):
-            logger.info(f"Found cached digital twin for {email}")
-            return {
-                "status": "success",
-                "source": "cache",
-                "data": profile_data['digital_twin']
-            }
-        
-        # Создаем цифрового двойника
-        twin_creator = DigitalTwinCreator()
-        
-        # Подготавливаем данные
-        academic_data = {
-            'academic_profile': profile_data.get('academic_profile', {}),
-            'confidence_scores': profile_data.get('academic_confidence_scores', {})
-        }
-        search_results = profile_data.get('academic_search_results', [])
-        
-        # Создаем цифрового двойника
-        digital_twin = twin_creator.create_digital_twin(email, academic_data, search_results)
-        
-        # Преобразуем в словарь для сохранения
-        twin_data = {
-            'email': digital_twin.email,
-            'name': digital_twin.name,
-            'primary_affiliation': digital_twin.primary_affiliation,
-            'academic_profile': digital_twin.academic_profile,
-            'personality_profile': {
-                'communication_style': digital_twin.personality_profile.communication_style,
-                'expertise_level': digital_twin.personality_profile.expertise_level,
-                'collaboration_tendency': digital_twin.personality_profile.collaboration_tendency,
-                'research_focus': digital_twin.personality_profile.research_focus,
-                'career_stage': digital_twin.personality_profile.career_stage,
-                'digital_presence': digital_twin.personality_profile.digital_presence
-            },
-            'network_analysis': {
-                'collaborators': digital_twin.network_analysis.collaborators,
-                'institutions': digital_twin.network_analysis.institutions,
-                'research_communities': digital_twin.network_analysis.research_communities,
-                'influence_score': digital_twin.network_analysis.influence_score,
-                'centrality_score': digital_twin.network_analysis.centrality_score,
-                'network_size': digital_twin.network_analysis.network_size
-            },
-            'career_trajectory': {
-                'career_milestones': digital_twin.career_trajectory.career_milestones,
-                'career_progression': digital_twin.career_trajectory.career_progression,
-                'experience_years': digital_twin.career_trajectory.experience_years,
-                'career_changes': digital_twin.career_trajectory.career_changes,
-                'specialization_evolution': digital_twin.career_trajectory.specialization_evolution
-            },
-            'impact_metrics': {
-                'citation_impact': digital_twin.impact_metrics.citation_impact,
-                'research_impact': digital_twin.impact_metrics.research_impact,
-                'teaching_impact': digital_twin.impact_metrics.teaching_impact,
-                'industry_impact': digital_twin.impact_metrics.industry_impact,
-                'social_impact': digital_twin.impact_metrics.social_impact,
-                'overall_impact_score': digital_twin.impact_metrics.overall_impact_score
-            },
-            'visualization_data': digital_twin.visualization_data,
-            'creation_timestamp': digital_twin.creation_timestamp,
-            'confidence_score': digital_twin.confidence_score,
-            'data_sources': digital_twin.data_sources,
-            'completeness_score': digital_twin.completeness_score
-        }
-        
-        # Обновляем профиль в базе данных
-        profile_data['digital_twin'] = twin_data
-        profile_data['digital_twin_summary'] = twin_creator.generate_twin_summary(digital_twin)
-        existing_profile.data = profile_data
+            changed = twin_changed_analyzers(email, profile_data)
+            if not changed:
+                logger.info(f"Found cached digital twin for {email}")
+                
+                write_buffer.add_search_history(
+                    email=email,
+                    search_type="digital_twin",
+                    results_found=1
+                )
+                return {
+                    "status": "success",
+                    "source": "cache",
+                    "data": profile_data['digital_twin']
+                }
+            logger.info(f"Academic data changed for {email}, recomputing: {', '.join(changed)}")
         
-        db.merge(existing_profile)
-        db.commit()
+        # Создаем цифрового двойника (force_refresh - пересчет всех анализаторов)
+        twin_result, _ = await single_flight.do(
+            f"twin:{email}",
+            lambda: collect_twin(db, email, reuse=not request.force_refresh)
+        )
+        twin_data = twin_result['digital_twin']
         
         # Записываем историю поиска
-        search_history = SearchHistory(
+        write_buffer.add_search_history(
             email=email,
             search_type="digital_twin",
             results_found=1
         )
-        db.add(search_history)
-        db.commit()
         
         logger.info(f"Digital twin created for {email}")
         
         return {
             "status": "success",
-            "source": "fresh",
+            "source": "incremental" if changed else "fresh",
             "data": twin_data,
-            "summary": twin_creator.generate_twin_summary(digital_twin)
+            "summary": twin_result['digital_twin_summary']
         }
         
     except HTTPException:
@@ -503,12 +856,20 @@ async def get_academic_profile(email: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/digital-twin/{email}")
-async def get_digital_twin(email: str, db: Session = Depends(get_db)):
+async def get_digital_twin(email: str, if_none_match: Optional[str] = Header(None),
+                           db: Session = Depends(get_db)):
     """Получение цифрового двойника по email"""
     try:
-        profile = db.query(EmailProfile).filter(
-            EmailProfile.email == email.lower().strip()
-        ).first()
+        email = email.lower().strip()
+        version = profile_version(db, email)
+        if version is None:
+            raise HTTPException(404, "Профиль не найден")
+        
+        etag = make_etag("twin", version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
+        profile = db.query(EmailProfile).filter(EmailProfile.email == email).first()
         
         if not profile:
             raise HTTPException(404, "Профиль не найден")
@@ -519,11 +880,12 @@ async def get_digital_twin(email: str, db: Session = Depends(get_db)):
         if not digital_twin:
             raise HTTPException(404, "Цифровой двойник не найден")
         
-        return {
-            "status": "success",
-            "data": digital_twin,
-            "summary": profile_data.get('digital_twin_summary', {})
-        }
+        return fast_response(
+            headers=etag_headers(etag),
+            status="success",
+            data=digital_twin,
+            summary=profile_data.get('digital_twin_summary', {})
+        )
         
     except HTTPException:
         raise
@@ -532,12 +894,23 @@ async def get_digital_twin(email: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/digital-twin-aggregate/{email}")
-async def get_digital_twin_aggregate(email: str, db: Session = Depends(get_db)):
+async def get_digital_twin_aggregate(email: str, if_none_match: Optional[str] = Header(None),
+                                     db: Session = Depends(get_db)):
     """Автоматическое формирование цифрового двойника из всех собранных данных"""
     try:
-        profile = db.query(EmailProfile).filter(
-            EmailProfile.email == email.lower().strip()
-        ).first()
+        email = email.lower().strip()
+        version = profile_version(db, email)
+        if version is None:
+            raise HTTPException(404, "Профиль не найден")
+        
+        # Возраст данных меняет ответ и без изменения профиля, поэтому входит в ETag
+        updated_at = db.query(EmailProfile.updated_at).filter(EmailProfile.email == email).scalar()
+        data_age_days = (datetime.utcnow() - updated_at).days if updated_at else None
+        etag = make_etag("aggregate", version, data_age_days)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
+        profile = db.query(EmailProfile).filter(EmailProfile.email == email).first()
         
         if not profile:
             raise HTTPException(404, "Профиль не найден")
@@ -579,7 +952,7 @@ async def get_digital_twin_aggregate(email: str, db: Session = Depends(get_db)):
             "timeline": {
                 "first_seen": profile.created_at.isoformat() if profile.created_at else None,
                 "last_updated": profile.updated_at.isoformat() if profile.updated_at else None,
-                "data_age_days": (datetime.utcnow() - profile.updated_at).days if profile.updated_at else None
+                "data_age_days": data_age_days
             },
             "analysis": {
                 "completeness_score": 0,
@@ -615,11 +988,11 @@ async def get_digital_twin_aggregate(email: str, db: Session = Depends(get_db)):
             recommendations.append("Низкий уровень достоверности - требуется верификация данных")
         aggregated_twin["analysis"]["recommendations"] = recommendations
         
-        return {
-            "status": "success",
-            "data": aggregated_twin,
-            "generated_at": datetime.utcnow().isoformat()
-        }
+        return fast_response(
+            headers=etag_headers(etag),
+            status="success",
+            data=aggregated_twin
+        )
         
     except HTTPException:
         raise
@@ -645,14 +1018,21 @@ async def pdf_analysis(
             ).first()
             
             if existing_profile and existing_profile.data.get('pdf_documents'):
-                logger.info(f"Found cached PDF analysis for {email}")
+                # Устаревшие данные отдаем сразу, обновление идет в фоне
+                stale = stale_sections(existing_profile, ('pdf',))
+                if stale:
+                    logger.info(f"Found stale PDF analysis for {email}, refreshing in background")
+                    queue_refresh(background_tasks, email, *stale)
+                else:
+                    logger.info(f"Found cached PDF analysis for {email}")
                 return {
                     "status": "success",
-                    "source": "cache",
+                    "source": "stale" if stale else "cache",
                     "data": {
                         "pdf_documents": existing_profile.data.get('pdf_documents'),
                         "pdf_summary": existing_profile.data.get('pdf_summary', {})
-                    }
+                    },
+                    "stale_sections": stale or None
                 }
         
         # Запуск PDF анализа
@@ -686,48 +1066,23 @@ async def pdf_analysis(
             "total_institutions": sum([len(p.get('institutions', [])) for p in pdf_results]),
         }
         
-        # Сохраняем результаты в базу данных
+        # Сохраняем результаты в базу данных с отметкой свежести раздела
         existing_profile = db.query(EmailProfile).filter(
             EmailProfile.email == email
         ).first()
-        
-        if existing_profile:
-            # Обновляем существующий профиль
-            if isinstance(existing_profile.data, dict):
-                existing_profile.data.update({
-                    'pdf_documents': pdf_results,
-                    'pdf_summary': pdf_summary,
-                    'pdf_analysis_timestamp': datetime.now().isoformat()
-                })
-            else:
-                existing_profile.data = {
-                    'pdf_documents': pdf_results,
-                    'pdf_summary': pdf_summary,
-                    'pdf_analysis_timestamp': datetime.now().isoformat()
-                }
-        else:
-            # Создаем новый профиль
-            existing_profile = EmailProfile(
-                email=email,
-                data={
-                    'pdf_documents': pdf_results,
-                    'pdf_summary': pdf_summary,
-                    'pdf_analysis_timestamp': datetime.now().isoformat()
-                },
-                source_count=len(pdf_results)
-            )
-        
-        db.merge(existing_profile)
-        db.commit()
+        columns = {} if existing_profile else {'source_count': len(pdf_results)}
+        update_profile_data(db, email, {
+            'pdf_documents': pdf_results,
+            'pdf_summary': pdf_summary,
+            'pdf_analysis_timestamp': datetime.now().isoformat()
+        }, 'pdf', **columns)
         
         # Записываем историю поиска
-        search_history = SearchHistory(
+        write_buffer.add_search_history(
             email=email,
             search_type="pdf_analysis",
             results_found=len(pdf_results)
         )
-        db.add(search_history)
-        db.commit()
         
         logger.info(f"PDF analysis completed for {email}")
         
@@ -738,6 +1093,7 @@ async def pdf_analysis(
                 "pdf_documents": pdf_results,
                 "pdf_summary": pdf_summary
             },
+            "stale_sections": None,
             "processing_info": {
                 "documents_analyzed": len(pdf_results),
                 "timestamp": datetime.now().isoformat()
@@ -783,65 +1139,84 @@ async def comprehensive_analysis(
             'request_delay': 1.0
         }
         
-        # Запуск комплексного анализа
-        system = AutomatedIntelligenceSystem(config)
-        analysis_results = await system.analyze_email(email)
+        async def analyze_and_save():
+            # Запуск комплексного анализа
+            system = AutomatedIntelligenceSystem(config)
+            analysis_results = await system.analyze_email(email)
         
-        # Сохраняем результаты в базу данных
-        existing_profile = db.query(EmailProfile).filter(
-            EmailProfile.email == email
-        ).first()
+            # Сохраняем результаты в базу данных
+            existing_profile = db.query(EmailProfile).filter(
+                EmailProfile.email == email
+            ).first()
         
-        analysis_data = asdict(analysis_results)
+            analysis_data = asdict(analysis_results)
         
-        if existing_profile:
-            # Обновляем существующий профиль
-            if isinstance(existing_profile.data, dict):
-                existing_profile.data.update({
-                    'comprehensive_analysis': analysis_data,
-                    'comprehensive_timestamp': datetime.now().isoformat()
-                })
+            if existing_profile:
+                # Обновляем существующий профиль
+                if isinstance(existing_profile.data, dict):
+                    existing_profile.data.update({
+                        'comprehensive_analysis': analysis_data,
+                        'comprehensive_timestamp': datetime.now().isoformat()
+                    })
+                else:
+                    existing_profile.data = {
+                        'comprehensive_analysis': analysis_data,
+                        'comprehensive_timestamp': datetime.now().isoformat()
+                    }
+                existing_profile.confidence_score = analysis_results.overall_confidence_score
+                existing_profile.source_count = len(analysis_results.verification_sources)
             else:
-                existing_profile.data = {
-                    'comprehensive_analysis': analysis_data,
-                    'comprehensive_timestamp': datetime.now().isoformat()
-                }
-            existing_profile.confidence_score = analysis_results.overall_confidence_score
-            existing_profile.source_count = len(analysis_results.verification_sources)
-        else:
-            # Создаем новый профиль
-            existing_profile = EmailProfile(
-                email=email,
-                data={
-                    'comprehensive_analysis': analysis_data,
-                    'comprehensive_timestamp': datetime.now().isoformat()
-                },
-                source_count=len(analysis_results.verification_sources),
-                confidence_score=analysis_results.overall_confidence_score
-            )
+                # Создаем новый профиль
+                existing_profile = EmailProfile(
+                    email=email,
+                    data={
+                        'comprehensive_analysis': analysis_data,
+                        'comprehensive_timestamp': datetime.now().isoformat()
+                    },
+                    source_count=len(analysis_results.verification_sources),
+                    confidence_score=analysis_results.overall_confidence_score
+                )
         
-        db.merge(existing_profile)
-        db.commit()
+            db.merge(existing_profile)
+            db.commit()
+            return analysis_data
+        
+        def load_saved():
+            # Анализ, сохраненный другим воркером
+            db.expire_all()
+            profile = db.query(EmailProfile).filter(EmailProfile.email == email).first()
+            data = profile.data if profile and isinstance(profile.data, dict) else {}
+            return data.get('comprehensive_analysis')
+        
+        # Одновременные запросы по тому же email ждут результат первого
+        with _trace_context('comprehensive_analysis', email, request.include_trace) as trace:
+            analysis_data, shared = await single_flight.do(
+                f"comprehensive:{email}",
+                analyze_and_save,
+                None if request.force_refresh else load_saved
+            )
         
         # Записываем историю поиска
-        search_history = SearchHistory(
+        write_buffer.add_search_history(
             email=email,
             search_type="comprehensive",
-            results_found=len(analysis_results.verification_sources)
+            results_found=len(analysis_data.get('verification_sources', []))
         )
-        db.add(search_history)
-        db.commit()
         
         logger.info(f"Comprehensive analysis completed for {email}")
         
-        return {
+        response = {
             "status": "success",
-            "source": "fresh",
+            "source": "shared" if shared else "fresh",
             "data": analysis_data,
-            "processing_time": analysis_results.processing_time,
-            "confidence_score": analysis_results.overall_confidence_score,
-            "completeness_score": analysis_results.data_completeness_score
+            "processing_time": analysis_data.get('processing_time'),
+            "confidence_score": analysis_data.get('overall_confidence_score'),
+            "completeness_score": analysis_data.get('data_completeness_score')
         }
+        trace_tree = _finish_trace(trace, request.include_trace)
+        if trace_tree:
+            response["trace"] = trace_tree
+        return response
         
     except Exception as e:
         logger.error(f"Error in comprehensive analysis for {request.email}: {str(e)}")
@@ -849,12 +1224,20 @@ async def comprehensive_analysis(
 
 
 @app.get("/api/visualization/{email}")
-async def get_visualization_data(email: str, db: Session = Depends(get_db)):
+async def get_visualization_data(email: str, if_none_match: Optional[str] = Header(None),
+                                 db: Session = Depends(get_db)):
     """Получение данных для визуализации цифрового двойника"""
     try:
-        profile = db.query(EmailProfile).filter(
-            EmailProfile.email == email.lower().strip()
-        ).first()
+        email = email.lower().strip()
+        version = profile_version(db, email)
+        if version is None:
+            raise HTTPException(404, "Профиль не найден")
+        
+        etag = make_etag("visualization", version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
+        profile = db.query(EmailProfile).filter(EmailProfile.email == email).first()
         
         if not profile:
             raise HTTPException(404, "Профиль не найден")
@@ -867,10 +1250,11 @@ async def get_visualization_data(email: str, db: Session = Depends(get_db)):
         
         visualization_data = digital_twin.get('visualization_data', {})
         
-        return {
-            "status": "success",
-            "data": visualization_data
-        }
+        return fast_response(
+            headers=etag_headers(etag),
+            status="success",
+            data=visualization_data
+        )
         
     except HTTPException:
         raise
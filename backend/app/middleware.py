@@ -0,0 +1,297 @@
+"""
+ASGI middleware для учета времени ответа API и сжатия ответов
+
+Каждый запрос хронометрируется, задержки агрегируются в гистограммы
+по эндпоинтам (шаблон маршрута + метод), а строки ApiUsage пишутся
+через буфер отложенной записи. Оконные перцентили периодически
+сохраняются в SystemStats.
+
+Крупные ответы сжимаются brotli или gzip в зависимости от заголовка
+Accept-Encoding клиента.
+"""
+
+import gzip
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+from config.settings import settings
+from database.models import SystemStats
+from database.write_buffer import write_buffer
+from modules.metrics import LatencyHistogram, HTTP_REQUESTS, HTTP_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointLatencyTracker:
+    """Гистограммы задержек по эндпоинтам"""
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        self.flush_interval = flush_interval or settings.LATENCY_FLUSH_INTERVAL
+        # Накопительные гистограммы с момента запуска процесса
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        # Гистограммы текущего окна, сбрасываются при сохранении
+        self.window: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.status_counts: Dict[Tuple[str, str], Dict[int, int]] = {}
+        self.last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, method: str, endpoint: str, status_code: int, seconds: float) -> None:
+        key = (method, endpoint)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+                self.status_counts[key] = {}
+            if key not in self.window:
+                self.window[key] = LatencyHistogram()
+            statuses = self.status_counts[key]
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+            histogram, window = self.histograms[key], self.window[key]
+
+        histogram.record(seconds)
+        window.record(seconds)
+
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> int:
+        """Сохранение перцентилей текущего окна в SystemStats"""
+        with self._lock:
+            window, self.window = self.window, {}
+            window_seconds = time.monotonic() - self.last_flush
+            self.last_flush = time.monotonic()
+
+        rows = 0
+        for (method, endpoint), histogram in window.items():
+            summary = histogram.summary()
+            if not summary['count']:
+                continue
+
+            tags = {
+                'endpoint': endpoint,
+                'method': method,
+                'window_seconds': round(window_seconds, 1)
+            }
+            for name in ('count', 'mean', 'p50', 'p95', 'p99', 'max'):
+                write_buffer.add(
+                    SystemStats,
+                    metric_name=f"http_request_duration_{name}",
+                    metric_value=summary[name],
+                    metric_type='counter' if name == 'count' else 'histogram',
+                    tags=tags
+                )
+                rows += 1
+
+        return rows
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Перцентили задержек по эндпоинтам с момента запуска"""
+        with self._lock:
+            items = list(self.histograms.items())
+            statuses = {key: dict(value) for key, value in self.status_counts.items()}
+
+        stats = {}
+        for (method, endpoint), histogram in sorted(items):
+            stats[f"{method} {endpoint}"] = {
+                'method': method,
+                'endpoint': endpoint,
+                **histogram.summary(),
+                'status_codes': statuses.get((method, endpoint), {})
+            }
+        return stats
+
+
+class RequestTimingMiddleware:
+    """ASGI middleware: время ответа, гистограммы и записи ApiUsage"""
+
+    def __init__(self, app, tracker: Optional[EndpointLatencyTracker] = None):
+        self.app = app
+        self.tracker = tracker or latency_tracker
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_holder = {'status': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status_holder['status'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self._record(scope, status_holder['status'], elapsed)
+
+    def _record(self, scope, status_code: int, elapsed: float) -> None:
+        try:
+            # Шаблон маршрута вместо фактического пути, чтобы email не плодил ключи
+            route = scope.get('route')
+            endpoint = getattr(route, 'path', None) or scope.get('path', 'unknown')
+            method = scope.get('method', 'GET')
+
+            self.tracker.record(method, endpoint, status_code, elapsed)
+            HTTP_REQUESTS.labels(method, endpoint, status_code).inc()
+            HTTP_REQUEST_SECONDS.labels(method, endpoint).observe(elapsed)
+
+            headers = dict(scope.get('headers') or [])
+            user_agent = headers.get(b'user-agent')
+            client = scope.get('client')
+            write_buffer.add_api_usage(
+                endpoint=endpoint,
+                method=method,
+                response_status=status_code,
+                response_time=elapsed,
+                ip_address=client[0] if client else None,
+                user_agent=user_agent.decode('latin-1') if user_agent else None
+            )
+        except Exception as e:
+            logger.error(f"Error recording request timing: {e}")
+
+
+# Глобальный трекер задержек
+latency_tracker = EndpointLatencyTracker()
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Кодировки из Accept-Encoding с их весами q"""
+    encodings = {}
+    for item in header.split(','):
+        parts = [part.strip() for part in item.split(';')]
+        name = parts[0].lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        encodings[name] = quality
+    return encodings
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    """Лучшая из поддерживаемых кодировок: brotli, затем gzip"""
+    encodings = parse_accept_encoding(header)
+    wildcard = encodings.get('*', 0.0)
+    candidates = (('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',))
+
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = encodings.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware: сжатие ответов brotli/gzip выше порога размера
+
+    Сжимаются только ответы, отданные одним сообщением (JSON API);
+    потоковые ответы передаются без изменений.
+    """
+
+    COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+    def __init__(self, app, minimum_size: Optional[int] = None,
+                 gzip_level: Optional[int] = None, brotli_quality: Optional[int] = None):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else settings.COMPRESSION_MIN_SIZE
+        self.gzip_level = gzip_level or settings.COMPRESSION_GZIP_LEVEL
+        self.brotli_quality = brotli_quality or settings.COMPRESSION_BROTLI_QUALITY
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        encoding = choose_encoding(headers.get(b'accept-encoding', b'').decode('latin-1'))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message['type'] == 'http.response.start':
+                # Заголовки отправляются вместе с первым фрагментом тела
+                start_message = message
+                return
+
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            if start_message is not None:
+                pending, start_message = start_message, None
+                if message.get('more_body', False) or not self._should_compress(pending, body):
+                    passthrough = True
+                    await send(pending)
+                    await send(message)
+                    return
+
+                compressed = self._compress(body, encoding)
+                await send(self._compressed_start(pending, encoding, len(compressed)))
+                await send({'type': 'http.response.body', 'body': compressed, 'more_body': False})
+                return
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        if start_message is not None:
+            # Ответ без сообщения с телом
+            await send(start_message)
+
+    def _should_compress(self, start_message, body: bytes) -> bool:
+        if len(body) < self.minimum_size or start_message['status'] in (204, 304):
+            return False
+        response_headers = dict(start_message.get('headers') or [])
+        if b'content-encoding' in response_headers:
+            return False
+        content_type = response_headers.get(b'content-type', b'').decode('latin-1')
+        return content_type.startswith(self.COMPRESSIBLE_TYPES)
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    def _compressed_start(self, start_message, encoding: str, length: int):
+        headers = []
+        vary = None
+        for name, value in start_message.get('headers') or []:
+            lowered = name.lower()
+            if lowered == b'content-length':
+                continue
+            if lowered == b'vary':
+                vary = value
+                continue
+            if lowered == b'etag' and not value.startswith(b'W/'):
+                # Сжатое представление побайтно отличается от исходного
+                value = b'W/' + value
+            headers.append((name, value))
+
+        headers.append((b'content-encoding', encoding.encode('latin-1')))
+        headers.append((b'content-length', str(length).encode('latin-1')))
+        headers.append((b'vary', vary + b', Accept-Encoding' if vary else b'Accept-Encoding'))
+        return {**start_message, 'headers': headers}
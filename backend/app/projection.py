@@ -0,0 +1,160 @@
+"""
+Проекция полей и постраничная выдача данных профиля
+
+Данные профиля хранятся одним JSON-блоком, поэтому запрошенные ключи
+извлекаются средствами JSON-функций СУБД (json_extract, ->), и
+search_results, pdf_documents и цифровой двойник не читаются из базы,
+если клиент их не запросил.
+
+Списочные разделы (search_results, websites, pdf_documents) выдаются
+страницами. Курсор содержит смещение и версию содержимого профиля:
+после изменения профиля курсор перестает быть действительным.
+"""
+
+import re
+import json
+import base64
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from database.models import EmailProfile, public_profile_data
+
+logger = logging.getLogger(__name__)
+
+# Списочные разделы данных профиля с постраничной выдачей
+PAGINATED_FIELDS = ('search_results', 'websites', 'pdf_documents')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_FIELDS = 50
+
+# Служебные ключи данных (с подчеркиванием в начале) не запрашиваются
+_FIELD_PATTERN = re.compile(r'^[A-Za-z][A-Za-z0-9_]*$')
+
+# Колонки профиля, которые возвращаются вместе с данными
+_PROFILE_COLUMNS = (
+    EmailProfile.id, EmailProfile.email, EmailProfile.source_count,
+    EmailProfile.confidence_score, EmailProfile.is_verified,
+    EmailProfile.content_version, EmailProfile.created_at, EmailProfile.updated_at
+)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Список ключей data из параметра fields=a,b,c (None - все данные)"""
+    if fields is None or not fields.strip():
+        return None
+
+    keys = list(dict.fromkeys(key.strip() for key in fields.split(',') if key.strip()))
+    invalid = [key for key in keys if not _FIELD_PATTERN.match(key)]
+    if invalid:
+        raise HTTPException(400, f"Недопустимые имена полей: {', '.join(invalid)}")
+    if len(keys) > MAX_FIELDS:
+        raise HTTPException(400, f"Можно запросить не более {MAX_FIELDS} полей")
+    return keys
+
+
+def _profile_dict(row, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Ответ в формате EmailProfile.to_dict()"""
+    return {
+        'id': row.id,
+        'email': row.email,
+        'data': data,
+        'source_count': row.source_count,
+        'confidence_score': row.confidence_score,
+        'is_verified': row.is_verified,
+        'content_version': row.content_version,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'updated_at': row.updated_at.isoformat() if row.updated_at else None
+    }
+
+
+def load_profile(db: Session, email: str, keys: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Профиль с данными только по запрошенным ключам
+
+    При keys=None загружаются все данные. Отсутствующие в профиле ключи
+    в ответ не попадают.
+    """
+    if keys is None:
+        row = db.query(*_PROFILE_COLUMNS, EmailProfile.data).filter(
+            EmailProfile.email == email
+        ).first()
+        if row is None:
+            return None
+        return _profile_dict(row, public_profile_data(row.data) if isinstance(row.data, dict) else {})
+
+    extracted = [EmailProfile.data[key].label(f'field_{index}') for index, key in enumerate(keys)]
+    row = db.query(*_PROFILE_COLUMNS, *extracted).filter(
+        EmailProfile.email == email
+    ).first()
+    if row is None:
+        return None
+
+    data = {}
+    for index, key in enumerate(keys):
+        value = getattr(row, f'field_{index}')
+        if value is not None:
+            data[key] = value
+    return _profile_dict(row, data)
+
+
+def encode_cursor(field: str, offset: int, version: int) -> str:
+    payload = json.dumps({'f': field, 'o': offset, 'v': version}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, field: str, version: int) -> int:
+    """Смещение из курсора; 400 для некорректного курсора, 409 для устаревшего"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        offset = int(payload['o'])
+        cursor_field, cursor_version = payload['f'], payload['v']
+    except Exception:
+        raise HTTPException(400, "Некорректный курсор")
+
+    if cursor_field != field or offset < 0:
+        raise HTTPException(400, "Некорректный курсор")
+    if cursor_version != version:
+        raise HTTPException(409, "Профиль изменился, запросите первую страницу заново")
+    return offset
+
+
+def paginate(items: Any, field: str, version: int, limit: int,
+             offset: int = 0) -> Tuple[List[Any], Dict[str, Any]]:
+    """Страница списка и сведения о ней (total, next_cursor)"""
+    items = items if isinstance(items, list) else []
+    page = items[offset:offset + limit]
+    next_offset = offset + len(page)
+    return page, {
+        'total': len(items),
+        'offset': offset,
+        'limit': limit,
+        'next_cursor': encode_cursor(field, next_offset, version) if next_offset < len(items) else None
+    }
+
+
+def paginate_profile(profile: Dict[str, Any], limit: int) -> Dict[str, Dict[str, Any]]:
+    """Первые страницы списочных разделов профиля (изменяет profile['data'])"""
+    data = profile['data']
+    pagination = {}
+    for field in PAGINATED_FIELDS:
+        if field not in data:
+            continue
+        data[field], pagination[field] = paginate(
+            data[field], field, profile['content_version'], limit
+        )
+    return pagination
+
+
+def load_collection(db: Session, email: str, field: str) -> Optional[Tuple[int, Any]]:
+    """(content_version, список) одного раздела без загрузки остальных данных"""
+    row = db.query(EmailProfile.content_version, EmailProfile.data[field].label('items')).filter(
+        EmailProfile.email == email
+    ).first()
+    if row is None:
+        return None
+    return row.content_version, row.items
@@ -0,0 +1,225 @@
+"""
+Сбор и сохранение разделов профиля, фоновое обновление устаревших разделов
+
+Функции collect_* используются как эндпоинтами (синхронный сбор по запросу
+клиента), так и фоновыми задачами stale-while-revalidate. Сбор идет через
+single_flight с теми же ключами, что и у эндпоинтов, поэтому фоновое
+обновление и запрос клиента не соберут один и тот же раздел дважды.
+"""
+
+import logging
+from typing import Dict, Any, Optional, Set, Tuple
+
+import aiohttp
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import Session, object_session
+
+from config.settings import settings
+from database.connection import SessionLocal
+from database.models import EmailProfile
+from modules.data_collector import DataCollector
+from modules.academic_intelligence import AcademicIntelligenceCollector
+from modules.digital_twin import DigitalTwinCreator, twin_to_dict
+from modules.network_graph import network_graph_store
+from modules.pdf_analyzer import PDFAnalyzer
+from app.freshness import mark_fresh, content_changed, record_volatility
+from app.single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Ключи single-flight по разделам профиля
+SECTION_FLIGHT_KEYS = {
+    'general': 'search',
+    'academic': 'academic',
+    'pdf': 'pdf',
+    'twin': 'twin'
+}
+
+
+# Метрики графа связей берутся из текущего снимка графа
+GRAPH_METRICS = object()
+
+
+def _get_profile(db: Session, email: str) -> Optional[EmailProfile]:
+    return db.query(EmailProfile).filter(EmailProfile.email == email).first()
+
+
+def update_profile_data(db: Session, email: str, updates: Dict[str, Any],
+                        *sections: str, **columns) -> EmailProfile:
+    """
+    Обновление части данных профиля с отметкой свежести разделов
+
+    Данные копируются в новый словарь, чтобы SQLAlchemy увидел изменение
+    JSON-колонки.
+    """
+    profile = _get_profile(db, email)
+    if profile is None:
+        profile = EmailProfile(email=email, data={})
+        db.add(profile)
+
+    apply_profile_updates(profile, updates, *sections, **columns)
+    db.commit()
+    return profile
+
+
+def apply_profile_updates(profile: EmailProfile, updates: Dict[str, Any],
+                          *sections: str, **columns) -> EmailProfile:
+    """Изменение данных профиля без фиксации транзакции (для пакетной записи)"""
+    data = dict(profile.data) if isinstance(profile.data, dict) else {}
+    if any(key in data for key in updates):
+        # Изменчивость учитывается только для повторных сборов раздела
+        record_volatility(data, content_changed(data, updates), *sections)
+    data.update(updates)
+    profile.data = mark_fresh(data, *sections)
+
+    for name, value in columns.items():
+        setattr(profile, name, value)
+
+    if 'academic_profile' in updates and object_session(profile) is not None:
+        # Ребра профиля в глобальном графе связей меняются в той же транзакции
+        network_graph_store.update_profile(object_session(profile), profile.email, updates['academic_profile'])
+    return profile
+
+
+async def collect_general(db: Session, email: str) -> Dict[str, Any]:
+    """Сбор общих данных (включая PDF) и сохранение в профиль"""
+    collector = DataCollector(email)
+    profile_data = await collector.collect_all()
+
+    update_profile_data(
+        db, email, profile_data, 'general', 'pdf',
+        source_count=len(profile_data.get('sources', []))
+    )
+    return profile_data
+
+
+async def collect_academic(db: Session, email: str) -> Dict[str, Any]:
+    """Академический сбор данных и сохранение в профиль"""
+    academic_collector = AcademicIntelligenceCollector()
+    academic_data = await academic_collector.collect_academic_profile(email)
+
+    profile = _get_profile(db, email)
+    columns = {} if profile else {'source_count': len(academic_data['search_results'])}
+    update_profile_data(db, email, {
+        'academic_profile': academic_data['academic_profile'],
+        'academic_search_results': academic_data['search_results'],
+        'academic_confidence_scores': academic_data['confidence_scores'],
+        'academic_analysis_summary': academic_data['analysis_summary'],
+        'academic_collection_timestamp': academic_data['collection_timestamp']
+    }, 'academic', **columns)
+    return academic_data
+
+
+async def collect_pdf(db: Session, email: str) -> Dict[str, Any]:
+    """Повторный поиск и анализ PDF документов без полного сбора"""
+    async with aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=settings.REQUEST_TIMEOUT)
+    ) as session:
+        async with PDFAnalyzer(session) as pdf_analyzer:
+            pdf_results = await pdf_analyzer.search_pdf_documents(email)
+
+    update_profile_data(db, email, {'pdf_documents': pdf_results}, 'pdf')
+    return {'pdf_documents': pdf_results}
+
+
+def build_digital_twin(email: str, profile_data: Dict[str, Any], reuse: bool = True,
+                       network_metrics: Any = GRAPH_METRICS) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Построение цифрового двойника из академических данных профиля
+
+    При reuse=True результаты анализаторов с неизменившимися входными
+    данными берутся из сохраненного двойника. network_metrics - метрики
+    владельца в графе связей, посчитанные заранее (процессы пакетного
+    построения не обращаются к базе); по умолчанию берутся из снимка графа.
+    """
+    academic_data = twin_academic_data(profile_data)
+    if network_metrics is GRAPH_METRICS:
+        twin_creator = DigitalTwinCreator(network_graph=network_graph_store.get_graph())
+    else:
+        twin_creator = DigitalTwinCreator()
+        academic_data['network_metrics'] = network_metrics
+
+    digital_twin = twin_creator.create_digital_twin(
+        email,
+        academic_data,
+        profile_data.get('academic_search_results', []),
+        previous=profile_data.get('digital_twin') if reuse else None
+    )
+
+    return twin_to_dict(digital_twin), twin_creator.generate_twin_summary(digital_twin)
+
+
+def twin_academic_data(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Академические данные профиля в формате входа DigitalTwinCreator"""
+    return {
+        'academic_profile': profile_data.get('academic_profile', {}),
+        'confidence_scores': profile_data.get('academic_confidence_scores', {})
+    }
+
+
+def twin_changed_analyzers(email: str, profile_data: Dict[str, Any]) -> list:
+    """Анализаторы двойника, входные данные которых изменились после его построения"""
+    return DigitalTwinCreator(network_graph=network_graph_store.get_graph()).changed_analyzers(
+        profile_data.get('digital_twin'),
+        email,
+        twin_academic_data(profile_data),
+        profile_data.get('academic_search_results', [])
+    )
+
+
+async def collect_twin(db: Session, email: str, reuse: bool = True) -> Dict[str, Any]:
+    """Построение цифрового двойника и сохранение в профиль"""
+    profile = _get_profile(db, email)
+    profile_data = profile.data if profile and isinstance(profile.data, dict) else {}
+
+    twin_data, summary = build_digital_twin(email, profile_data, reuse)
+    if reuse and profile_data.get('digital_twin') and not twin_data['recomputed_analyzers']:
+        # Входные данные не изменились: сохраненный двойник остается без изменений
+        twin_data = profile_data['digital_twin']
+        summary = profile_data.get('digital_twin_summary') or summary
+
+    update_profile_data(db, email, {
+        'digital_twin': twin_data,
+        'digital_twin_summary': summary
+    }, 'twin')
+    return {'digital_twin': twin_data, 'digital_twin_summary': summary}
+
+
+SECTION_COLLECTORS = {
+    'general': collect_general,
+    'academic': collect_academic,
+    'pdf': collect_pdf,
+    'twin': collect_twin
+}
+
+# Разделы, обновление которых уже поставлено в очередь
+_queued: Set[Tuple[str, str]] = set()
+
+
+async def refresh_section(email: str, section: str) -> None:
+    """Фоновое обновление раздела профиля"""
+    db = SessionLocal()
+    try:
+        await single_flight.do(
+            f"{SECTION_FLIGHT_KEYS[section]}:{email}",
+            lambda: SECTION_COLLECTORS[section](db, email)
+        )
+        logger.info(f"Background refresh of {section} completed for {email}")
+    except Exception as e:
+        logger.error(f"Background refresh of {section} failed for {email}: {e}")
+    finally:
+        _queued.discard((email, section))
+        db.close()
+
+
+def queue_refresh(background_tasks: BackgroundTasks, email: str, *sections: str) -> list:
+    """Постановка фонового обновления разделов (без повторов для уже ожидающих)"""
+    queued = []
+    for section in sections:
+        key = (email, section)
+        if key in _queued:
+            continue
+        _queued.add(key)
+        background_tasks.add_task(refresh_section, email, section)
+        queued.append(section)
+    return queued
@@ -0,0 +1,85 @@
+"""
+Быстрая сериализация JSON-ответов
+
+Профили с сотнями результатов поиска и NLP-анализом по каждому URL
+сериализуются заметно дольше, чем собираются из базы. FastJSONResponse
+использует orjson (при его наличии), а model_payload формирует ответ в
+форме response_model без повторной валидации Dict[str, Any] данных,
+которые уже были проверены при сохранении.
+"""
+
+import json
+import logging
+from decimal import Decimal
+from typing import Dict, Any, Optional, Type
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+if ORJSON_AVAILABLE:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    """Типы, которые orjson и json не сериализуют сами"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json')
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Сериализация в JSON (UTF-8)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(
+        content, ensure_ascii=False, separators=(',', ':'), default=_default
+    ).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse с сериализацией через orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_payload(model: Type[BaseModel], **fields) -> Dict[str, Any]:
+    """
+    Тело ответа в форме модели без валидации
+
+    Незаданные поля получают значения по умолчанию модели, поэтому
+    ответ совпадает с тем, что вернул бы response_model.
+    """
+    payload = {}
+    for name, field in model.model_fields.items():
+        if name in fields:
+            payload[name] = fields.pop(name)
+        else:
+            payload[name] = field.get_default(call_default_factory=True)
+    if fields:
+        raise ValueError(f"Unknown fields for {model.__name__}: {', '.join(fields)}")
+    return payload
+
+
+def fast_response(model: Optional[Type[BaseModel]] = None, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None, **fields) -> FastJSONResponse:
+    """Ответ эндпоинта, минуя валидацию response_model"""
+    content = model_payload(model, **fields) if model is not None else fields
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
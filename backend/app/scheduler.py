@@ -0,0 +1,285 @@
+"""
+Фоновый планировщик обновления профилей
+
+Периодически выбирает разделы профилей для повторного сбора, чтобы
+популярные профили оставались свежими и пользовательские запросы не
+ждали сбора данных. Приоритет раздела зависит от популярности профиля
+(число запросов в SearchHistory), устаревания (возраст относительно TTL)
+и изменчивости раздела (как часто повторный сбор приносит новые данные).
+
+Сбор ограничен глобальным бюджетом запросов в час и лимитами
+DataSource.rate_limit для источников, которые задействует раздел. Сбор
+раздела учитывается в лимите каждого своего источника полной стоимостью
+SECTION_REQUEST_COST: распределение запросов по источникам заранее не
+известно, и оценка сверху не превышает лимит ни одного из них.
+"""
+
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Deque, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from database.connection import SessionLocal
+from database.models import EmailProfile, SearchHistory, DataSource
+from app.freshness import SECTIONS, section_freshness, section_volatility
+from app.refresh import refresh_section
+
+logger = logging.getLogger(__name__)
+
+# Примерное число внешних запросов на один сбор раздела
+SECTION_REQUEST_COST = {
+    'general': 20,
+    'academic': 10,
+    'pdf': 8,
+    'twin': 0
+}
+
+# Источники (DataSource.name), которые задействует сбор раздела
+SECTION_SOURCES = {
+    'general': ('google', 'bing', 'duckduckgo', 'linkedin', 'twitter', 'github', 'facebook'),
+    'academic': ('google', 'google_scholar'),
+    'pdf': ('google', 'bing', 'google_scholar', 'researchgate', 'arxiv'),
+    'twin': ()
+}
+
+# Типы запросов SearchHistory, относящиеся к разделам
+SECTION_SEARCH_TYPES = {
+    'general': ('single', 'bulk', 'comprehensive'),
+    'academic': ('academic', 'comprehensive'),
+    'pdf': ('single', 'bulk', 'comprehensive'),
+    'twin': ('digital_twin', 'comprehensive')
+}
+
+
+class RefreshScheduler:
+    """Планировщик фонового обновления разделов профилей"""
+
+    def __init__(self, interval: Optional[float] = None,
+                 budget_per_hour: Optional[int] = None,
+                 max_per_cycle: Optional[int] = None,
+                 session_factory=SessionLocal):
+        self.interval = interval or settings.REFRESH_SCHEDULER_INTERVAL
+        self.budget_per_hour = budget_per_hour or settings.REFRESH_BUDGET_PER_HOUR
+        self.max_per_cycle = max_per_cycle or settings.REFRESH_MAX_PER_CYCLE
+        self.session_factory = session_factory
+
+        # Потраченные запросы за последний час: (время, источник, стоимость)
+        self._spent: Deque[Tuple[float, Optional[str], int]] = deque()
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            'cycles': 0,
+            'refreshed': 0,
+            'skipped_budget': 0,
+            'skipped_rate_limit': 0,
+            'errors': 0,
+            'last_cycle_at': None
+        }
+
+    # Бюджет запросов
+
+    def _trim_spent(self) -> None:
+        cutoff = time.monotonic() - 3600
+        while self._spent and self._spent[0][0] < cutoff:
+            self._spent.popleft()
+
+    def spent_last_hour(self, source: Optional[str] = None) -> int:
+        """Запросы, потраченные за последний час (всего или по источнику)"""
+        self._trim_spent()
+        if source is None:
+            return sum(cost for _, name, cost in self._spent if name is None)
+        return sum(cost for _, name, cost in self._spent if name == source)
+
+    def _can_spend(self, section: str, rate_limits: Dict[str, int]) -> Optional[str]:
+        """Причина отказа в сборе раздела или None, если бюджет позволяет"""
+        cost = SECTION_REQUEST_COST[section]
+        if self.spent_last_hour() + cost > self.budget_per_hour:
+            return 'budget'
+        for source in SECTION_SOURCES[section]:
+            limit = rate_limits.get(source)
+            if limit is not None and self.spent_last_hour(source) + cost > limit:
+                return 'rate_limit'
+        return None
+
+    def _spend(self, section: str) -> None:
+        now = time.monotonic()
+        cost = SECTION_REQUEST_COST[section]
+        self._spent.append((now, None, cost))
+        for source in SECTION_SOURCES[section]:
+            self._spent.append((now, source, cost))
+
+    # Приоритеты
+
+    def _popularity(self, db: Session) -> Dict[str, Dict[str, int]]:
+        """Число запросов по email и типу запроса за окно популярности"""
+        since = datetime.utcnow() - timedelta(days=settings.REFRESH_POPULARITY_DAYS)
+        rows = db.query(
+            SearchHistory.email, SearchHistory.search_type, func.count(SearchHistory.id)
+        ).filter(
+            SearchHistory.created_at >= since
+        ).group_by(SearchHistory.email, SearchHistory.search_type).all()
+
+        popularity: Dict[str, Dict[str, int]] = {}
+        for email, search_type, count in rows:
+            popularity.setdefault(email, {})[search_type] = count
+        return popularity
+
+    def plan(self, db: Session, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Разделы-кандидаты на обновление в порядке убывания приоритета"""
+        popularity = self._popularity(db)
+        if not popularity:
+            return []
+
+        now = datetime.utcnow()
+        candidates = []
+        query = db.query(
+            EmailProfile.email, EmailProfile.data, EmailProfile.updated_at, EmailProfile.created_at
+        ).filter(EmailProfile.email.in_(list(popularity))).yield_per(500)
+
+        for profile in query:
+            requests_by_type = popularity.get(profile.email, {})
+            data = profile.data if isinstance(profile.data, dict) else {}
+
+            for section in SECTIONS:
+                requests = sum(requests_by_type.get(t, 0) for t in SECTION_SEARCH_TYPES[section])
+                if not requests:
+                    continue
+
+                state = section_freshness(profile, section, now)
+                if not state['present']:
+                    continue
+
+                # Устаревание: доля прошедшего TTL (1.0 = истек)
+                urgency = (state['age_seconds'] / state['ttl_seconds']
+                           if state['age_seconds'] is not None and state['ttl_seconds'] else 1.0)
+                if state['stale']:
+                    urgency = max(urgency, 1.0)
+                if urgency < settings.REFRESH_AHEAD_RATIO:
+                    continue
+
+                volatility = section_volatility(data, section)
+                priority = (1 + math.log1p(requests)) * min(urgency, 3.0) * (0.5 + volatility)
+
+                candidates.append({
+                    'email': profile.email,
+                    'section': section,
+                    'priority': round(priority, 4),
+                    'requests': requests,
+                    'urgency': round(urgency, 3),
+                    'volatility': volatility,
+                    'cost': SECTION_REQUEST_COST[section]
+                })
+
+        candidates.sort(key=lambda item: item['priority'], reverse=True)
+        return candidates[:limit] if limit else candidates
+
+    def _rate_limits(self, db: Session) -> Dict[str, int]:
+        sources = db.query(DataSource.name, DataSource.rate_limit).filter(
+            DataSource.is_active == True
+        ).all()
+        return {name.lower(): rate_limit for name, rate_limit in sources if rate_limit}
+
+    def _touch_sources(self, db: Session, section: str) -> None:
+        names = SECTION_SOURCES[section]
+        if not names:
+            return
+        db.query(DataSource).filter(
+            func.lower(DataSource.name).in_(names)
+        ).update({DataSource.last_used: datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+
+    # Цикл обновления
+
+    async def run_cycle(self) -> Dict[str, Any]:
+        """Один проход: обновление самых приоритетных разделов в пределах бюджета"""
+        db = self.session_factory()
+        refreshed = []
+        covered = set()
+        try:
+            plan = self.plan(db)
+            rate_limits = self._rate_limits(db)
+
+            for item in plan:
+                if len(refreshed) >= self.max_per_cycle:
+                    break
+                if (item['email'], item['section']) in covered:
+                    continue
+
+                reason = self._can_spend(item['section'], rate_limits)
+                if reason == 'budget':
+                    self.stats['skipped_budget'] += 1
+                    # Более дешевые разделы еще могут поместиться в бюджет
+                    continue
+                if reason == 'rate_limit':
+                    self.stats['skipped_rate_limit'] += 1
+                    continue
+
+                self._spend(item['section'])
+                await refresh_section(item['email'], item['section'])
+                self._touch_sources(db, item['section'])
+                refreshed.append(item)
+                self.stats['refreshed'] += 1
+                if item['section'] == 'general':
+                    # Общий сбор включает поиск PDF
+                    covered.add((item['email'], 'pdf'))
+
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Refresh scheduler cycle error: {e}")
+        finally:
+            db.close()
+
+        self.stats['cycles'] += 1
+        self.stats['last_cycle_at'] = datetime.utcnow().isoformat()
+        if refreshed:
+            logger.info(f"Refresh scheduler refreshed {len(refreshed)} sections")
+        return {'refreshed': refreshed, 'budget_spent': self.spent_last_hour()}
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_cycle()
+            await asyncio.sleep(self.interval)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Запуск периодического обновления в текущем цикле событий"""
+        if self.is_running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Refresh scheduler started (interval={self.interval}s, budget={self.budget_per_hour}/h)")
+
+    async def stop(self) -> None:
+        """Остановка планировщика"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Refresh scheduler stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика работы планировщика"""
+        return {
+            **self.stats,
+            'running': self.is_running,
+            'interval': self.interval,
+            'budget_per_hour': self.budget_per_hour,
+            'budget_spent_last_hour': self.spent_last_hour()
+        }
+
+
+# Глобальный экземпляр планировщика
+refresh_scheduler = RefreshScheduler()
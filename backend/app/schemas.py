@@ -5,11 +5,14 @@ from datetime import datetime
 class EmailRequest(BaseModel):
     email: EmailStr
     force_refresh: Optional[bool] = False
+    include_trace: Optional[bool] = False  # вернуть дерево спанов в ответе
 
 class EmailResponse(BaseModel):
     status: str
-    source: str  # "cache" или "fresh"
+    source: str  # "cache", "stale", "fresh" или "shared" (результат параллельного запроса)
     data: Dict[str, Any]
+    stale_sections: Optional[List[str]] = None  # разделы, обновляемые в фоне
+    trace: Optional[Dict[str, Any]] = None
 
 class BulkSearchResponse(BaseModel):
     total: int
@@ -22,6 +25,17 @@ class BulkSearchResponse(BaseModel):
 class ProfileResponse(BaseModel):
     status: str
     data: Dict[str, Any]
+    pagination: Optional[Dict[str, Dict[str, Any]]] = None  # первые страницы списочных разделов
+
+class CollectionPageResponse(BaseModel):
+    status: str
+    email: str
+    field: str
+    items: List[Any]
+    total: int
+    offset: int
+    limit: int
+    next_cursor: Optional[str] = None
 
 class SearchHistoryItem(BaseModel):
     email: str
@@ -45,6 +59,7 @@ class StatsResponse(BaseModel):
     search_engine_results: Optional[int] = 0
     search_engine_stats: Optional[Dict[str, SearchEngineStats]] = None
     recent_searches: List[Dict[str, Any]]
+    endpoint_latency: Optional[Dict[str, Dict[str, Any]]] = None
 
 class ErrorResponse(BaseModel):
     status: str = "error"
@@ -0,0 +1,231 @@
+"""
+Объединение одновременных запросов по ключу (single-flight)
+
+Первый запрос по ключу (лидер) выполняет сбор данных, остальные запросы
+того же процесса ждут его результат, не запуская повторный сбор.
+Между воркерами ключ дополнительно защищается строкой в таблице
+collection_locks: воркер, не получивший блокировку, ждет ее освобождения
+и перечитывает результат из базы. Если результата нет, а блокировку уже
+захватил другой воркер, ожидание повторяется (до MAX_LOCK_WAITS раз):
+без блокировки сбор не выполняется, в том числе при ошибке таблицы
+блокировок.
+
+Пока лидер выполняет сбор, блокировка продлевается каждые lock_ttl / 3
+секунд, поэтому долгий сбор не теряет ее по TTL. Запросы к таблице
+синхронные и выполняются в потоке через отдельное соединение
+BackgroundSessionLocal, не занимая цикл событий.
+"""
+
+import os
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from config.settings import settings
+from database.connection import BackgroundSessionLocal
+from database.models import CollectionLock
+from modules.metrics import COALESCED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Ожиданий чужой блокировки (каждое до lock_ttl), после которых запрос завершается ошибкой
+MAX_LOCK_WAITS = 3
+
+
+class SingleFlight:
+    """Выполнение не более одной операции на ключ одновременно"""
+
+    def __init__(self, use_db_lock: Optional[bool] = None,
+                 lock_ttl: Optional[int] = None,
+                 poll_interval: Optional[float] = None,
+                 session_factory=BackgroundSessionLocal):
+        self.use_db_lock = settings.SINGLE_FLIGHT_DB_LOCK if use_db_lock is None else use_db_lock
+        self.lock_ttl = lock_ttl or settings.SINGLE_FLIGHT_LOCK_TTL
+        self.poll_interval = poll_interval or settings.SINGLE_FLIGHT_POLL_INTERVAL
+        self.session_factory = session_factory
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]],
+                 recheck: Optional[Callable[[], Any]] = None) -> Tuple[Any, bool]:
+        """
+        Выполнение func для ключа или ожидание уже идущего выполнения
+
+        recheck вызывается, когда результат подготовил другой воркер:
+        он должен вернуть сохраненный результат или None, чтобы выполнить
+        func самостоятельно.
+
+        Возвращает (результат, shared), где shared=True, если результат
+        получен от другого запроса.
+        """
+        operation = key.split(':', 1)[0]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            COALESCED_REQUESTS.labels(operation, 'follower').inc()
+            logger.info(f"Awaiting in-flight result for {key}")
+            # shield: отмена ожидающего запроса не должна отменять лидера
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        lock_acquired = False
+        heartbeat = None
+
+        try:
+            if self.use_db_lock:
+                lock_acquired = await self._acquire_db_lock(key)
+                waits = 1
+                while not lock_acquired:
+                    # Другой воркер уже собрал данные
+                    result = recheck() if recheck else None
+                    if result is not None:
+                        COALESCED_REQUESTS.labels(operation, 'remote').inc()
+                        future.set_result(result)
+                        return result, True
+                    lock_acquired = await self._acquire_db_lock(key, wait=False)
+                    if lock_acquired:
+                        break
+                    # Блокировку успел захватить следующий воркер: сбор без нее не выполняется
+                    if waits >= MAX_LOCK_WAITS:
+                        raise TimeoutError(f"Key {key} is still locked by another worker")
+                    lock_acquired = await self._acquire_db_lock(key)
+                    waits += 1
+                heartbeat = asyncio.create_task(self._heartbeat(key))
+
+            COALESCED_REQUESTS.labels(operation, 'leader').inc()
+            result = await func()
+            future.set_result(result)
+            return result, False
+
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение получат ожидающие; без них asyncio не должен ругаться
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            if heartbeat is not None:
+                heartbeat.cancel()
+            if lock_acquired:
+                await asyncio.to_thread(self._release_db_lock, key)
+
+    async def _acquire_db_lock(self, key: str, wait: bool = True) -> bool:
+        """
+        Захват блокировки в таблице collection_locks
+
+        Если блокировка занята другим воркером, при wait=True ожидает ее
+        освобождения (или истечения) и возвращает False. Ошибка таблицы
+        блокировок передается вызывающему коду.
+        """
+        if await asyncio.to_thread(self._try_acquire, key):
+            return True
+        if not wait:
+            return False
+
+        logger.info(f"Key {key} is locked by another worker, waiting")
+        deadline = asyncio.get_running_loop().time() + self.lock_ttl
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            if not await asyncio.to_thread(self._is_locked, key):
+                break
+        return False
+
+    async def _heartbeat(self, key: str) -> None:
+        """Продление блокировки, пока лидер выполняет сбор"""
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            if not await asyncio.to_thread(self._renew_db_lock, key):
+                logger.warning(f"Collection lock {key} was lost, another worker may collect concurrently")
+                return
+
+    def _try_acquire(self, key: str) -> bool:
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            # Блокировки упавших воркеров истекают по TTL
+            db.execute(delete(CollectionLock).where(
+                CollectionLock.key == key,
+                CollectionLock.expires_at < now
+            ))
+            db.add(CollectionLock(
+                key=key,
+                owner=self.owner,
+                acquired_at=now,
+                expires_at=now + timedelta(seconds=self.lock_ttl)
+            ))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        except Exception as e:
+            # Без блокировки сбор не выполняется: запрос завершается ошибкой
+            db.rollback()
+            logger.error(f"Error acquiring collection lock {key}: {e}")
+            raise
+        finally:
+            db.close()
+
+    def _is_locked(self, key: str) -> bool:
+        db = self.session_factory()
+        try:
+            lock = db.execute(select(CollectionLock.key).where(
+                CollectionLock.key == key,
+                CollectionLock.expires_at >= datetime.utcnow()
+            )).first()
+            return lock is not None
+        except Exception as e:
+            logger.error(f"Error checking collection lock {key}: {e}")
+            return False
+        finally:
+            db.close()
+
+    def _renew_db_lock(self, key: str) -> bool:
+        """Продление своей блокировки; False, если блокировка уже не принадлежит воркеру"""
+        db = self.session_factory()
+        try:
+            renewed = db.execute(update(CollectionLock).where(
+                CollectionLock.key == key,
+                CollectionLock.owner == self.owner
+            ).values(expires_at=datetime.utcnow() + timedelta(seconds=self.lock_ttl))).rowcount
+            db.commit()
+            return renewed > 0
+        except Exception as e:
+            # Временная ошибка: блокировка еще действует, продление повторится
+            db.rollback()
+            logger.error(f"Error renewing collection lock {key}: {e}")
+            return True
+        finally:
+            db.close()
+
+    def _release_db_lock(self, key: str) -> None:
+        db = self.session_factory()
+        try:
+            # Удаляется только своя блокировка: истекшую мог захватить другой воркер
+            released = db.execute(delete(CollectionLock).where(
+                CollectionLock.key == key,
+                CollectionLock.owner == self.owner
+            )).rowcount
+            db.commit()
+            if not released:
+                logger.warning(f"Collection lock {key} expired before release")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error releasing collection lock {key}: {e}")
+        finally:
+            db.close()
+
+
+# Глобальный экземпляр для эндпоинтов сбора данных
+single_flight = SingleFlight()
@@ -0,0 +1,333 @@
+"""
+Пакетное перестроение цифровых двойников
+
+Используется после изменения алгоритмов или весов анализа, когда нужно
+перестроить двойники всех профилей с академическими данными. Профили
+читаются страницами по возрастанию id (каждая страница - потоковым
+курсором), двойники строятся в пуле процессов, результаты пишутся
+пакетными транзакциями. После каждого пакета сохраняется контрольная
+точка, поэтому прерванный запуск продолжается с места остановки.
+
+С базой работает только родительский процесс (через собственное
+соединение BackgroundSessionLocal): граф связей загружается один раз за
+запуск, и метрики владельца передаются в задание процесса пула вместе с
+данными профиля. Процессы пула запускаются через spawn и соединений с
+базой не открывают и не наследуют.
+
+Запуск из каталога backend:
+    python -m app.twin_batch --workers 4 --batch-size 200
+    python -m app.twin_batch --resume
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from config.settings import settings
+from database.connection import BackgroundSessionLocal
+from database.models import EmailProfile
+from modules.digital_twin import TWIN_ANALYSIS_VERSION
+from modules.network_graph import network_graph_store, NetworkGraph
+
+logger = logging.getLogger(__name__)
+
+# Ключи данных профиля, нужные для построения двойника
+TWIN_INPUT_KEYS = ('academic_profile', 'academic_search_results', 'academic_confidence_scores')
+
+
+def build_twin_job(job: Tuple[int, str, Dict[str, Any], bool, Optional[Dict[str, Any]]]) -> Tuple[int, str, Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Построение двойника в процессе пула (без обращения к базе)
+
+    Возвращает (id, email, twin_data, summary, error); twin_data=None без
+    ошибки означает, что входные данные не изменились и двойник актуален.
+    """
+    from app.refresh import build_digital_twin
+
+    profile_id, email, profile_data, reuse, network_metrics = job
+    try:
+        twin_data, summary = build_digital_twin(email, profile_data, reuse, network_metrics)
+        if reuse and profile_data.get('digital_twin') and not twin_data['recomputed_analyzers']:
+            return profile_id, email, None, None, None
+        return profile_id, email, twin_data, summary, None
+    except Exception as e:
+        return profile_id, email, None, None, f"{type(e).__name__}: {e}"
+
+
+class TwinBatchBuilder:
+    """Пакетное построение цифровых двойников по всей таблице профилей"""
+
+    def __init__(self, batch_size: Optional[int] = None,
+                 workers: Optional[int] = None,
+                 checkpoint_file: Optional[str] = None,
+                 session_factory=BackgroundSessionLocal):
+        self.batch_size = batch_size or settings.TWIN_BATCH_SIZE
+        self.workers = workers or settings.TWIN_BATCH_WORKERS or os.cpu_count() or 1
+        self.checkpoint_file = checkpoint_file or settings.TWIN_BATCH_CHECKPOINT_FILE
+        self.session_factory = session_factory
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.progress: Dict[str, Any] = {}
+
+    # Контрольная точка
+
+    def load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading twin batch checkpoint: {e}")
+            return None
+
+    def _save_checkpoint(self, progress: Dict[str, Any]) -> None:
+        # Запись через временный файл, чтобы прерывание не повредило контрольную точку
+        tmp_path = f"{self.checkpoint_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(progress, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.checkpoint_file)
+
+    # Чтение и запись
+
+    def _read_page(self, after_id: int, limit: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """Страница профилей с академическими данными после after_id"""
+        db = self.session_factory()
+        try:
+            columns = [EmailProfile.data[key].label(key) for key in TWIN_INPUT_KEYS + ('digital_twin',)]
+            query = db.query(EmailProfile.id, EmailProfile.email, *columns).filter(
+                EmailProfile.id > after_id
+            ).order_by(EmailProfile.id).limit(limit).execution_options(
+                stream_results=True, yield_per=limit
+            )
+
+            page = []
+            for row in query:
+                data = {key: getattr(row, key) for key in TWIN_INPUT_KEYS + ('digital_twin',)
+                        if getattr(row, key) is not None}
+                page.append((row.id, row.email, data))
+            return page
+        finally:
+            db.close()
+
+    def _load_graph(self) -> NetworkGraph:
+        """Снимок графа связей для метрик владельцев профилей (один раз за запуск)"""
+        db = self.session_factory()
+        try:
+            return network_graph_store.get_graph(db)
+        finally:
+            db.close()
+
+    def _publish(self, progress: Dict[str, Any]) -> None:
+        """Копия хода выполнения для get_status (читается из других потоков)"""
+        with self._lock:
+            self.progress = dict(progress)
+
+    def _write_batch(self, results: List[Tuple[int, str, Dict[str, Any], Dict[str, Any]]]) -> None:
+        """Сохранение построенных двойников одной транзакцией"""
+        from app.refresh import apply_profile_updates
+
+        if not results:
+            return
+        db = self.session_factory()
+        try:
+            by_id = {profile_id: (twin_data, summary) for profile_id, _, twin_data, summary in results}
+            # Данные перечитываются при записи, чтобы не затереть параллельные изменения профиля
+            for profile in db.query(EmailProfile).filter(EmailProfile.id.in_(list(by_id))):
+                twin_data, summary = by_id[profile.id]
+                apply_profile_updates(profile, {
+                    'digital_twin': twin_data,
+                    'digital_twin_summary': summary
+                }, 'twin')
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    # Запуск
+
+    def run(self, resume: bool = False, reuse: bool = False,
+            limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Перестроение двойников (синхронно)
+
+        reuse=False пересчитывает все анализаторы (после изменения весов),
+        reuse=True - только анализаторы с изменившимися входными данными.
+        """
+        checkpoint = self.load_checkpoint() if resume else None
+        if checkpoint and not checkpoint.get('completed'):
+            progress = checkpoint
+            progress['resumed_at'] = datetime.utcnow().isoformat()
+            logger.info(f"Resuming twin batch from profile id {progress['last_id']}")
+        else:
+            progress = {
+                'started_at': datetime.utcnow().isoformat(),
+                'analysis_version': TWIN_ANALYSIS_VERSION,
+                'reuse': reuse,
+                'last_id': 0,
+                'scanned': 0,
+                'built': 0,
+                'unchanged': 0,
+                'skipped': 0,
+                'failed': 0,
+                'batches': 0,
+                'elapsed_seconds': 0.0,
+                'errors': []
+            }
+        progress.update({'completed': False, 'running': True})
+        reuse = progress['reuse']
+        self._stop.clear()
+        self._publish(progress)
+
+        elapsed_before = progress['elapsed_seconds']
+        started = time.perf_counter()
+        processed = 0
+        graph = self._load_graph()
+
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(settings.TWIN_BATCH_START_METHOD)
+        )
+        with executor:
+            while not self._stop.is_set():
+                page_size = self.batch_size if limit is None else min(self.batch_size, limit - processed)
+                if page_size <= 0:
+                    break
+                page = self._read_page(progress['last_id'], page_size)
+                if not page:
+                    progress['completed'] = True
+                    break
+
+                jobs = []
+                for profile_id, email, data in page:
+                    if not data.get('academic_profile'):
+                        progress['skipped'] += 1
+                        continue
+                    metrics = graph.profile_metrics(email, data['academic_profile'])
+                    jobs.append((profile_id, email, data, reuse, metrics))
+
+                chunksize = max(1, len(jobs) // (self.workers * 4))
+                built = []
+                for profile_id, email, twin_data, summary, error in executor.map(build_twin_job, jobs, chunksize=chunksize):
+                    if error:
+                        progress['failed'] += 1
+                        progress['errors'] = (progress['errors'] + [{'email': email, 'error': error}])[-20:]
+                        logger.error(f"Error building digital twin for {email}: {error}")
+                    elif twin_data is None:
+                        progress['unchanged'] += 1
+                    else:
+                        built.append((profile_id, email, twin_data, summary))
+
+                self._write_batch(built)
+
+                processed += len(page)
+                progress['built'] += len(built)
+                progress['scanned'] += len(page)
+                progress['batches'] += 1
+                progress['last_id'] = page[-1][0]
+                self._update_throughput(progress, elapsed_before + time.perf_counter() - started)
+                self._save_checkpoint(progress)
+                self._publish(progress)
+
+                logger.info(
+                    f"Twin batch {progress['batches']}: scanned {progress['scanned']}, built {progress['built']}, "
+                    f"{progress['profiles_per_second']} profiles/s"
+                )
+
+        progress['running'] = False
+        progress['finished_at'] = datetime.utcnow().isoformat()
+        self._update_throughput(progress, elapsed_before + time.perf_counter() - started)
+        self._save_checkpoint(progress)
+        self._publish(progress)
+        return progress
+
+    def _update_throughput(self, progress: Dict[str, Any], elapsed: float) -> None:
+        progress['elapsed_seconds'] = round(elapsed, 3)
+        progress['profiles_per_second'] = round(progress['scanned'] / elapsed, 2) if elapsed > 0 else 0.0
+        progress['twins_per_second'] = round(progress['built'] / elapsed, 2) if elapsed > 0 else 0.0
+
+    # Фоновый запуск из API
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, resume: bool = False, reuse: bool = False, limit: Optional[int] = None) -> bool:
+        """Запуск в фоне (в потоке) из цикла событий; False, если уже выполняется"""
+        if self.is_running:
+            return False
+        loop = asyncio.get_running_loop()
+        self._task = loop.create_task(asyncio.to_thread(self.run, resume, reuse, limit))
+        self._task.add_done_callback(self._on_done)
+        return True
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            logger.error(f"Twin batch failed: {task.exception()}")
+            with self._lock:
+                self.progress['running'] = False
+                self.progress['error'] = str(task.exception())
+
+    def stop(self) -> None:
+        """Остановка после текущего пакета (продолжение - resume)"""
+        self._stop.set()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Состояние текущего или последнего запуска"""
+        with self._lock:
+            progress = dict(self.progress)
+        if not progress:
+            progress = self.load_checkpoint() or {}
+            progress['running'] = False
+        return {
+            **progress,
+            'workers': self.workers,
+            'batch_size': self.batch_size
+        }
+
+
+# Глобальный экземпляр для эндпоинтов администрирования
+twin_batch_builder = TwinBatchBuilder()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пакетное перестроение цифровых двойников')
+    parser.add_argument('--resume', action='store_true', help='продолжить с контрольной точки')
+    parser.add_argument('--reuse', action='store_true',
+                        help='пересчитывать только анализаторы с изменившимися входными данными')
+    parser.add_argument('--workers', type=int, help='число процессов (по умолчанию - число CPU)')
+    parser.add_argument('--batch-size', type=int, help='профилей в пакете')
+    parser.add_argument('--limit', type=int, help='обработать не более N профилей')
+    parser.add_argument('--checkpoint', help='файл контрольной точки')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    builder = TwinBatchBuilder(
+        batch_size=args.batch_size,
+        workers=args.workers,
+        checkpoint_file=args.checkpoint
+    )
+    progress = builder.run(resume=args.resume, reuse=args.reuse, limit=args.limit)
+
+    print(json.dumps({
+        key: progress.get(key) for key in (
+            'completed', 'scanned', 'built', 'unchanged', 'skipped', 'failed',
+            'batches', 'last_id', 'elapsed_seconds', 'profiles_per_second', 'twins_per_second'
+        )
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк холодного старта: импорт модулей с ленивой загрузкой NLP
+
+Каждый замер выполняется в отдельном процессе интерпретатора:
+    lazy    - только импорт модуля (NLP-библиотеки не загружаются);
+    eager   - импорт и nlp_loader.warm_up(), то есть стоимость, которую
+              раньше платил каждый импорт web_scraper (spaCy, модель,
+              проверка данных NLTK, TextBlob).
+
+Разница eager - lazy - выигрыш старта воркера. Без установленных
+spaCy/NLTK/TextBlob она близка к нулю. Загрузка отсутствующих данных
+NLTK на время замеров отключена (NLP_DOWNLOAD_MISSING_DATA=false).
+
+Запуск из каталога backend:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --modules modules.web_scraper app.main --repeat 7
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+__import__({module!r})
+imported = time.perf_counter()
+status = None
+if {warm_up!r}:
+    from modules.nlp_loader import nlp_loader
+    status = nlp_loader.warm_up()
+finished = time.perf_counter()
+print(json.dumps({{'import': imported - started, 'total': finished - started,
+                  'nlp_modules': sorted(m for m in sys.modules if m.split('.')[0] in ('spacy', 'nltk', 'textblob'))[:3],
+                  'status': status}}))
+"""
+
+
+def run_probe(module: str, warm_up: bool) -> dict:
+    env = {**os.environ, 'NLP_DOWNLOAD_MISSING_DATA': 'false', 'NLP_WARM_UP_ON_STARTUP': 'false'}
+    completed = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, warm_up=warm_up)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк времени импорта с ленивой загрузкой NLP')
+    parser.add_argument('--modules', nargs='+', default=['modules.web_scraper', 'app.main'])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    header = f"{'module':<22} {'lazy ms':>9} {'eager ms':>9} {'saved ms':>9} {'NLP loaded on import':>22}"
+    print(header)
+    print('-' * len(header))
+
+    status = None
+    for module in args.modules:
+        lazy, eager, loaded = [], [], []
+        for _ in range(args.repeat):
+            probe = run_probe(module, warm_up=False)
+            lazy.append(probe['total'])
+            loaded = probe['nlp_modules']
+            probe = run_probe(module, warm_up=True)
+            eager.append(probe['total'])
+            status = probe['status']
+
+        lazy_ms = statistics.median(lazy) * 1000
+        eager_ms = statistics.median(eager) * 1000
+        print(f"{module:<22} {lazy_ms:>9.1f} {eager_ms:>9.1f} {eager_ms - lazy_ms:>9.1f} "
+              f"{', '.join(loaded) or 'none':>22}")
+
+    print(f"\nNLP warm-up: {status}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пакетного NLP-анализа страниц (страниц в секунду)
+
+Сравнивает прежнюю схему EnhancedWebScraper - для каждой страницы
+последовательно spaCy nlp(text) и NLTK ne_chunk для персональной
+информации по всему тексту, затем еще раз по первым 10000 символам для
+nlp_analysis, плюс тональность TextBlob - с nlp_pipeline: один анализ
+на страницу, пакеты nlp.pipe в пуле процессов. entities_spacy и
+entities_nltk обеих схем сверяются.
+
+Без установленных spaCy/NLTK/TextBlob обе схемы ничего не анализируют
+и замер не показателен.
+
+Запуск из каталога backend:
+    python benchmarks/bench_nlp_pipeline.py
+    python benchmarks/bench_nlp_pipeline.py --pages 200 --workers 1 2 4 --batch-sizes 8 32
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import settings
+from modules.nlp_loader import nlp_loader
+from modules.nlp_pipeline import NLPPipeline
+from modules.web_scraper import NLPProcessor
+
+FIRST_NAMES = ('John', 'Maria', 'Ivan', 'Anna', 'Peter', 'Elena', 'David', 'Sarah')
+LAST_NAMES = ('Smith', 'Petrova', 'Ivanov', 'Johnson', 'Brown', 'Kuznetsova', 'Miller')
+ORGS = ('Moscow State University', 'Google', 'Stanford University', 'Microsoft Research', 'Yandex')
+PLACES = ('Moscow', 'London', 'California', 'Berlin', 'Saint Petersburg')
+FILLER = ('research', 'team', 'project', 'data', 'model', 'paper', 'published', 'works', 'lab', 'with')
+
+
+def build_pages(count: int, words: int, seed: int = 11) -> List[str]:
+    """Тексты страниц профилей с именами, организациями и местами"""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(count):
+        tokens = []
+        while len(tokens) < words:
+            tokens.extend(rng.choice(FILLER) for _ in range(rng.randint(5, 15)))
+            tokens.append(f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} works at '
+                          f'{rng.choice(ORGS)} in {rng.choice(PLACES)}.')
+        pages.append(' '.join(tokens))
+    return pages
+
+
+def legacy(pages: List[str]) -> List[dict]:
+    processor = NLPProcessor()
+    results = []
+    for text in pages:
+        processor.extract_person_info_nlp(text)
+        text = text[:settings.NLP_MAX_TEXT_CHARS]
+        results.append({
+            'sentiment': processor.analyze_sentiment(text),
+            'entities_spacy': processor.extract_entities_spacy(text),
+            'entities_nltk': processor.extract_entities_nltk(text)
+        })
+    return results
+
+
+async def batched(pages: List[str], workers: int, batch_size: int) -> Tuple[List[dict], float]:
+    pipeline = NLPPipeline(workers=workers, batch_size=batch_size, batch_wait=0.01)
+    try:
+        # Прогрев пула, чтобы не измерять запуск процессов и загрузку моделей
+        await pipeline.analyze_many(pages[:workers or 1])
+        started = time.perf_counter()
+        results = await pipeline.analyze_many(pages)
+        return results, time.perf_counter() - started
+    finally:
+        pipeline.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк пакетного NLP-анализа страниц')
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--words', type=int, default=1200, help='слов на странице')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[settings.NLP_BATCH_SIZE])
+    args = parser.parse_args()
+
+    print(f"NLP libraries: {nlp_loader.warm_up()}")
+    pages = build_pages(args.pages, args.words)
+
+    started = time.perf_counter()
+    reference = legacy(pages)
+    legacy_time = time.perf_counter() - started
+
+    header = f"{'mode':<24} {'seconds':>9} {'pages/s':>9} {'speedup':>8}"
+    print(header)
+    print('-' * len(header))
+    print(f"{'legacy (per page x2)':<24} {legacy_time:>9.3f} {args.pages / legacy_time:>9.1f} {1.0:>7.1f}x")
+
+    for workers in args.workers:
+        for batch_size in args.batch_sizes:
+            results, elapsed = asyncio.run(batched(pages, workers, batch_size))
+            for expected, actual in zip(reference, results):
+                assert expected['entities_spacy'] == actual['entities_spacy'], 'spaCy entities differ'
+                assert expected['entities_nltk'] == actual['entities_nltk'], 'NLTK entities differ'
+            mode = f'pipeline w={workers} b={batch_size}'
+            print(f"{mode:<24} {elapsed:>9.3f} {args.pages / elapsed:>9.1f} {legacy_time / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк извлечения данных страницы: общий ParsedDocument против
+отдельного обхода дерева в каждом извлекателе (CPU на страницу)
+
+legacy   - прежняя схема EnhancedWebScraper: soup.get_text() для
+           nlp_pipeline, для контактной информации, для ключевых слов
+           (после decompose() навигации, шапки и подвала) и для
+           nlp_analysis, мета-теги пятью поисками по дереву, каждый
+           селектор персональной информации - обходом дерева;
+document - ParsedDocument: текст, текст содержимого, ссылки и мета-теги
+           вычисляются один раз и используются всеми извлекателями,
+           селекторы без совпадающих классов, id и атрибутов
+           отсекаются по индексу документа.
+
+Обе схемы включают разбор HTML и дают одинаковый результат (сверяется).
+Сущности NLP не извлекаются (nlp_result передается готовым), чтобы
+замер не зависел от наличия spaCy/NLTK.
+
+Запуск из каталога backend:
+    python benchmarks/bench_parsed_document.py
+    python benchmarks/bench_parsed_document.py --pages 100 --paragraphs 20 80 200
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from modules.web_scraper import EnhancedWebScraper
+from modules.nlp_pipeline import nlp_pipeline
+from modules.parsed_document import ParsedDocument
+
+NLP_RESULT = {'entities_spacy': {}, 'entities_nltk': {}, 'sentiment': {'polarity': 0.0, 'subjectivity': 0.0}}
+WORDS = ('research', 'university', 'data', 'model', 'project', 'team', 'published', 'learning',
+         'systems', 'analysis', 'network', 'student', 'professor', 'conference', 'paper', 'open')
+SOCIAL = ('https://github.com/{0}', 'https://linkedin.com/in/{0}', 'https://twitter.com/{0}')
+
+
+def build_page(rng: random.Random, paragraphs: int) -> str:
+    """Страница профиля: навигация, шапка, содержимое с контактами, подвал, скрипты"""
+    user = f'user{rng.randint(1, 10 ** 6)}'
+    nav = ''.join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(30))
+    body = []
+    for i in range(paragraphs):
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 90)))
+        if i % 10 == 0:
+            text += f' Contact {user}@example.org or +1 (555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}.'
+        if i % 15 == 0:
+            text += f' <a href="{rng.choice(SOCIAL).format(user)}">profile</a>'
+        body.append(f'<p>{text} <a href="/post/{i}">more</a></p>')
+    return (
+        f'<html><head><title>{user} - Profile</title>'
+        f'<meta name="description" content="Profile of {user}">'
+        f'<meta property="og:title" content="{user}"><meta property="og:type" content="profile">'
+        f'<meta name="twitter:card" content="summary"><meta name="author" content="{user}">'
+        f'<link rel="stylesheet" href="/style.css"><link rel="me" href="https://github.com/{user}">'
+        f'<script>var config = {{"user": "{user}"}};</script><style>p {{ margin: 0 }}</style></head>'
+        f'<body><header><nav><ul>{nav}</ul></nav><h1>{user}</h1></header>'
+        f'<main>{"".join(body)}</main>'
+        f'<footer>Copyright {user} <a href="https://twitter.com/{user}">@{user}</a></footer></body></html>'
+    )
+
+
+class LegacyDocument(ParsedDocument):
+    """Прежний поиск персональной информации: каждый селектор обходит дерево"""
+
+    def select(self, selector: str):
+        return self.soup.select(selector)
+
+
+def legacy_meta_info(soup: BeautifulSoup) -> Dict[str, str]:
+    meta_info = {}
+    for tag in soup.find_all('meta', property=lambda x: x and x.startswith('og:')):
+        property_name = tag.get('property', '').replace('og:', '')
+        content = tag.get('content', '')
+        if property_name and content:
+            meta_info[f'og_{property_name}'] = content
+    for tag in soup.find_all('meta', attrs={'name': lambda x: x and x.startswith('twitter:')}):
+        name = tag.get('name', '').replace('twitter:', '')
+        content = tag.get('content', '')
+        if name and content:
+            meta_info[f'twitter_{name}'] = content
+    for tag_name in ('description', 'keywords', 'author'):
+        tag = soup.find('meta', attrs={'name': tag_name})
+        if tag and tag.get('content'):
+            meta_info[tag_name] = tag['content']
+    return meta_info
+
+
+def legacy(scraper: EnhancedWebScraper, html: str, url: str) -> Dict[str, Any]:
+    soup = BeautifulSoup(html, 'html.parser')
+    selectors = scraper._get_platform_selectors(url)
+    soup.get_text()  # текст для nlp_pipeline
+    title_tag = soup.find('title')
+    data = {
+        'title': title_tag.get_text().strip() if title_tag else None,
+        'person_info': scraper._extract_person_info_enhanced(LegacyDocument(soup=soup), selectors, NLP_RESULT),
+        'contact_info': scraper._extract_contact_info_enhanced(soup),
+        'social_links': scraper._extract_social_links_enhanced(soup),
+        'meta_info': legacy_meta_info(soup)
+    }
+    soup.find_all('[data-url]')
+    for element in soup(['script', 'style', 'nav', 'header', 'footer']):
+        element.decompose()
+    data['content_keywords'] = scraper.nlp_processor.extract_keywords_advanced(soup.get_text())
+    data['text_length'] = min(len(soup.get_text()), nlp_pipeline.max_text_chars)
+    return data
+
+
+def shared(scraper: EnhancedWebScraper, html: str, url: str) -> Dict[str, Any]:
+    document = ParsedDocument(html, url)
+    selectors = scraper._get_platform_selectors(url)
+    document.text  # текст для nlp_pipeline
+    return {
+        'title': scraper._extract_title(document),
+        'person_info': scraper._extract_person_info_enhanced(document, selectors, NLP_RESULT),
+        'contact_info': scraper._extract_contact_info_enhanced(document),
+        'social_links': scraper._extract_social_links_enhanced(document),
+        'meta_info': scraper._extract_meta_info(document),
+        'content_keywords': scraper._extract_keywords_enhanced(document),
+        'text_length': scraper._perform_nlp_analysis(document, NLP_RESULT)['text_length']
+    }
+
+
+def measure(extract, scraper: EnhancedWebScraper, pages: List[str]) -> (float, List[Dict[str, Any]]):
+    results = []
+    started = time.process_time()
+    for i, html in enumerate(pages):
+        results.append(extract(scraper, html, f'https://example.org/profile/{i}'))
+    return (time.process_time() - started) / len(pages), results
+
+
+def normalize(data: Dict[str, Any]) -> Dict[str, Any]:
+    contact = {key: sorted(values) for key, values in data['contact_info'].items()}
+    return {**data, 'contact_info': contact}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк общего ParsedDocument для извлекателей страницы')
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--paragraphs', type=int, nargs='+', default=[20, 80, 200], help='абзацев на странице')
+    args = parser.parse_args()
+
+    scraper = EnhancedWebScraper('bench@example.org')
+    header = f"{'paragraphs':>10} {'page KB':>8} {'legacy ms':>10} {'document ms':>12} {'speedup':>8}"
+    print(header)
+    print('-' * len(header))
+    for paragraphs in args.paragraphs:
+        rng = random.Random(paragraphs)
+        pages = [build_page(rng, paragraphs) for _ in range(args.pages)]
+        page_kb = sum(len(html) for html in pages) / len(pages) / 1024
+
+        legacy_time, legacy_results = measure(legacy, scraper, pages)
+        shared_time, shared_results = measure(shared, scraper, pages)
+        for expected, actual in zip(legacy_results, shared_results):
+            assert normalize(expected) == normalize(actual), 'extracted data differs'
+
+        print(f"{paragraphs:>10} {page_kb:>8.1f} {legacy_time * 1000:>10.2f} {shared_time * 1000:>12.2f} "
+              f"{legacy_time / shared_time:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк текстового анализа PersonalityAnalyzer
+
+Сравнивает однопроходный TextFeatureScanner с прежней схемой, в которой
+каждая категория заново просматривала весь текст своими
+некомпилированными выражениями (re.findall / str.count), на
+объединенных корпусах разного размера. Результаты обеих схем
+сверяются.
+
+Запуск из каталога backend:
+    python benchmarks/bench_personality_scanner.py
+    python benchmarks/bench_personality_scanner.py --sizes 100000 1000000 10000000
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import statistics
+from typing import Dict, List, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.digital_twin import PersonalityAnalyzer
+
+FILLER = ('the', 'of', 'and', 'university', 'paper', 'data', 'method', 'team-based', 'co-lead',
+          'ahead', 'models', 'dr.smith', 'prof.', 'real-world', 'self-study', 'интеллект', 'систем',
+          'leadership', 'research_group', 'cross-disciplinary', 'results.', 'теория', '2021')
+
+
+def build_corpus(size: int, analyzer: PersonalityAnalyzer, seed: int = 7) -> List[str]:
+    """Фрагменты title/snippet общей длиной около size символов"""
+    rng = random.Random(seed)
+    vocabulary = list(FILLER)
+    for groups in list(analyzer.communication_keywords.values()) + list(analyzer.expertise_keywords.values()):
+        for group in groups:
+            vocabulary.extend(group)
+    for words in list(analyzer.collaboration_keywords.values()) + list(analyzer.research_focus_keywords.values()):
+        vocabulary.extend(words)
+
+    fragments, total = [], 0
+    while total < size:
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(5, 40))]
+        fragment = ' '.join(word.capitalize() if rng.random() < 0.2 else word for word in words)
+        fragments.append(fragment)
+        total += len(fragment) + 1
+    return fragments
+
+
+def legacy_features(analyzer: PersonalityAnalyzer, text_data: List[str]) -> Dict[str, int]:
+    """Прежняя схема: отдельный просмотр текста на каждую категорию"""
+    text = ' '.join(text_data).lower()
+    vector = {}
+
+    for prefix, categories in (('communication', analyzer.communication_keywords),
+                               ('expertise', analyzer.expertise_keywords)):
+        for name, groups in categories.items():
+            score = 0
+            for group in groups:
+                pattern = r'\b(?:' + '|'.join(re.escape(word) for word in group) + r')\b'
+                score += len(re.findall(pattern, text, re.IGNORECASE))
+            vector[f'{prefix}.{name}'] = score
+
+    for prefix, categories in (('collaboration', analyzer.collaboration_keywords),
+                               ('focus', analyzer.research_focus_keywords)):
+        for name, words in categories.items():
+            vector[f'{prefix}.{name}'] = sum(text.count(word) for word in words)
+
+    return vector
+
+
+def measure(func: Callable[[], Dict[str, int]], repeat: int):
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк однопроходного сканера признаков')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 5_000_000],
+                        help='размеры корпусов в символах')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    analyzer = PersonalityAnalyzer()
+    header = f"{'chars':>10} {'legacy ms':>10} {'scanner ms':>11} {'speedup':>8} {'scanner MB/s':>13} {'ns/char':>8}"
+    print(header)
+    print('-' * len(header))
+
+    for size in args.sizes:
+        corpus = build_corpus(size, analyzer)
+        chars = sum(len(fragment) + 1 for fragment in corpus)
+
+        legacy_time, legacy_vector = measure(lambda: legacy_features(analyzer, corpus), args.repeat)
+        scanner_time, scanner_vector = measure(lambda: analyzer.extract_features(corpus), args.repeat)
+        assert legacy_vector == scanner_vector, f"feature vectors differ: {legacy_vector} != {scanner_vector}"
+
+        print(f"{chars:>10} {legacy_time * 1000:>10.2f} {scanner_time * 1000:>11.2f} "
+              f"{legacy_time / scanner_time:>7.1f}x {chars / scanner_time / 1e6:>13.1f} "
+              f"{scanner_time / chars * 1e9:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
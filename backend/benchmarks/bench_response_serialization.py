@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сериализации и сжатия крупных ответов профиля
+
+Сравнивает путь по умолчанию (валидация EmailResponse + JSONResponse)
+с быстрым путем (fast_response + orjson) и размеры ответа после
+gzip/brotli.
+
+Профили берутся из JSON-файла с сохраненными данными профиля (--file),
+из базы данных (--database, самые крупные профили) или генерируются
+(по умолчанию).
+
+Запуск из каталога backend:
+    python benchmarks/bench_response_serialization.py --results 500
+    python benchmarks/bench_response_serialization.py --database --limit 5
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import statistics
+from typing import Dict, List, Any, Callable, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+
+from app.schemas import EmailResponse
+from app.responses import fast_response, ORJSON_AVAILABLE
+from app.middleware import BROTLI_AVAILABLE
+from config.settings import settings
+
+if BROTLI_AVAILABLE:
+    import brotli
+
+WORDS = ('research', 'university', 'analysis', 'data', 'network', 'профиль',
+         'исследование', 'система', 'model', 'learning', 'публикация', 'project')
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def synthetic_profile(results: int, seed: int = 42) -> Dict[str, Any]:
+    """Профиль в формате DataCollector с NLP-анализом по каждому URL"""
+    rng = random.Random(seed)
+    search_results = []
+    for i in range(results):
+        search_results.append({
+            'title': _text(rng, 8),
+            'url': f'https://example{i % 50}.org/page/{i}',
+            'snippet': _text(rng, 40),
+            'source': rng.choice(('google', 'bing', 'duckduckgo', 'yandex')),
+            'relevance_score': round(rng.random(), 4),
+            'position': i + 1,
+            'nlp_analysis': {
+                'sentiment': {'polarity': round(rng.uniform(-1, 1), 4),
+                              'subjectivity': round(rng.random(), 4)},
+                'entities_spacy': [{'text': _text(rng, 2), 'label': rng.choice(('PERSON', 'ORG', 'GPE'))}
+                                   for _ in range(10)],
+                'entities_nltk': [{'text': _text(rng, 2), 'label': 'NE'} for _ in range(10)],
+                'text_length': rng.randint(500, 10000),
+                'language_detected': rng.choice(('en', 'ru'))
+            }
+        })
+
+    return {
+        'email': 'benchmark@example.org',
+        'person_info': {'name': 'Benchmark Person', 'location': 'Moscow'},
+        'social_profiles': [{'platform': 'github', 'url': f'https://github.com/user{i}'} for i in range(20)],
+        'websites': [f'https://example{i}.org' for i in range(50)],
+        'search_results': search_results,
+        'search_statistics': {'total_results': results, 'engines_used': 4},
+        'sources': ['google', 'bing', 'duckduckgo', 'yandex', 'github'],
+        'last_updated': '2024-01-01T00:00:00'
+    }
+
+
+def load_file(path: str) -> List[Dict[str, Any]]:
+    """Данные профилей из JSON-файла (профиль, список профилей или ответ API)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = json.load(f)
+    items = content if isinstance(content, list) else [content]
+    return [item.get('data', item) if isinstance(item, dict) and 'status' in item else item
+            for item in items]
+
+
+def load_database(limit: int) -> List[Dict[str, Any]]:
+    """Самые крупные профили из базы данных"""
+    from database.connection import SessionLocal
+    from database.models import EmailProfile
+
+    db = SessionLocal()
+    try:
+        profiles = [profile.data for profile in db.query(EmailProfile).all()
+                    if isinstance(profile.data, dict)]
+    finally:
+        db.close()
+    profiles.sort(key=lambda data: len(json.dumps(data, default=str)), reverse=True)
+    return profiles[:limit]
+
+
+def default_path(data: Dict[str, Any]) -> bytes:
+    """Путь FastAPI по умолчанию: модель, проверка response_model, json.dumps"""
+    model = EmailResponse(status='success', source='cache', data=data)
+    validated = EmailResponse.model_validate(model.model_dump())
+    return JSONResponse(validated.model_dump(mode='json')).body
+
+
+def fast_path(data: Dict[str, Any]) -> bytes:
+    return fast_response(EmailResponse, status='success', source='cache', data=data).body
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    """Медианное время вызова (мс) и результат последнего вызова"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def run(profiles: List[Dict[str, Any]], repeat: int) -> None:
+    print(f"orjson: {'yes' if ORJSON_AVAILABLE else 'no'}, brotli: {'yes' if BROTLI_AVAILABLE else 'no'}, "
+          f"repeat: {repeat}")
+    header = f"{'#':>3} {'size KB':>9} {'default ms':>11} {'fast ms':>8} {'speedup':>8} " \
+             f"{'gzip KB':>8} {'gzip ms':>8} {'br KB':>7} {'br ms':>6}"
+    print(header)
+    print('-' * len(header))
+
+    for index, data in enumerate(profiles, 1):
+        default_ms, default_body = measure(lambda: default_path(data), repeat)
+        fast_ms, fast_body = measure(lambda: fast_path(data), repeat)
+        assert json.loads(default_body) == json.loads(fast_body), "response bodies differ"
+
+        gzip_ms, gzip_body = measure(
+            lambda: gzip.compress(fast_body, compresslevel=settings.COMPRESSION_GZIP_LEVEL), repeat
+        )
+        if BROTLI_AVAILABLE:
+            br_ms, br_body = measure(
+                lambda: brotli.compress(fast_body, quality=settings.COMPRESSION_BROTLI_QUALITY), repeat
+            )
+            br_columns = f"{len(br_body) / 1024:>7.1f} {br_ms:>6.2f}"
+        else:
+            br_columns = f"{'-':>7} {'-':>6}"
+
+        print(f"{index:>3} {len(fast_body) / 1024:>9.1f} {default_ms:>11.2f} {fast_ms:>8.2f} "
+              f"{default_ms / fast_ms:>7.1f}x {len(gzip_body) / 1024:>8.1f} {gzip_ms:>8.2f} {br_columns}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк сериализации ответов профиля')
+    parser.add_argument('--file', help='JSON-файл с сохраненными данными профилей')
+    parser.add_argument('--database', action='store_true', help='взять профили из базы данных')
+    parser.add_argument('--limit', type=int, default=5, help='число профилей из базы данных')
+    parser.add_argument('--results', type=int, nargs='+', default=[100, 500, 2000],
+                        help='число результатов поиска в сгенерированных профилях')
+    parser.add_argument('--repeat', type=int, default=20, help='повторов на измерение')
+    args = parser.parse_args()
+
+    if args.file:
+        profiles = load_file(args.file)
+    elif args.database:
+        profiles = load_database(args.limit)
+    else:
+        profiles = [synthetic_profile(count) for count in args.results]
+
+    if not profiles:
+        print("Нет профилей для измерения")
+        return
+    run(profiles, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
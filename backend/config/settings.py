@@ -32,6 +32,101 @@ class Settings(BaseSettings):
     MAX_BULK_EMAILS: int = 1000
     RATE_LIMIT_PER_MINUTE: int = 60
     
+    # Отложенная запись служебных таблиц (история поиска, использование API)
+    WRITE_BUFFER_MAX_SIZE: int = 500
+    WRITE_BUFFER_FLUSH_INTERVAL: float = 5.0
+    
+    # Интервал сохранения перцентилей времени ответа в SystemStats (секунды)
+    LATENCY_FLUSH_INTERVAL: float = 60.0
+    
+    # Время жизни разделов профиля в кэше (часы); устаревшие разделы
+    # отдаются сразу и обновляются в фоне
+    PROFILE_TTL_GENERAL_HOURS: float = 168.0
+    PROFILE_TTL_ACADEMIC_HOURS: float = 720.0
+    PROFILE_TTL_PDF_HOURS: float = 720.0
+    PROFILE_TTL_TWIN_HOURS: float = 168.0
+    
+    # Фоновое обновление популярных профилей
+    REFRESH_SCHEDULER_ENABLED: bool = False
+    REFRESH_SCHEDULER_INTERVAL: float = 300.0
+    REFRESH_BUDGET_PER_HOUR: int = 600  # внешних запросов в час на все фоновые сборы
+    REFRESH_MAX_PER_CYCLE: int = 20
+    REFRESH_AHEAD_RATIO: float = 0.8  # обновлять популярные разделы после 80% TTL
+    REFRESH_POPULARITY_DAYS: int = 7
+    
+    # Объединение одновременных запросов по одному email (single-flight)
+    # Блокировка через таблицу collection_locks нужна при нескольких воркерах
+    SINGLE_FLIGHT_DB_LOCK: bool = False
+    SINGLE_FLIGHT_LOCK_TTL: int = 600
+    SINGLE_FLIGHT_POLL_INTERVAL: float = 1.0
+    
+    # Трассировка этапов анализа (Chrome Trace JSON)
+    TRACE_EXPORT_ENABLED: bool = False
+    TRACE_EXPORT_DIR: str = "traces"
+    
+    # Пакетное перестроение цифровых двойников
+    TWIN_BATCH_SIZE: int = 200
+    TWIN_BATCH_WORKERS: int = 0  # 0 - по числу CPU
+    TWIN_BATCH_CHECKPOINT_FILE: str = "twin_batch_checkpoint.json"
+    TWIN_BATCH_START_METHOD: str = "spawn"  # Процессы пула не наследуют соединения с базой
+    
+    # Сжатие ответов API (brotli при наличии пакета, иначе gzip)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # байт
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Индекс сущностей для связывания профилей
+    ENTITY_PHONE_DEFAULT_REGION: str = "RU"  # Регион номеров без кода страны
+    
+    # Полнотекстовый индекс собранного содержимого
+    FULLTEXT_BACKEND: str = "sqlite"  # sqlite, elasticsearch, none
+    FULLTEXT_SQLITE_PATH: str = "fulltext_index.sqlite"
+    FULLTEXT_PDF_TEXT_CHARS: int = 20000  # Сохраняемый в профиле фрагмент текста PDF
+    
+    # Дисковый HTTP-кэш страниц
+    HTTP_CACHE_ENABLED: bool = True
+    HTTP_CACHE_PATH: str = "http_cache.sqlite"
+    HTTP_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # Объем сжатых тел, сверх которого работает LRU
+    HTTP_CACHE_DEFAULT_TTL: int = 3600  # Свежесть ответа без Cache-Control и Expires (секунды)
+    HTTP_CACHE_COMPRESSION_LEVEL: int = 6
+    
+    # Потоковое чтение HTTP-ответов
+    HTTP_MAX_BODY_BYTES: int = 5 * 1024 * 1024  # Страницы больше отбрасываются без полной загрузки
+    HTTP_READ_TIMEOUT: float = 10.0  # Ожидание очередной части тела (секунды)
+    HTTP_READ_CHUNK_BYTES: int = 64 * 1024
+    HTTP_HEAD_MAX_BYTES: int = 64 * 1024  # Предел чтения, когда нужны только метаданные <head>
+    
+    # NLP-библиотеки (загружаются лениво)
+    NLP_SPACY_MODEL: str = "en_core_web_sm"
+    NLP_WARM_UP_ON_STARTUP: bool = True  # Фоновая загрузка моделей при старте приложения
+    NLP_DOWNLOAD_MISSING_DATA: bool = True  # nltk.download для отсутствующих данных NLTK
+    NLP_WORKERS: int = 2  # Процессы пакетного NLP-анализа страниц (0 - анализ в потоке)
+    NLP_WORKER_START_METHOD: str = "spawn"
+    NLP_BATCH_SIZE: int = 16  # Текстов в пакете nlp.pipe
+    NLP_BATCH_WAIT: float = 0.05  # Ожидание заполнения пакета (секунды)
+    NLP_MAX_TEXT_CHARS: int = 10000  # Анализируемое начало текста страницы
+    
+    # Офлайн-определение языка страниц
+    LANGUAGE_DETECT_MAX_CHARS: int = 2000  # Анализируемое начало текста
+    LANGUAGE_DETECT_MIN_CONFIDENCE: float = 0.1  # Ниже - 'unknown'
+    
+    # Поиск почти-дубликатов страниц (SimHash)
+    NEAR_DUPLICATE_ENABLED: bool = True
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 3  # Расстояние Хэмминга между 64-битными отпечатками
+    NEAR_DUPLICATE_MIN_TOKENS: int = 8  # Короткие тексты не сравниваются
+    NEAR_DUPLICATE_TTL: int = 604800  # Срок использования сохраненных отпечатков (секунды)
+    
+    # Очередь загрузки страниц результатов поиска
+    FRONTIER_CONCURRENCY: int = 5
+    FRONTIER_PER_HOST_CONCURRENCY: int = 1
+    FRONTIER_HOST_DELAY: float = 0.5  # Пауза между запросами к одному хосту (секунды)
+    FRONTIER_MAX_PAGES: int = 30
+    FRONTIER_MAX_BYTES: int = 20 * 1024 * 1024
+    FRONTIER_TIME_BUDGET: float = 60.0  # Секунды на загрузку всех страниц анализа
+    FRONTIER_BASE_PRIORITY: float = 0.1  # Добавка к relevance_score, чтобы нулевая релевантность не обнуляла приоритет
+    FRONTIER_HOST_DIVERSITY_PENALTY: float = 0.5  # Снижение приоритета за каждую загруженную страницу хоста
+    
     # Безопасность
     SECRET_KEY: str = "your-secret-key-here"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
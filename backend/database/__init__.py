@@ -10,6 +10,11 @@ from .models import (
     DataSource,
     ApiUsage,
     SystemStats,
+    CollectionLock,
+    NetworkNode,
+    NetworkEdge,
+    ProfileEntity,
+    PageFingerprint,
     Base
 )
 from .connection import (
@@ -20,8 +25,11 @@ from .connection import (
     DatabaseManager,
     db_manager,
     engine,
-    SessionLocal
+    SessionLocal,
+    background_engine,
+    BackgroundSessionLocal
 )
+from .write_buffer import WriteBehindBuffer, write_buffer
 
 __all__ = [
     'EmailProfile',
@@ -29,6 +37,11 @@ __all__ = [
     'DataSource',
     'ApiUsage',
     'SystemStats',
+    'CollectionLock',
+    'NetworkNode',
+    'NetworkEdge',
+    'ProfileEntity',
+    'PageFingerprint',
     'Base',
     'get_db',
     'create_tables',
@@ -37,6 +50,10 @@ __all__ = [
     'DatabaseManager',
     'db_manager',
     'engine',
-    'SessionLocal'
+    'SessionLocal',
+    'background_engine',
+    'BackgroundSessionLocal',
+    'WriteBehindBuffer',
+    'write_buffer'
 ]
 
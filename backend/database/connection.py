@@ -1,8 +1,11 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import StaticPool, NullPool
 import logging
+import time
+import os
 
 from config.settings import settings
 
@@ -21,22 +24,69 @@ engine = create_engine(
 # Создание фабрики сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _create_background_engine():
+    """
+    Движок для записи из фоновых потоков (буфер записи, индексы, пакетные задачи)
+
+    engine использует StaticPool: все сессии SessionLocal работают через одно
+    соединение, и rollback()/close() фоновой сессии отменяли бы незафиксированные
+    изменения сессии запроса. Фоновым сессиям нужен собственный пул: для SQLite -
+    новое соединение на сессию (NullPool), для остальных СУБД - QueuePool.
+    База SQLite в памяти существует только в своем соединении, поэтому для нее
+    используется основной движок.
+    """
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return engine
+        return create_engine(
+            url,
+            poolclass=NullPool,
+            connect_args={"check_same_thread": False},
+            echo=settings.DEBUG
+        )
+    return create_engine(url, pool_pre_ping=True, echo=settings.DEBUG)
+
+
+background_engine = _create_background_engine()
+
+# Сессии для потоков вне цикла событий
+BackgroundSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=background_engine)
+
 # Базовый класс для моделей
 Base = declarative_base()
 
 def get_db() -> Session:
     """Получение сессии базы данных"""
+    from modules.metrics import DB_SESSION_SECONDS
+
+    start_time = time.perf_counter()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+        DB_SESSION_SECONDS.observe(time.perf_counter() - start_time)
+
+def upgrade_schema():
+    """Применение миграций Alembic (database/migrations) к базе приложения"""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option('script_location', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
+    with engine.begin() as connection:
+        # Соединение приложения: база SQLite в памяти доступна только через него
+        config.attributes['connection'] = connection
+        command.upgrade(config, 'head')
 
 def create_tables():
-    """Создание всех таблиц в базе данных"""
+    """Создание всех таблиц в базе данных и применение миграций к существующим"""
     try:
         from .models import Base
         Base.metadata.create_all(bind=engine)
+        upgrade_schema()
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
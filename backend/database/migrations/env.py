@@ -64,6 +64,14 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # Соединение, переданное приложением (database.connection.upgrade_schema)
+    connection = config.attributes.get('connection')
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     configuration = config.get_section(config.config_ini_section)
     configuration["sqlalchemy.url"] = get_url()
     
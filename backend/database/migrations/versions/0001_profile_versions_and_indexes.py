@@ -0,0 +1,137 @@
+"""Версии содержимого профилей, блокировки сбора, граф связей, индекс сущностей и отпечатки страниц
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 06:30:00
+
+Таблицы исходной схемы создает create_tables() (Base.metadata.create_all),
+затем применяет миграции. Базы, созданные до появления миграций, могут уже
+содержать часть таблиц, поэтому существующие таблицы, колонки и индексы
+пропускаются.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _has_table(table: str) -> bool:
+    return _inspector().has_table(table)
+
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {item['name'] for item in _inspector().get_columns(table)}
+
+
+def _has_index(table: str, index: str) -> bool:
+    return index in {item['name'] for item in _inspector().get_indexes(table)}
+
+
+def upgrade() -> None:
+    # Версия и хэш содержимого профиля (ETag)
+    if not _has_column('email_profiles', 'content_version'):
+        op.add_column('email_profiles', sa.Column('content_version', sa.Integer(), nullable=False, server_default='1'))
+    if not _has_column('email_profiles', 'content_hash'):
+        op.add_column('email_profiles', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    # Блокировки сбора данных между воркерами
+    if not _has_table('collection_locks'):
+        op.create_table(
+            'collection_locks',
+            sa.Column('key', sa.String(length=255), primary_key=True),
+            sa.Column('owner', sa.String(length=100), nullable=False),
+            sa.Column('acquired_at', sa.DateTime(), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False)
+        )
+        op.create_index('ix_collection_locks_expires_at', 'collection_locks', ['expires_at'])
+
+    # Граф связей
+    if not _has_table('network_nodes'):
+        op.create_table(
+            'network_nodes',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('key', sa.String(length=300), nullable=False),
+            sa.Column('kind', sa.String(length=20), nullable=False),
+            sa.Column('label', sa.String(length=255), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True)
+        )
+        op.create_index('ix_network_nodes_id', 'network_nodes', ['id'])
+        op.create_index('ix_network_nodes_key', 'network_nodes', ['key'], unique=True)
+        op.create_index('ix_network_nodes_kind', 'network_nodes', ['kind'])
+
+    if not _has_table('network_edges'):
+        op.create_table(
+            'network_edges',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('source_id', sa.Integer(), sa.ForeignKey('network_nodes.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('target_id', sa.Integer(), sa.ForeignKey('network_nodes.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('kind', sa.String(length=20), nullable=False),
+            sa.Column('weight', sa.Float(), nullable=True),
+            sa.Column('profile_email', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.UniqueConstraint('source_id', 'target_id', 'kind', 'profile_email', name='uq_network_edge')
+        )
+        op.create_index('ix_network_edges_id', 'network_edges', ['id'])
+        op.create_index('ix_network_edges_source_id', 'network_edges', ['source_id'])
+        op.create_index('ix_network_edges_target_id', 'network_edges', ['target_id'])
+        op.create_index('ix_network_edges_profile_email', 'network_edges', ['profile_email'])
+
+    # Индекс сущностей профилей
+    if not _has_table('profile_entities'):
+        op.create_table(
+            'profile_entities',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('kind', sa.String(length=20), nullable=False),
+            sa.Column('value', sa.String(length=500), nullable=False),
+            sa.Column('profile_email', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.UniqueConstraint('kind', 'value', 'profile_email', name='uq_profile_entity')
+        )
+        op.create_index('ix_profile_entities_id', 'profile_entities', ['id'])
+        op.create_index('ix_profile_entities_lookup', 'profile_entities', ['kind', 'value'])
+        op.create_index('ix_profile_entities_profile_email', 'profile_entities', ['profile_email'])
+
+    # Отпечатки страниц для поиска дубликатов
+    if not _has_table('page_fingerprints'):
+        op.create_table(
+            'page_fingerprints',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('url', sa.String(length=2000), nullable=False),
+            sa.Column('kind', sa.String(length=20), nullable=False),
+            sa.Column('simhash', sa.BigInteger(), nullable=False),
+            sa.Column('band0', sa.Integer(), nullable=False),
+            sa.Column('band1', sa.Integer(), nullable=False),
+            sa.Column('band2', sa.Integer(), nullable=False),
+            sa.Column('band3', sa.Integer(), nullable=False),
+            sa.Column('extracted_data', sa.JSON(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.UniqueConstraint('url', 'kind', name='uq_page_fingerprint')
+        )
+        op.create_index('ix_page_fingerprints_id', 'page_fingerprints', ['id'])
+        for band in ('band0', 'band1', 'band2', 'band3'):
+            op.create_index(f'ix_page_fingerprints_{band}', 'page_fingerprints', [band])
+    if not _has_column('page_fingerprints', 'content_digest'):
+        op.add_column('page_fingerprints', sa.Column('content_digest', sa.String(length=32), nullable=True))
+    if not _has_index('page_fingerprints', 'ix_page_fingerprints_content_digest'):
+        op.create_index('ix_page_fingerprints_content_digest', 'page_fingerprints', ['content_digest'])
+
+
+def downgrade() -> None:
+    op.drop_table('page_fingerprints')
+    op.drop_table('profile_entities')
+    op.drop_table('network_edges')
+    op.drop_table('network_nodes')
+    op.drop_table('collection_locks')
+    with op.batch_alter_table('email_profiles') as batch_op:
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('content_version')
@@ -1,11 +1,21 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Float, Boolean, JSON, ForeignKey, UniqueConstraint, Index, event, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
 from typing import Dict, Any
+import hashlib
+import json
 
 Base = declarative_base()
 
+
+def public_profile_data(data: Any) -> Any:
+    """Данные профиля без служебных ключей (_freshness, _volatility), которые не отдаются клиентам"""
+    if not isinstance(data, dict):
+        return data
+    return {key: value for key, value in data.items() if not key.startswith('_')}
+
+
 class EmailProfile(Base):
     """Модель профиля email-адреса"""
     
@@ -17,18 +27,33 @@ class EmailProfile(Base):
     source_count = Column(Integer, default=0)  # Количество источников
     confidence_score = Column(Float, default=0.0)  # Рейтинг достоверности
     is_verified = Column(Boolean, default=False)  # Верифицирован ли профиль
+    content_version = Column(Integer, nullable=False, default=1, server_default='1')  # Растет при изменении содержимого
+    content_hash = Column(String(64))  # SHA-256 содержимого профиля
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    def compute_content_hash(self) -> str:
+        """Хэш содержимого профиля (данные и сводные поля)"""
+        payload = json.dumps({
+            # Служебные ключи (_freshness, _volatility) не являются содержимым профиля
+            'data': public_profile_data(self.data),
+            # До вставки колонки могут быть еще не заполнены значениями по умолчанию
+            'source_count': self.source_count or 0,
+            'confidence_score': self.confidence_score or 0.0,
+            'is_verified': bool(self.is_verified)
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
     def to_dict(self) -> Dict[str, Any]:
         """Преобразование в словарь"""
         return {
             'id': self.id,
             'email': self.email,
-            'data': self.data,
+            'data': public_profile_data(self.data),
             'source_count': self.source_count,
             'confidence_score': self.confidence_score,
             'is_verified': self.is_verified,
+            'content_version': self.content_version,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -36,6 +61,26 @@ class EmailProfile(Base):
     def __repr__(self):
         return f"<EmailProfile(email='{self.email}', sources={self.source_count})>"
 
+@event.listens_for(EmailProfile, 'before_insert')
+def _set_initial_content_version(mapper, connection, target):
+    target.content_hash = target.compute_content_hash()
+    target.content_version = target.content_version or 1
+
+# Колонки, входящие в хэш содержимого профиля
+_CONTENT_ATTRIBUTES = ('data', 'source_count', 'confidence_score', 'is_verified')
+
+@event.listens_for(EmailProfile, 'before_update')
+def _bump_content_version(mapper, connection, target):
+    # JSON хэшируется, только если изменилась одна из его колонок (а не, например, updated_at)
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in _CONTENT_ATTRIBUTES):
+        return
+    # Версия меняется только при реальном изменении содержимого
+    content_hash = target.compute_content_hash()
+    if content_hash != target.content_hash:
+        target.content_hash = content_hash
+        target.content_version = (target.content_version or 0) + 1
+
 class SearchHistory(Base):
     """Модель истории поисков"""
     
@@ -152,3 +197,141 @@ class SystemStats(Base):
     def __repr__(self):
         return f"<SystemStats(metric='{self.metric_name}', value={self.metric_value})>"
 
+class CollectionLock(Base):
+    """Блокировка сбора данных по ключу (single-flight между воркерами)"""
+    
+    __tablename__ = "collection_locks"
+    
+    key = Column(String(255), primary_key=True)  # Например 'search:user@example.com'
+    owner = Column(String(100), nullable=False)  # Воркер-владелец блокировки
+    acquired_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразование в словарь"""
+        return {
+            'key': self.key,
+            'owner': self.owner,
+            'acquired_at': self.acquired_at.isoformat() if self.acquired_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+    
+    def __repr__(self):
+        return f"<CollectionLock(key='{self.key}', owner='{self.owner}')>"
+
+class NetworkNode(Base):
+    """Узел глобального графа связей: персона, организация или издание"""
+    
+    __tablename__ = "network_nodes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(300), unique=True, index=True, nullable=False)  # Например 'institution:mit'
+    kind = Column(String(20), nullable=False, index=True)  # person, institution, venue
+    label = Column(String(255))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразование в словарь"""
+        return {
+            'id': self.id,
+            'key': self.key,
+            'kind': self.kind,
+            'label': self.label,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f"<NetworkNode(key='{self.key}')>"
+
+class NetworkEdge(Base):
+    """Ребро графа связей, внесенное профилем (вес ребра - сумма по профилям)"""
+    
+    __tablename__ = "network_edges"
+    __table_args__ = (
+        UniqueConstraint('source_id', 'target_id', 'kind', 'profile_email', name='uq_network_edge'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source_id = Column(Integer, ForeignKey('network_nodes.id', ondelete='CASCADE'), nullable=False, index=True)
+    target_id = Column(Integer, ForeignKey('network_nodes.id', ondelete='CASCADE'), nullable=False, index=True)
+    kind = Column(String(20), nullable=False)  # coauthor, published_in, affiliated
+    weight = Column(Float, default=1.0)
+    profile_email = Column(String(255), nullable=False, index=True)  # Профиль, из которого получено ребро
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразование в словарь"""
+        return {
+            'id': self.id,
+            'source_id': self.source_id,
+            'target_id': self.target_id,
+            'kind': self.kind,
+            'weight': self.weight,
+            'profile_email': self.profile_email
+        }
+    
+    def __repr__(self):
+        return f"<NetworkEdge({self.source_id}-{self.target_id}, kind='{self.kind}')>"
+
+class ProfileEntity(Base):
+    """Запись инвертированного индекса сущностей: нормализованный ключ и профиль"""
+    
+    __tablename__ = "profile_entities"
+    __table_args__ = (
+        UniqueConstraint('kind', 'value', 'profile_email', name='uq_profile_entity'),
+        Index('ix_profile_entities_lookup', 'kind', 'value'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)  # url, phone, username, name
+    value = Column(String(500), nullable=False)  # Нормализованное значение
+    profile_email = Column(String(255), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразование в словарь"""
+        return {
+            'kind': self.kind,
+            'value': self.value,
+            'profile_email': self.profile_email
+        }
+    
+    def __repr__(self):
+        return f"<ProfileEntity(kind='{self.kind}', value='{self.value}', email='{self.profile_email}')>"
+
+class PageFingerprint(Base):
+    """SimHash и хеш текста страницы для поиска дубликатов между анализами"""
+    
+    __tablename__ = "page_fingerprints"
+    __table_args__ = (
+        UniqueConstraint('url', 'kind', name='uq_page_fingerprint'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String(2000), nullable=False)
+    kind = Column(String(20), nullable=False)  # result_page, scraped_page
+    simhash = Column(BigInteger, nullable=False)  # 64-битный отпечаток (со знаком)
+    # 16-битные полосы отпечатка: почти-дубликат совпадает хотя бы в одной
+    band0 = Column(Integer, nullable=False, index=True)
+    band1 = Column(Integer, nullable=False, index=True)
+    band2 = Column(Integer, nullable=False, index=True)
+    band3 = Column(Integer, nullable=False, index=True)
+    # Хеш текста: данные берутся повторно только у страницы с тем же текстом
+    content_digest = Column(String(32), index=True)
+    extracted_data = Column(JSON)  # Данные, извлеченные со страницы
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразование в словарь"""
+        return {
+            'id': self.id,
+            'url': self.url,
+            'kind': self.kind,
+            'simhash': self.simhash,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f"<PageFingerprint(url='{self.url}', kind='{self.kind}')>"
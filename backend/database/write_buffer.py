@@ -0,0 +1,185 @@
+"""
+Буфер отложенной записи (write-behind) для служебных таблиц.
+
+Строки истории поиска и использования API не нужны запросу синхронно,
+поэтому они накапливаются в памяти и записываются пакетными INSERT
+по достижении размера пакета или по таймеру, а также при остановке приложения.
+
+Запись выполняет фоновый поток через BackgroundSessionLocal - собственное
+соединение, а не общее соединение сессий запросов (StaticPool): rollback и
+close буфера не затрагивают незафиксированные изменения запросов. Цикл
+событий запись не выполняет: полный буфер будит фоновый поток, а
+эндпоинтам, которым нужна дописанная история, служит flush_async().
+"""
+
+import asyncio
+import threading
+import logging
+from typing import Dict, List, Any, Optional, Type
+
+from sqlalchemy import insert
+
+from config.settings import settings
+from .connection import BackgroundSessionLocal
+from .models import SearchHistory, ApiUsage
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Буфер строк с пакетной записью в базу данных"""
+
+    def __init__(self, max_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None,
+                 session_factory=BackgroundSessionLocal):
+        self.max_size = max_size or settings.WRITE_BUFFER_MAX_SIZE
+        self.flush_interval = flush_interval or settings.WRITE_BUFFER_FLUSH_INTERVAL
+        self.session_factory = session_factory
+
+        self._pending: Dict[Type, List[Dict[str, Any]]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {
+            'rows_buffered': 0,
+            'rows_written': 0,
+            'rows_dropped': 0,
+            'flushes': 0,
+            'flush_errors': 0
+        }
+
+    def add(self, model: Type, **values) -> None:
+        """Добавление строки в буфер"""
+        with self._lock:
+            self._pending.setdefault(model, []).append(values)
+            self._size += 1
+            self.stats['rows_buffered'] += 1
+            size = self._size
+
+        if size >= self.max_size:
+            # Запись выполняет фоновый поток; без него (скрипты) поток запускается здесь
+            if not self.is_running:
+                self.start()
+            self._wakeup.set()
+
+    def add_search_history(self, email: str, search_type: str, results_found: int = 0,
+                           ip_address: Optional[str] = None,
+                           user_agent: Optional[str] = None) -> None:
+        """Добавление записи истории поиска"""
+        self.add(
+            SearchHistory,
+            email=email,
+            search_type=search_type,
+            results_found=results_found,
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+
+    def add_api_usage(self, endpoint: str, method: str, response_status: int,
+                      response_time: float, ip_address: Optional[str] = None,
+                      user_agent: Optional[str] = None) -> None:
+        """Добавление записи использования API"""
+        self.add(
+            ApiUsage,
+            endpoint=endpoint[:100],
+            method=method[:10],
+            response_status=response_status,
+            response_time=response_time,
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+
+    def flush(self) -> int:
+        """Запись всех накопленных строк пакетными INSERT в одной транзакции"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._size = 0
+
+            total = sum(len(rows) for rows in pending.values())
+            if not total:
+                return 0
+
+            db = self.session_factory()
+            try:
+                for model, rows in pending.items():
+                    db.execute(insert(model), rows)
+                db.commit()
+
+                self.stats['rows_written'] += total
+                self.stats['flushes'] += 1
+                logger.debug(f"Write buffer flushed {total} rows")
+                return total
+
+            except Exception as e:
+                db.rollback()
+                self.stats['flush_errors'] += 1
+                self.stats['rows_dropped'] += total
+                logger.error(f"Error flushing write buffer ({total} rows dropped): {e}")
+                return 0
+            finally:
+                db.close()
+
+    async def flush_async(self) -> int:
+        """flush() из цикла событий: запись выполняется в потоке"""
+        return await asyncio.to_thread(self.flush)
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def pending_count(self) -> int:
+        """Количество строк, ожидающих записи"""
+        with self._lock:
+            return self._size
+
+    def start(self) -> None:
+        """Запуск фонового потока периодической записи"""
+        if self.is_running:
+            return
+
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind-buffer", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Write buffer started (max_size={self.max_size}, interval={self.flush_interval}s)")
+
+    def stop(self) -> None:
+        """Остановка фонового потока с финальной записью"""
+        self._stopping.set()
+        self._wakeup.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+
+        self.flush()
+        logger.info("Write buffer stopped")
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write buffer flush loop error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика работы буфера"""
+        return {
+            **self.stats,
+            'pending': self.pending_count(),
+            'max_size': self.max_size,
+            'flush_interval': self.flush_interval,
+            'running': self.is_running
+        }
+
+
+# Глобальный экземпляр буфера
+write_buffer = WriteBehindBuffer()
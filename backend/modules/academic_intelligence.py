@@ -17,20 +17,7 @@ from datetime import datetime
 import hashlib
 from collections import defaultdict, Counter
 
-# Опциональные импорты для NLP
-try:
-    import spacy
-    SPACY_AVAILABLE = True
-except ImportError:
-    spacy = None
-    SPACY_AVAILABLE = False
-
-try:
-    from textblob import TextBlob
-    TEXTBLOB_AVAILABLE = True
-except ImportError:
-    TextBlob = None
-    TEXTBLOB_AVAILABLE = False
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -439,11 +426,14 @@ class AcademicSearchEngine:
         }
         
         try:
-            async with self.session.get(search_url, headers=headers) as response:
-                if response.status != 200:
-                    return []
-                
-                html = await response.text()
+            with span('http.academic_search', 'http', url=search_url):
+                async with self.session.get(search_url, headers=headers) as response:
+                    if response.status != 200:
+                        return []
+                    
+                    html = await response.text()
+            
+            with span('parse.academic_search', 'parse', bytes=len(html)):
                 soup = BeautifulSoup(html, 'html.parser')
                 
                 return self._parse_google_results(soup, email, query)
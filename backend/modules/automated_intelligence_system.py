@@ -23,6 +23,7 @@ from .social_collectors import BaseCollector, GoogleSearchCollector
 from .search_engines import SearchEngineManager
 from .web_scraper import WebScraper
 from .email_validator import EmailValidator
+from .tracing import span
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -104,7 +105,8 @@ class AutomatedIntelligenceSystem:
         try:
             # Phase 1: Email validation and basic checks
             logger.info("Phase 1: Email validation")
-            email_validation = await self._validate_email(email)
+            with span('phase.email_validation', 'phase'):
+                email_validation = await self._validate_email(email)
             
             if not email_validation.get('is_valid', False):
                 logger.warning(f"Email {email} failed validation")
@@ -112,21 +114,25 @@ class AutomatedIntelligenceSystem:
             
             # Phase 2: General data collection
             logger.info("Phase 2: General data collection")
-            general_data = await self._collect_general_data(email)
+            with span('phase.general_data', 'phase'):
+                general_data = await self._collect_general_data(email)
             
             # Phase 3: Search engine analysis
             logger.info("Phase 3: Search engine analysis")
-            search_results = await self._collect_search_data(email)
+            with span('phase.search_engines', 'phase'):
+                search_results = await self._collect_search_data(email)
             
             # Phase 4: Social media analysis
             logger.info("Phase 4: Social media analysis")
-            social_data = await self._collect_social_data(email)
+            with span('phase.social_media', 'phase'):
+                social_data = await self._collect_social_data(email)
             
             # Phase 5: Academic intelligence (if enabled)
             academic_data = {}
             if self.enable_academic_analysis:
                 logger.info("Phase 5: Academic intelligence")
-                academic_data = await self._collect_academic_data(email)
+                with span('phase.academic', 'phase'):
+                    academic_data = await self._collect_academic_data(email)
             
             # Phase 6: Digital twin creation (if enabled)
             digital_twin_data = {}
@@ -134,17 +140,20 @@ class AutomatedIntelligenceSystem:
             network_data = {}
             if self.enable_digital_twin:
                 logger.info("Phase 6: Digital twin creation")
-                digital_twin_data, personality_data, network_data = await self._create_digital_twin(
-                    email, general_data, academic_data, social_data
-                )
+                with span('phase.digital_twin', 'phase'):
+                    digital_twin_data, personality_data, network_data = await self._create_digital_twin(
+                        email, general_data, academic_data, social_data
+                    )
             
             # Phase 7: Analysis and scoring
             logger.info("Phase 7: Analysis and scoring")
-            scores = self._calculate_scores(general_data, academic_data, social_data, digital_twin_data)
+            with span('phase.scoring', 'phase'):
+                scores = self._calculate_scores(general_data, academic_data, social_data, digital_twin_data)
             
             # Phase 8: Generate insights and recommendations
             logger.info("Phase 8: Generating insights")
-            insights = self._generate_insights(email, general_data, academic_data, social_data, digital_twin_data)
+            with span('phase.insights', 'phase'):
+                insights = self._generate_insights(email, general_data, academic_data, social_data, digital_twin_data)
             
             # Create comprehensive results
             processing_time = time.time() - self.start_time
@@ -1,6 +1,7 @@
 import asyncio
 import aiohttp
 import re
+import time
 import logging
 from typing import Dict, List, Optional, Any
 from datetime import datetime
@@ -18,6 +19,9 @@ from .web_scraper import WebScraper
 from .email_validator import EmailValidator
 from .search_engines import SearchEngineManager, SearchResultProcessor, SearchEngineConfig
 from .pdf_analyzer import PDFAnalyzer
+from .url_canonicalizer import UrlDeduplicator, canonicalize_url
+from .metrics import COLLECTOR_RUNS, COLLECTOR_SECONDS, register_http_pool
+from .tracing import span
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -42,6 +46,8 @@ class DataCollector:
             'confidence_score': 0.0,
             'last_updated': datetime.utcnow().isoformat()
         }
+        # Социальные профили и сайты дедуплицируются по каноническому URL
+        self.url_dedup = UrlDeduplicator()
         
         # Инициализация коллекторов
         self._init_collectors()
@@ -69,6 +75,7 @@ class DataCollector:
             connector=aiohttp.TCPConnector(limit=settings.MAX_CONCURRENT_REQUESTS)
         ) as session:
             self.session = session
+            register_http_pool('collectors', settings.MAX_CONCURRENT_REQUESTS)
             
             # Запуск всех коллекторов параллельно
             tasks = []
@@ -77,7 +84,8 @@ class DataCollector:
                 tasks.append(self._safe_collect(collector))
             
             # Ожидание завершения всех задач
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            with span('collect.collectors', 'phase', count=len(tasks)):
+                results = await asyncio.gather(*tasks, return_exceptions=True)
             
             # Обработка результатов
             for i, result in enumerate(results):
@@ -87,16 +95,22 @@ class DataCollector:
                     self._merge_results(result)
             
             # Дополнительный поиск через поисковые системы
-            await self._search_engine_collection()
+            with span('collect.search_engines', 'phase'):
+                await self._search_engine_collection()
             
             # Дополнительный поиск по найденным данным
-            await self._enhanced_search()
+            with span('collect.enhanced_search', 'phase'):
+                await self._enhanced_search()
             
             # PDF анализ
-            await self._pdf_search_and_analysis()
+            with span('collect.pdf_analysis', 'phase'):
+                await self._pdf_search_and_analysis()
+            
+            self.results['search_statistics']['merged_url_duplicates_removed'] = self.url_dedup.get_stats()
             
             # Вычисление рейтинга достоверности
-            self._calculate_confidence_score()
+            with span('collect.confidence_score', 'phase'):
+                self._calculate_confidence_score()
             
             logger.info(f"Data collection completed for {self.email}. Sources: {len(self.results['sources'])}")
             
@@ -104,11 +118,19 @@ class DataCollector:
     
     async def _safe_collect(self, collector) -> Optional[Dict[str, Any]]:
         """Безопасный запуск коллектора с обработкой ошибок"""
+        name = collector.__class__.__name__
+        start_time = time.perf_counter()
         try:
-            return await collector.collect()
+            with span(f'collector.{name}', 'collector'):
+                result = await collector.collect()
+            COLLECTOR_RUNS.labels(name, 'success' if result else 'empty').inc()
+            return result
         except Exception as e:
-            logger.error(f"Error in {collector.__class__.__name__}: {e}")
+            COLLECTOR_RUNS.labels(name, 'error').inc()
+            logger.error(f"Error in {name}: {e}")
             return None
+        finally:
+            COLLECTOR_SECONDS.labels(name).observe(time.perf_counter() - start_time)
     
     def _merge_results(self, data: Dict[str, Any]):
         """Объединение результатов от коллектора"""
@@ -124,13 +146,13 @@ class DataCollector:
         # Добавление социальных профилей
         if 'social_profiles' in data:
             for profile in data['social_profiles']:
-                if not any(p['url'] == profile['url'] for p in self.results['social_profiles']):
+                if self.url_dedup.add(profile['url'], 'social_profiles'):
                     self.results['social_profiles'].append(profile)
         
         # Добавление веб-сайтов
         if 'websites' in data:
             for website in data['websites']:
-                if website not in self.results['websites']:
+                if self.url_dedup.add(website, 'websites'):
                     self.results['websites'].append(website)
         
         # Добавление телефонов
@@ -205,12 +227,21 @@ class DataCollector:
             # Создаем обработчик результатов поиска
             async with SearchResultProcessor() as processor:
                 processed_results = await processor.process_search_results(search_results)
-                
+                self.results['search_statistics']['near_duplicates'] = dict(processor.near_duplicates.stats)
+                self.results['search_statistics']['frontier'] = processor.frontier_stats
+                results_by_url = {canonicalize_url(result['url']): result for result in self.results['search_results']}
+
                 # Извлекаем дополнительную информацию со страниц
                 for result in processed_results:
                     extracted_data = result.extracted_data
                     
                     if extracted_data:
+                        # Заголовок и описание страницы сохраняются для полнотекстового поиска
+                        stored_result = results_by_url.get(canonicalize_url(result.url))
+                        if stored_result is not None:
+                            stored_result['page_title'] = extracted_data.get('page_title', '')
+                            stored_result['meta_description'] = extracted_data.get('meta_description', '')
+
                         # Добавляем найденные email адреса
                         for email in extracted_data.get('emails', []):
                             if email != self.email and email not in self.results['phone_numbers']:
@@ -228,7 +259,7 @@ class DataCollector:
                             }
                             
                             # Проверяем, что профиль еще не добавлен
-                            if not any(p['url'] == social_profile['url'] for p in self.results['social_profiles']):
+                            if self.url_dedup.add(social_profile['url'], 'social_profiles'):
                                 self.results['social_profiles'].append(social_profile)
                         
                         # Добавляем найденные телефоны
@@ -238,13 +269,14 @@ class DataCollector:
                                 self.results['phone_numbers'].append(cleaned_phone)
                         
                         # Добавляем URL как веб-сайт
-                        if result.url not in self.results['websites']:
+                        if self.url_dedup.add(result.url, 'websites'):
                             self.results['websites'].append(result.url)
                             
         except Exception as e:
             logger.error(f"Error processing search results: {e}")
     
-    def _extract_username_from_url(self, url: str) -> str:
+    @staticmethod
+    def _extract_username_from_url(url: str) -> str:
         """Извлечение имени пользователя из URL социальной сети"""
         try:
             # Простое извлечение имени пользователя из URL
@@ -346,7 +378,7 @@ class DataCollector:
             
             # Добавляем URL PDF как веб-сайт
             pdf_url = pdf_result.get('url')
-            if pdf_url and pdf_url not in self.results['websites']:
+            if pdf_url and self.url_dedup.add(pdf_url, 'websites'):
                 self.results['websites'].append(pdf_url)
     
     def _calculate_confidence_score(self):
@@ -15,6 +15,17 @@ import base64
 
 logger = logging.getLogger(__name__)
 
+# Версия алгоритмов анализа: при ее изменении сохраненные подрезультаты не переиспользуются
+TWIN_ANALYSIS_VERSION = 2
+
+# Имена соавторов в контексте публикаций
+COLLABORATOR_NAME_RE = re.compile(r'\b([A-Z][a-z]+\s+[A-Z][a-z]+)\b')
+
+def _fingerprint(*parts: Any) -> str:
+    """Отпечаток входных данных анализатора"""
+    payload = json.dumps([TWIN_ANALYSIS_VERSION, *parts], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
 @dataclass
 class PersonalityProfile:
     """Профиль личности на основе анализа данных"""
@@ -34,6 +45,11 @@ class NetworkAnalysis:
     influence_score: float = 0.0
     centrality_score: float = 0.0
     network_size: int = 0
+    # Метрики в глобальном графе связей (None - персоны нет в графе)
+    pagerank: Optional[float] = None
+    degree_centrality: Optional[float] = None
+    eigenvector_centrality: Optional[float] = None
+    graph_degree: int = 0
     
 @dataclass
 class CareerTrajectory:
@@ -85,67 +101,167 @@ class DigitalTwin:
     confidence_score: float = 0.0
     data_sources: List[str] = field(default_factory=list)
     completeness_score: float = 0.0
+    
+    # Отпечатки входных данных анализаторов и пересчитанные при построении анализаторы
+    input_fingerprints: Dict[str, str] = field(default_factory=dict)
+    recomputed_analyzers: List[str] = field(default_factory=list)
+
+def twin_to_dict(twin: DigitalTwin) -> Dict[str, Any]:
+    """Преобразование цифрового двойника в словарь для сохранения"""
+    return asdict(twin)
+
+class TextFeatureScanner:
+    """
+    Подсчет совпадений всех категорий признаков за один проход по тексту
+    
+    Текст разбивается одним скомпилированным выражением на фрагменты из
+    букв, цифр и дефисов; все ключевые слова лежат внутри одного
+    фрагмента. Для каждого различного фрагмента вклад в признаки
+    вычисляется один раз, поэтому время линейно по размеру текста.
+    
+    Категории двух видов:
+    - word: целые слова, как в регулярном выражении с границами слова
+      (слово может оканчиваться точкой перед буквой: 'dr.' в 'dr.smith');
+    - substring: вхождения подстроки, как str.count (например, 'lead'
+      учитывается и в 'leader').
+    """
+    
+    _CHUNK_RE = re.compile(r'[\w-]+(?:\.(?=\w))?')
+    
+    def __init__(self, word_categories: Dict[str, List[List[str]]],
+                 substring_categories: Dict[str, List[str]]):
+        self.features = list(word_categories) + list(substring_categories)
+        
+        # Слово -> признаки; слово из нескольких групп одной категории учитывается в каждой
+        self._words: Dict[str, List[str]] = defaultdict(list)
+        for feature, groups in word_categories.items():
+            for group in groups:
+                for word in group:
+                    self._words[word.lower()].append(feature)
+        
+        self._substrings = [
+            (feature, keyword.lower())
+            for feature, keywords in substring_categories.items()
+            for keyword in keywords
+        ]
+    
+    def _chunk_features(self, chunk: str) -> Counter:
+        """Вклад одного фрагмента текста в признаки"""
+        counts = Counter()
+        
+        dotted = chunk.endswith('.')
+        base = chunk[:-1] if dotted else chunk
+        parts = base.split('-')
+        for part in parts:
+            for feature in self._words.get(part, ()):
+                counts[feature] += 1
+        if dotted:
+            for feature in self._words.get(parts[-1] + '.', ()):
+                counts[feature] += 1
+        
+        for feature, keyword in self._substrings:
+            if keyword in base:
+                counts[feature] += base.count(keyword)
+        
+        return counts
+    
+    def scan(self, text: str) -> Dict[str, int]:
+        """Вектор признаков: число совпадений по каждой категории"""
+        chunk_counts = Counter(match.group() for match in self._CHUNK_RE.finditer(text.lower()))
+        
+        vector = dict.fromkeys(self.features, 0)
+        for chunk, occurrences in chunk_counts.items():
+            for feature, count in self._chunk_features(chunk).items():
+                vector[feature] += count * occurrences
+        return vector
 
 class PersonalityAnalyzer:
     """Анализатор личности на основе текстовых данных"""
     
     def __init__(self):
-        # Паттерны для определения стиля коммуникации
-        self.communication_patterns = {
+        # Слова для определения стиля коммуникации
+        self.communication_keywords = {
             'formal': [
-                r'\b(?:furthermore|moreover|consequently|therefore|nevertheless)\b',
-                r'\b(?:Dr\.|Prof\.|Professor)\b',
-                r'\b(?:research|study|investigation|analysis|examination)\b',
-                r'\b(?:results|findings|conclusions|implications)\b'
+                ['furthermore', 'moreover', 'consequently', 'therefore', 'nevertheless'],
+                ['dr.', 'prof.', 'professor'],
+                ['research', 'study', 'investigation', 'analysis', 'examination'],
+                ['results', 'findings', 'conclusions', 'implications']
             ],
             'casual': [
-                r'\b(?:cool|awesome|great|amazing|fantastic)\b',
-                r'\b(?:hey|hi|hello|thanks|cheers)\b',
-                r'\b(?:stuff|things|pretty|really|super)\b'
+                ['cool', 'awesome', 'great', 'amazing', 'fantastic'],
+                ['hey', 'hi', 'hello', 'thanks', 'cheers'],
+                ['stuff', 'things', 'pretty', 'really', 'super']
             ],
             'academic': [
-                r'\b(?:hypothesis|methodology|literature|empirical|theoretical)\b',
-                r'\b(?:publication|journal|conference|proceedings)\b',
-                r'\b(?:significant|correlation|statistical|experimental)\b'
+                ['hypothesis', 'methodology', 'literature', 'empirical', 'theoretical'],
+                ['publication', 'journal', 'conference', 'proceedings'],
+                ['significant', 'correlation', 'statistical', 'experimental']
             ]
         }
         
-        # Паттерны для определения уровня экспертизы
-        self.expertise_patterns = {
+        # Слова для определения уровня экспертизы
+        self.expertise_keywords = {
             'authority': [
-                r'\b(?:pioneer|leader|expert|authority|renowned)\b',
-                r'\b(?:established|recognized|distinguished|eminent)\b',
-                r'\b(?:founding|groundbreaking|seminal|influential)\b'
+                ['pioneer', 'leader', 'expert', 'authority', 'renowned'],
+                ['established', 'recognized', 'distinguished', 'eminent'],
+                ['founding', 'groundbreaking', 'seminal', 'influential']
             ],
             'expert': [
-                r'\b(?:experienced|skilled|proficient|specialist)\b',
-                r'\b(?:advanced|sophisticated|comprehensive|extensive)\b',
-                r'\b(?:developed|created|designed|implemented)\b'
+                ['experienced', 'skilled', 'proficient', 'specialist'],
+                ['advanced', 'sophisticated', 'comprehensive', 'extensive'],
+                ['developed', 'created', 'designed', 'implemented']
             ],
             'intermediate': [
-                r'\b(?:working|learning|developing|exploring)\b',
-                r'\b(?:interested|focused|studying|researching)\b'
+                ['working', 'learning', 'developing', 'exploring'],
+                ['interested', 'focused', 'studying', 'researching']
             ]
         }
         
+        # Подстроки для склонности к сотрудничеству и фокуса исследований
+        self.collaboration_keywords = {
+            'collaborative': ['collaboration', 'team', 'joint', 'together', 'partner'],
+            'leader': ['lead', 'director', 'head', 'chair', 'chief'],
+            'individual': ['independent', 'solo', 'individual', 'personal']
+        }
+        self.research_focus_keywords = {
+            'theoretical': ['theory', 'theoretical', 'model', 'framework', 'concept'],
+            'applied': ['application', 'practical', 'implementation', 'real-world', 'industry'],
+            'interdisciplinary': ['interdisciplinary', 'multidisciplinary', 'cross-disciplinary']
+        }
+        
+        self.scanner = TextFeatureScanner(
+            word_categories={
+                **{f'communication.{style}': groups for style, groups in self.communication_keywords.items()},
+                **{f'expertise.{level}': groups for level, groups in self.expertise_keywords.items()}
+            },
+            substring_categories={
+                **{f'collaboration.{name}': words for name, words in self.collaboration_keywords.items()},
+                **{f'focus.{name}': words for name, words in self.research_focus_keywords.items()}
+            }
+        )
+        
+    def extract_features(self, text_data: List[str]) -> Dict[str, int]:
+        """Вектор текстовых признаков (один проход по всему тексту)"""
+        return self.scanner.scan(' '.join(text_data))
+        
     def analyze_personality(self, text_data: List[str], academic_profile: Dict[str, Any]) -> PersonalityProfile:
         """Анализ личности на основе текстовых данных"""
         profile = PersonalityProfile()
         
-        # Объединяем весь текст
-        all_text = ' '.join(text_data).lower()
+        # Признаки всех категорий за один проход по объединенному тексту
+        features = self.extract_features(text_data)
         
         # Анализ стиля коммуникации
-        profile.communication_style = self._analyze_communication_style(all_text)
+        profile.communication_style = self._analyze_communication_style(features)
         
         # Анализ уровня экспертизы
-        profile.expertise_level = self._analyze_expertise_level(all_text, academic_profile)
+        profile.expertise_level = self._analyze_expertise_level(features, academic_profile)
         
         # Анализ склонности к сотрудничеству
-        profile.collaboration_tendency = self._analyze_collaboration_tendency(all_text)
+        profile.collaboration_tendency = self._analyze_collaboration_tendency(features)
         
         # Анализ фокуса исследований
-        profile.research_focus = self._analyze_research_focus(all_text)
+        profile.research_focus = self._analyze_research_focus(features)
         
         # Определение стадии карьеры
         profile.career_stage = self._determine_career_stage(academic_profile)
@@ -155,33 +271,19 @@ class PersonalityAnalyzer:
         
         return profile
     
-    def _analyze_communication_style(self, text: str) -> str:
+    def _analyze_communication_style(self, features: Dict[str, int]) -> str:
         """Анализ стиля коммуникации"""
-        scores = {}
-        
-        for style, patterns in self.communication_patterns.items():
-            score = 0
-            for pattern in patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                score += len(matches)
-            scores[style] = score
+        scores = {style: features[f'communication.{style}'] for style in self.communication_keywords}
         
         if not scores or max(scores.values()) == 0:
             return "unknown"
         
         return max(scores, key=scores.get)
     
-    def _analyze_expertise_level(self, text: str, academic_profile: Dict[str, Any]) -> str:
+    def _analyze_expertise_level(self, features: Dict[str, int], academic_profile: Dict[str, Any]) -> str:
         """Анализ уровня экспертизы"""
-        scores = {}
-        
         # Анализ текста
-        for level, patterns in self.expertise_patterns.items():
-            score = 0
-            for pattern in patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                score += len(matches)
-            scores[level] = score
+        scores = {level: features[f'expertise.{level}'] for level in self.expertise_keywords}
         
         # Дополнительные факторы из академического профиля
         degrees = academic_profile.get('degrees', [])
@@ -207,15 +309,11 @@ class PersonalityAnalyzer:
         
         return max(scores, key=scores.get)
     
-    def _analyze_collaboration_tendency(self, text: str) -> str:
+    def _analyze_collaboration_tendency(self, features: Dict[str, int]) -> str:
         """Анализ склонности к сотрудничеству"""
-        collaboration_keywords = ['collaboration', 'team', 'joint', 'together', 'partner']
-        leadership_keywords = ['lead', 'director', 'head', 'chair', 'chief']
-        individual_keywords = ['independent', 'solo', 'individual', 'personal']
-        
-        collab_score = sum(text.count(keyword) for keyword in collaboration_keywords)
-        leader_score = sum(text.count(keyword) for keyword in leadership_keywords)
-        individual_score = sum(text.count(keyword) for keyword in individual_keywords)
+        collab_score = features['collaboration.collaborative']
+        leader_score = features['collaboration.leader']
+        individual_score = features['collaboration.individual']
         
         if leader_score > collab_score and leader_score > individual_score:
             return "leader"
@@ -226,15 +324,11 @@ class PersonalityAnalyzer:
         else:
             return "unknown"
     
-    def _analyze_research_focus(self, text: str) -> str:
+    def _analyze_research_focus(self, features: Dict[str, int]) -> str:
         """Анализ фокуса исследований"""
-        theoretical_keywords = ['theory', 'theoretical', 'model', 'framework', 'concept']
-        applied_keywords = ['application', 'practical', 'implementation', 'real-world', 'industry']
-        interdisciplinary_keywords = ['interdisciplinary', 'multidisciplinary', 'cross-disciplinary']
-        
-        theoretical_score = sum(text.count(keyword) for keyword in theoretical_keywords)
-        applied_score = sum(text.count(keyword) for keyword in applied_keywords)
-        interdisciplinary_score = sum(text.count(keyword) for keyword in interdisciplinary_keywords)
+        theoretical_score = features['focus.theoretical']
+        applied_score = features['focus.applied']
+        interdisciplinary_score = features['focus.interdisciplinary']
         
         if interdisciplinary_score > 0:
             return "interdisciplinary"
@@ -293,8 +387,15 @@ class PersonalityAnalyzer:
 class NetworkAnalyzer:
     """Анализатор сетевых связей"""
     
-    def analyze_network(self, academic_profile: Dict[str, Any], search_results: List[Dict[str, Any]]) -> NetworkAnalysis:
-        """Анализ сетевых связей"""
+    def analyze_network(self, academic_profile: Dict[str, Any], search_results: List[Dict[str, Any]],
+                        network_metrics: Optional[Dict[str, Any]] = None) -> NetworkAnalysis:
+        """
+        Анализ сетевых связей
+        
+        network_metrics - метрики персоны в глобальном графе связей
+        (NetworkGraph.profile_metrics); без них центральность оценивается
+        по размеру сети профиля.
+        """
         analysis = NetworkAnalysis()
         
         # Извлекаем коллабораторов из публикаций
@@ -311,7 +412,15 @@ class NetworkAnalyzer:
         # Вычисляем метрики сети
         analysis.network_size = len(analysis.collaborators) + len(analysis.institutions)
         analysis.influence_score = self._calculate_influence_score(academic_profile, search_results)
-        analysis.centrality_score = self._calculate_centrality_score(analysis)
+        
+        if network_metrics:
+            analysis.pagerank = network_metrics['pagerank']
+            analysis.degree_centrality = network_metrics['degree_centrality']
+            analysis.eigenvector_centrality = network_metrics['eigenvector_centrality']
+            analysis.graph_degree = network_metrics['degree']
+            analysis.centrality_score = network_metrics['centrality_score']
+        else:
+            analysis.centrality_score = self._calculate_centrality_score(analysis)
         
         return analysis
     
@@ -322,8 +431,7 @@ class NetworkAnalyzer:
         for pub in publications:
             context = pub.get('context', '')
             # Простой поиск имен в контексте публикаций
-            name_pattern = r'\b([A-Z][a-z]+\s+[A-Z][a-z]+)\b'
-            names = re.findall(name_pattern, context)
+            names = COLLABORATOR_NAME_RE.findall(context)
             collaborators.extend(names)
         
         # Удаляем дубликаты и возвращаем топ-10
@@ -781,24 +889,113 @@ class VisualizationDataGenerator:
 class DigitalTwinCreator:
     """Основной класс для создания цифрового двойника"""
     
-    def __init__(self):
+    # Анализаторы, результаты которых можно переиспользовать, и поля двойника с их результатами
+    ANALYZER_FIELDS = {
+        'personality': ('personality_profile', PersonalityProfile),
+        'network': ('network_analysis', NetworkAnalysis),
+        'career': ('career_trajectory', CareerTrajectory),
+        'impact': ('impact_metrics', ImpactMetrics),
+        'visualization': ('visualization_data', None)
+    }
+    
+    def __init__(self, network_graph=None):
+        # Глобальный граф связей (NetworkGraph) для сетевых метрик персоны
+        self.network_graph = network_graph
         self.personality_analyzer = PersonalityAnalyzer()
         self.network_analyzer = NetworkAnalyzer()
         self.career_analyzer = CareerAnalyzer()
         self.impact_analyzer = ImpactAnalyzer()
         self.visualization_generator = VisualizationDataGenerator()
     
+    def build_inputs(self, email: str, academic_data: Dict[str, Any],
+                     search_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Входные данные анализаторов
+
+        Метрики графа связей, посчитанные заранее (academic_data['network_metrics'],
+        пакетное построение), используются вместо обращения к графу.
+        """
+        if 'network_metrics' in academic_data:
+            network_metrics = academic_data['network_metrics']
+        elif self.network_graph:
+            network_metrics = self.network_graph.profile_metrics(email, academic_data.get('academic_profile'))
+        else:
+            network_metrics = None
+        return {
+            'email': email,
+            'academic_profile': academic_data.get('academic_profile', {}),
+            'confidence_scores': academic_data.get('confidence_scores', {}),
+            'search_results': search_results,
+            'text_data': self._extract_text_data(search_results),
+            'network_metrics': network_metrics
+        }
+    
+    def compute_fingerprints(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        """Отпечатки входных данных каждого анализатора"""
+        profile_fp = _fingerprint(inputs['academic_profile'])
+        results_fp = _fingerprint(inputs['search_results'])
+        
+        fingerprints = {
+            'personality': _fingerprint('personality', profile_fp, inputs['text_data']),
+            'network': _fingerprint('network', profile_fp, results_fp, inputs['network_metrics']),
+            'career': _fingerprint('career', profile_fp),
+            'impact': _fingerprint('impact', profile_fp, results_fp),
+            'confidence': _fingerprint('confidence', inputs['confidence_scores'], results_fp)
+        }
+        # Визуализация строится из всего двойника
+        fingerprints['visualization'] = _fingerprint('visualization', inputs['email'], fingerprints)
+        return fingerprints
+    
+    def changed_analyzers(self, previous: Optional[Dict[str, Any]], email: str,
+                          academic_data: Dict[str, Any],
+                          search_results: List[Dict[str, Any]]) -> List[str]:
+        """Анализаторы, входные данные которых изменились с построения сохраненного двойника"""
+        fingerprints = self.compute_fingerprints(self.build_inputs(email, academic_data, search_results))
+        previous_fingerprints = (previous or {}).get('input_fingerprints') or {}
+        return [name for name in self.ANALYZER_FIELDS
+                if previous_fingerprints.get(name) != fingerprints[name]]
+    
+    def _reuse(self, previous: Optional[Dict[str, Any]], name: str,
+               fingerprints: Dict[str, str]) -> Optional[Any]:
+        """Сохраненный результат анализатора, если его входные данные не изменились"""
+        if not previous:
+            return None
+        if (previous.get('input_fingerprints') or {}).get(name) != fingerprints[name]:
+            return None
+        
+        field_name, result_class = self.ANALYZER_FIELDS[name]
+        value = previous.get(field_name)
+        if value is None:
+            return None
+        if result_class is None:
+            return value
+        try:
+            return result_class(**value)
+        except TypeError:
+            # Формат результата изменился - пересчитываем
+            return None
+    
     def create_digital_twin(self, email: str, academic_data: Dict[str, Any], 
-                           search_results: List[Dict[str, Any]]) -> DigitalTwin:
-        """Создание цифрового двойника"""
+                           search_results: List[Dict[str, Any]],
+                           previous: Optional[Dict[str, Any]] = None) -> DigitalTwin:
+        """
+        Создание цифрового двойника
+        
+        previous - сохраненный ранее двойник (twin_to_dict): результаты
+        анализаторов с неизменившимися входными данными берутся из него.
+        """
         logger.info(f"Creating digital twin for {email}")
         
         twin = DigitalTwin()
         twin.email = email
         twin.creation_timestamp = datetime.now().isoformat()
         
+        inputs = self.build_inputs(email, academic_data, search_results)
+        fingerprints = self.compute_fingerprints(inputs)
+        twin.input_fingerprints = fingerprints
+        
         # Основная информация
-        academic_profile = academic_data.get('academic_profile', {})
+        academic_profile = inputs['academic_profile']
         twin.academic_profile = academic_profile
         twin.name = academic_profile.get('name')
         
@@ -807,35 +1004,50 @@ class DigitalTwinCreator:
         twin.primary_affiliation = institutions[0] if institutions else None
         
         # Анализ личности
-        text_data = self._extract_text_data(search_results)
-        twin.personality_profile = self.personality_analyzer.analyze_personality(
-            text_data, academic_profile
-        )
+        twin.personality_profile = self._reuse(previous, 'personality', fingerprints)
+        if twin.personality_profile is None:
+            twin.personality_profile = self.personality_analyzer.analyze_personality(
+                inputs['text_data'], academic_profile
+            )
+            twin.recomputed_analyzers.append('personality')
         
         # Сетевой анализ
-        twin.network_analysis = self.network_analyzer.analyze_network(
-            academic_profile, search_results
-        )
+        twin.network_analysis = self._reuse(previous, 'network', fingerprints)
+        if twin.network_analysis is None:
+            twin.network_analysis = self.network_analyzer.analyze_network(
+                academic_profile, search_results, inputs['network_metrics']
+            )
+            twin.recomputed_analyzers.append('network')
         
         # Карьерный анализ
-        twin.career_trajectory = self.career_analyzer.analyze_career(academic_profile)
+        twin.career_trajectory = self._reuse(previous, 'career', fingerprints)
+        if twin.career_trajectory is None:
+            twin.career_trajectory = self.career_analyzer.analyze_career(academic_profile)
+            twin.recomputed_analyzers.append('career')
         
         # Анализ воздействия
-        twin.impact_metrics = self.impact_analyzer.analyze_impact(
-            academic_profile, search_results
-        )
+        twin.impact_metrics = self._reuse(previous, 'impact', fingerprints)
+        if twin.impact_metrics is None:
+            twin.impact_metrics = self.impact_analyzer.analyze_impact(
+                academic_profile, search_results
+            )
+            twin.recomputed_analyzers.append('impact')
         
         # Расчет показателей качества
         twin.confidence_score = self._calculate_confidence_score(academic_data, search_results)
         twin.completeness_score = self._calculate_completeness_score(twin)
         
         # Генерация данных для визуализации
-        twin.visualization_data = self.visualization_generator.generate_visualization_data(twin)
+        twin.visualization_data = self._reuse(previous, 'visualization', fingerprints)
+        if twin.visualization_data is None:
+            twin.visualization_data = self.visualization_generator.generate_visualization_data(twin)
+            twin.recomputed_analyzers.append('visualization')
         
         # Источники данных
         twin.data_sources = self._extract_data_sources(search_results)
         
-        logger.info(f"Digital twin created for {email} with confidence {twin.confidence_score:.2f}")
+        logger.info(f"Digital twin created for {email} with confidence {twin.confidence_score:.2f} "
+                    f"(recomputed: {', '.join(twin.recomputed_analyzers) or 'none'})")
         
         return twin
     
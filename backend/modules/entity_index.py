@@ -0,0 +1,270 @@
+"""
+Инвертированный индекс сущностей для связывания профилей
+
+Для каждого профиля в таблицу profile_entities записываются
+нормализованные ключи: URL социальных профилей, телефоны в формате
+E.164, имена пользователей (platform:username) и имена. Поиск профилей,
+разделяющих LinkedIn, телефон или имя пользователя, выполняется одним
+запросом по индексу (kind, value) без чтения данных профилей.
+
+Индекс обновляется при каждой записи профиля: обработчик before_flush
+сессии сравнивает ключи измененных профилей с сохраненными и вносит
+разницу в той же транзакции (обработчик регистрируется при импорте
+модуля).
+"""
+
+import re
+import logging
+from typing import Dict, List, Any, Optional, Set, Tuple, Iterable
+from urllib.parse import urlparse
+
+from sqlalchemy import event, delete, func, inspect, and_, tuple_
+from sqlalchemy.orm import Session, aliased
+
+from config.settings import settings
+from database.models import EmailProfile, ProfileEntity
+from modules.data_collector import DataCollector
+from modules.url_canonicalizer import canonicalize_url
+
+try:
+    import phonenumbers
+    PHONENUMBERS_AVAILABLE = True
+except ImportError:
+    PHONENUMBERS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+ENTITY_KINDS = ('url', 'phone', 'username', 'name')
+
+# Ключи данных профиля, из которых строится индекс
+INDEXED_KEYS = ('person_info', 'social_profiles', 'phone_numbers', 'academic_profile')
+
+# Код страны и национальный префикс для номеров без кода страны
+_REGION_CODES = {
+    'RU': ('7', '8'),
+    'KZ': ('7', '8'),
+    'BY': ('375', '8'),
+    'UA': ('380', '0'),
+    'US': ('1', '1'),
+    'CA': ('1', '1'),
+    'GB': ('44', '0'),
+    'DE': ('49', '0'),
+    'FR': ('33', '0')
+}
+
+# Сегменты пути, которые не являются именем пользователя
+_NON_USERNAMES = {'', 'in', 'pub', 'profile', 'people', 'user', 'users', 'home', 'search', 'share'}
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Канонический URL без схемы, параметров и завершающего слэша: 'linkedin.com/in/jdoe'"""
+    if not url or not isinstance(url, str):
+        return None
+    parsed = urlparse(canonicalize_url(url))
+    if parsed.scheme != 'https' or not parsed.netloc:
+        return None
+    # Имена пользователей в социальных сетях не зависят от регистра
+    return f'{parsed.netloc}{parsed.path.lower()}'[:500]
+
+
+def normalize_phone(phone: str, region: Optional[str] = None) -> Optional[str]:
+    """Номер в формате E.164 (+79161234567) или None для некорректного номера"""
+    if not phone or not isinstance(phone, str):
+        return None
+    region = (region or settings.ENTITY_PHONE_DEFAULT_REGION).upper()
+
+    if PHONENUMBERS_AVAILABLE:
+        try:
+            number = phonenumbers.parse(phone, region)
+        except phonenumbers.NumberParseException:
+            return None
+        if not phonenumbers.is_possible_number(number):
+            return None
+        return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+    raw = phone.strip()
+    digits = re.sub(r'\D', '', raw)
+    if raw.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif region in _REGION_CODES:
+        # Национальный префикс заменяется кодом страны; длинный номер уже содержит код
+        country_code, trunk_prefix = _REGION_CODES[region]
+        if digits.startswith(trunk_prefix):
+            digits = country_code + digits[len(trunk_prefix):]
+        elif len(digits) <= 10:
+            digits = country_code + digits
+
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f'+{digits}'
+
+
+def normalize_username(platform: Optional[str], url: str) -> Optional[str]:
+    """Имя пользователя из URL профиля: 'github:jdoe'"""
+    normalized = normalize_url(url)
+    if not normalized:
+        return None
+    username = DataCollector._extract_username_from_url(normalized).lstrip('@')
+    if username in _NON_USERNAMES or username == normalized:
+        return None
+    platform = (platform or normalized.split('/')[0].rsplit('.', 1)[0]).lower().strip()
+    return f'{platform}:{username}'[:500]
+
+
+def normalize_name(name: str) -> Optional[str]:
+    """Имя в нижнем регистре без знаков препинания; одно слово не индексируется"""
+    if not name or not isinstance(name, str):
+        return None
+    words = re.sub(r'[^\w\s-]', ' ', name.casefold()).split()
+    if len(words) < 2:
+        return None
+    return ' '.join(words)[:500]
+
+
+def profile_entities(data: Dict[str, Any]) -> Set[Tuple[str, str]]:
+    """Нормализованные ключи (kind, value) данных профиля"""
+    if not isinstance(data, dict):
+        return set()
+    entities = set()
+
+    def add(kind: str, value: Optional[str]) -> None:
+        if value:
+            entities.add((kind, value))
+
+    for social_profile in data.get('social_profiles') or []:
+        if not isinstance(social_profile, dict):
+            continue
+        url = social_profile.get('url')
+        add('url', normalize_url(url))
+        add('username', normalize_username(social_profile.get('platform'), url))
+
+    for phone in data.get('phone_numbers') or []:
+        add('phone', normalize_phone(phone))
+
+    person_info = data.get('person_info') or {}
+    academic_profile = data.get('academic_profile') or {}
+    for name in (person_info.get('name'), academic_profile.get('name')):
+        add('name', normalize_name(name))
+
+    return entities
+
+
+class EntityIndex:
+    """Обновление индекса сущностей и поиск связанных профилей"""
+
+    def update_profile(self, db: Session, email: str, data: Dict[str, Any]) -> Dict[str, int]:
+        """Приведение ключей профиля к актуальным данным (без фиксации транзакции)"""
+        entities = profile_entities(data)
+        with db.no_autoflush:
+            existing = set(db.query(ProfileEntity.kind, ProfileEntity.value).filter(
+                ProfileEntity.profile_email == email
+            ).all())
+
+        removed = existing - entities
+        added = entities - existing
+        if removed:
+            db.execute(delete(ProfileEntity).where(
+                ProfileEntity.profile_email == email,
+                tuple_(ProfileEntity.kind, ProfileEntity.value).in_(list(removed))
+            ))
+        for kind, value in added:
+            db.add(ProfileEntity(kind=kind, value=value, profile_email=email))
+        return {'added': len(added), 'removed': len(removed)}
+
+    def delete_profile(self, db: Session, email: str) -> None:
+        """Удаление ключей удаленного профиля (без фиксации транзакции)"""
+        db.execute(delete(ProfileEntity).where(ProfileEntity.profile_email == email))
+
+    def rebuild(self, db: Session, batch_size: int = 500) -> Dict[str, int]:
+        """Построение индекса по всем существующим профилям"""
+        db.execute(delete(ProfileEntity))
+        columns = [EmailProfile.data[key].label(key) for key in INDEXED_KEYS]
+        profiles = entries = 0
+        last_email = ''
+        # Порции по email: в памяти не больше batch_size строк, а commit между
+        # порциями не закрывает курсор незавершенного запроса
+        while True:
+            rows = db.query(EmailProfile.email, *columns).filter(
+                EmailProfile.email > last_email
+            ).order_by(EmailProfile.email).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                entities = profile_entities({key: getattr(row, key) for key in INDEXED_KEYS})
+                db.add_all(ProfileEntity(kind=kind, value=value, profile_email=row.email)
+                           for kind, value in entities)
+                profiles += 1
+                entries += len(entities)
+            db.commit()
+            last_email = rows[-1].email
+        db.commit()
+        return {'profiles': profiles, 'entries': entries}
+
+    def lookup(self, db: Session, kind: str, value: str) -> Tuple[Optional[str], List[str]]:
+        """(нормализованное значение, email профилей) для значения сущности"""
+        normalized = self.normalize(kind, value)
+        if not normalized:
+            return None, []
+        emails = [email for (email,) in db.query(ProfileEntity.profile_email).filter(
+            ProfileEntity.kind == kind, ProfileEntity.value == normalized
+        ).order_by(ProfileEntity.profile_email).all()]
+        return normalized, emails
+
+    def normalize(self, kind: str, value: str) -> Optional[str]:
+        """Нормализация значения из запроса (имя пользователя - platform:username или URL)"""
+        if kind == 'url':
+            return normalize_url(value)
+        if kind == 'phone':
+            return normalize_phone(value)
+        if kind == 'name':
+            return normalize_name(value)
+        if '/' in value:
+            return normalize_username(None, value)
+        platform, _, username = value.partition(':')
+        username = username.lower().lstrip('@').strip()
+        return f'{platform.lower().strip()}:{username}' if username else None
+
+    def linked_profiles(self, db: Session, email: str, kinds: Optional[Iterable[str]] = None,
+                        limit: int = 100) -> List[Dict[str, Any]]:
+        """Профили, разделяющие с email хотя бы один ключ, по убыванию числа совпадений"""
+        own = aliased(ProfileEntity)
+        other = aliased(ProfileEntity)
+        query = db.query(other.profile_email, own.kind, own.value).join(
+            other, and_(other.kind == own.kind, other.value == own.value)
+        ).filter(own.profile_email == email, other.profile_email != email)
+        if kinds:
+            query = query.filter(own.kind.in_(list(kinds)))
+
+        linked: Dict[str, List[Dict[str, str]]] = {}
+        for linked_email, kind, value in query.all():
+            linked.setdefault(linked_email, []).append({'kind': kind, 'value': value})
+
+        result = [{'email': linked_email, 'matches': matches} for linked_email, matches in linked.items()]
+        result.sort(key=lambda item: (-len(item['matches']), item['email']))
+        return result[:limit]
+
+    def get_stats(self, db: Session) -> Dict[str, Any]:
+        """Число ключей по типам и число проиндексированных профилей"""
+        counts = dict(db.query(ProfileEntity.kind, func.count(ProfileEntity.id)).group_by(ProfileEntity.kind).all())
+        profiles = db.query(func.count(func.distinct(ProfileEntity.profile_email))).scalar()
+        return {'entries': counts, 'profiles': profiles or 0}
+
+
+# Глобальный индекс сущностей
+entity_index = EntityIndex()
+
+
+@event.listens_for(Session, 'before_flush')
+def _index_profile_entities(session: Session, flush_context, instances) -> None:
+    """Обновление индекса для новых, измененных и удаленных профилей в той же транзакции"""
+    for obj in session.deleted:
+        if isinstance(obj, EmailProfile) and obj.email:
+            entity_index.delete_profile(session, obj.email)
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, EmailProfile) or not obj.email:
+            continue
+        if obj not in session.new and not inspect(obj).attrs.data.history.has_changes():
+            continue
+        entity_index.update_profile(session, obj.email, obj.data)
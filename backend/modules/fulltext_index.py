@@ -0,0 +1,523 @@
+"""
+Полнотекстовый индекс собранного содержимого
+
+Индексируются сниппеты результатов поиска (общего и академического),
+заголовки и описания просканированных страниц, а также заголовки,
+авторы, контексты упоминания email и текст PDF документов. Каждая
+единица содержимого - отдельный документ с привязкой к профилю, типу
+и URL.
+
+Хранилище подключаемое (settings.FULLTEXT_BACKEND):
+    sqlite        - встроенный индекс SQLite FTS5 в отдельном файле,
+                    внешний сервис не нужен (по умолчанию)
+    elasticsearch - индекс settings.ELASTICSEARCH_INDEX в кластере
+                    settings.ELASTICSEARCH_URL
+    none          - индексирование отключено
+
+Профиль переиндексируется после фиксации транзакции, в которой
+изменились его данные; документы профиля заменяются целиком, если
+изменился их отпечаток. Документы удаленного профиля удаляются после
+фиксации удаления. Фиксация только ставит профиль в очередь:
+индексирует фоновый поток, поэтому commit() в обработчике запроса не
+ждет хранилища индекса.
+"""
+
+import re
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from database.models import EmailProfile
+
+try:
+    from elasticsearch import Elasticsearch
+    ELASTICSEARCH_AVAILABLE = True
+except ImportError:
+    ELASTICSEARCH_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Типы документов
+DOCUMENT_KINDS = ('search_result', 'academic_result', 'pdf')
+
+# Ключи данных профиля, из которых строятся документы
+INDEXED_KEYS = ('search_results', 'academic_search_results', 'pdf_documents')
+
+# Ограничение длины текста документа
+MAX_BODY_CHARS = 50000
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _join(*parts: Any) -> str:
+    return '\n'.join(str(part).strip() for part in parts if part and str(part).strip())
+
+
+def profile_documents(email: str, data: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Документы индекса из данных профиля"""
+    if not isinstance(data, dict):
+        return []
+    documents = []
+    seen = set()
+
+    def add(kind: str, url: Optional[str], title: str, body: str, position: int) -> None:
+        if not (title or body):
+            return
+        doc_id = f"{email}|{kind}|{url or position}"
+        if doc_id in seen:
+            return
+        seen.add(doc_id)
+        documents.append({
+            'doc_id': doc_id,
+            'profile_email': email,
+            'kind': kind,
+            'url': url or '',
+            'title': (title or '')[:1000],
+            'body': body[:MAX_BODY_CHARS]
+        })
+
+    for kind, key in (('search_result', 'search_results'), ('academic_result', 'academic_search_results')):
+        for position, result in enumerate(data.get(key) or []):
+            if not isinstance(result, dict):
+                continue
+            add(kind, result.get('url'), result.get('title') or result.get('page_title') or '',
+                _join(result.get('snippet'), result.get('page_title'), result.get('meta_description')),
+                position)
+
+    for position, document in enumerate(data.get('pdf_documents') or []):
+        if not isinstance(document, dict) or document.get('error'):
+            continue
+        contexts = [context.get('context') for context in document.get('email_contexts') or []
+                    if isinstance(context, dict)]
+        add('pdf', document.get('url'), document.get('title') or '',
+            _join(', '.join(document.get('authors') or []), ', '.join(document.get('institutions') or []),
+                  *contexts, document.get('text_excerpt')),
+            position)
+
+    return documents
+
+
+def documents_digest(documents: List[Dict[str, str]]) -> str:
+    payload = json.dumps(documents, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def query_terms(query: str) -> List[str]:
+    """Слова запроса (операторы и кавычки пользователя не передаются в движок)"""
+    return [token.lower() for token in _TOKEN_RE.findall(query or '')][:32]
+
+
+class FullTextBackend:
+    """Интерфейс хранилища полнотекстового индекса"""
+
+    name = 'none'
+
+    def profile_digest(self, email: str) -> Optional[str]:
+        """Отпечаток проиндексированных документов профиля (None - неизвестен)"""
+        return None
+
+    def replace_profile(self, email: str, documents: List[Dict[str, str]], digest: str) -> None:
+        """Замена всех документов профиля"""
+
+    def delete_profile(self, email: str) -> None:
+        self.replace_profile(email, [], '')
+
+    def indexed_emails(self) -> Iterable[str]:
+        """Email всех профилей, у которых есть документы в индексе"""
+        return []
+
+    def search(self, query: str, limit: int = 20, offset: int = 0, email: Optional[str] = None,
+               kinds: Optional[Iterable[str]] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """(общее число совпадений, страница результатов по убыванию релевантности)"""
+        return 0, []
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.name}
+
+
+class SQLiteFTSBackend(FullTextBackend):
+    """Индекс SQLite FTS5 (ранжирование BM25, заголовок весомее текста)"""
+
+    name = 'sqlite'
+
+    # Веса столбцов title, body для bm25()
+    TITLE_WEIGHT = 5.0
+    BODY_WEIGHT = 1.0
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.FULLTEXT_SQLITE_PATH
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ':memory:':
+            self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+                title, body,
+                doc_id UNINDEXED, profile_email UNINDEXED, kind UNINDEXED, url UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS profile_documents (
+                profile_email TEXT NOT NULL,
+                doc_rowid INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_profile_documents_email ON profile_documents (profile_email);
+            CREATE TABLE IF NOT EXISTS indexed_profiles (
+                profile_email TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                documents INTEGER NOT NULL
+            );
+        """)
+
+    def profile_digest(self, email: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT digest FROM indexed_profiles WHERE profile_email = ?', (email,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def replace_profile(self, email: str, documents: List[Dict[str, str]], digest: str) -> None:
+        with self._lock, self._connection:
+            # Столбцы UNINDEXED не индексируются, поэтому документы профиля удаляются по rowid
+            self._connection.execute(
+                'DELETE FROM documents WHERE rowid IN '
+                '(SELECT doc_rowid FROM profile_documents WHERE profile_email = ?)', (email,)
+            )
+            self._connection.execute('DELETE FROM profile_documents WHERE profile_email = ?', (email,))
+            for doc in documents:
+                cursor = self._connection.execute(
+                    'INSERT INTO documents (title, body, doc_id, profile_email, kind, url) VALUES (?, ?, ?, ?, ?, ?)',
+                    (doc['title'], doc['body'], doc['doc_id'], doc['profile_email'], doc['kind'], doc['url'])
+                )
+                self._connection.execute(
+                    'INSERT INTO profile_documents (profile_email, doc_rowid) VALUES (?, ?)',
+                    (email, cursor.lastrowid)
+                )
+            if documents:
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO indexed_profiles (profile_email, digest, documents) VALUES (?, ?, ?)',
+                    (email, digest, len(documents))
+                )
+            else:
+                self._connection.execute('DELETE FROM indexed_profiles WHERE profile_email = ?', (email,))
+
+    def indexed_emails(self) -> Iterable[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT DISTINCT profile_email FROM profile_documents '
+                'UNION SELECT profile_email FROM indexed_profiles'
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def search(self, query: str, limit: int = 20, offset: int = 0, email: Optional[str] = None,
+               kinds: Optional[Iterable[str]] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        terms = query_terms(query)
+        if not terms:
+            return 0, []
+        # Все слова обязательны, последнее - как префикс (поиск по мере ввода)
+        match = ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+
+        where, params = ['documents MATCH ?'], [match.strip()]
+        if email:
+            where.append('profile_email = ?')
+            params.append(email)
+        kinds = list(kinds or [])
+        if kinds:
+            where.append(f"kind IN ({','.join('?' * len(kinds))})")
+            params.extend(kinds)
+        condition = ' AND '.join(where)
+
+        with self._lock:
+            total = self._connection.execute(
+                f'SELECT count(*) FROM documents WHERE {condition}', params
+            ).fetchone()[0]
+            rows = self._connection.execute(
+                f"""SELECT profile_email, kind, url, title,
+                           snippet(documents, 1, '<b>', '</b>', '…', 24),
+                           bm25(documents, {self.TITLE_WEIGHT}, {self.BODY_WEIGHT}) AS rank
+                    FROM documents WHERE {condition}
+                    ORDER BY rank LIMIT ? OFFSET ?""",
+                params + [limit, offset]
+            ).fetchall()
+
+        return total, [{
+            'email': row[0],
+            'kind': row[1],
+            'url': row[2],
+            'title': row[3],
+            'snippet': row[4],
+            # bm25() в SQLite отрицателен: чем меньше, тем релевантнее
+            'score': round(-row[5], 6)
+        } for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            documents, profiles = self._connection.execute(
+                'SELECT coalesce(sum(documents), 0), count(*) FROM indexed_profiles'
+            ).fetchone()
+        return {'backend': self.name, 'path': self.path, 'documents': documents, 'profiles': profiles}
+
+
+class ElasticsearchBackend(FullTextBackend):
+    """
+    Индекс Elasticsearch
+
+    client - клиент elasticsearch-py или совместимый объект (например,
+    локальная заглушка в тестах) с методами bulk, delete_by_query, search,
+    count и indices.exists/create.
+    """
+
+    name = 'elasticsearch'
+
+    MAPPINGS = {
+        'properties': {
+            'title': {'type': 'text'},
+            'body': {'type': 'text'},
+            'doc_id': {'type': 'keyword'},
+            'profile_email': {'type': 'keyword'},
+            'kind': {'type': 'keyword'},
+            'url': {'type': 'keyword', 'index': False},
+            # Отпечаток всех документов профиля (одинаков у документов одного профиля)
+            'digest': {'type': 'keyword', 'index': False}
+        }
+    }
+
+    def __init__(self, client=None, index: Optional[str] = None):
+        if client is None:
+            if not ELASTICSEARCH_AVAILABLE:
+                raise RuntimeError("Elasticsearch backend requires the elasticsearch package")
+            client = Elasticsearch(settings.ELASTICSEARCH_URL)
+        self.client = client
+        self.index = index or settings.ELASTICSEARCH_INDEX
+        if not self.client.indices.exists(index=self.index):
+            self.client.indices.create(index=self.index, mappings=self.MAPPINGS)
+
+    def profile_digest(self, email: str) -> Optional[str]:
+        response = self.client.search(index=self.index, query={'term': {'profile_email': email}},
+                                      source=['digest'], size=1)
+        hits = response['hits']['hits']
+        return hits[0]['_source'].get('digest') if hits else None
+
+    def replace_profile(self, email: str, documents: List[Dict[str, str]], digest: str) -> None:
+        # Документы с прежними id перезаписываются, остальные документы профиля удаляются;
+        # принудительный refresh не нужен - изменения станут видны с очередным обновлением индекса
+        if documents:
+            operations = []
+            for doc in documents:
+                operations.append({'index': {'_index': self.index, '_id': doc['doc_id']}})
+                operations.append({**doc, 'digest': digest})
+            self.client.bulk(operations=operations)
+        self.client.delete_by_query(index=self.index, conflicts='proceed', query={'bool': {
+            'filter': {'term': {'profile_email': email}},
+            'must_not': {'ids': {'values': [doc['doc_id'] for doc in documents]}}
+        }})
+
+    def indexed_emails(self) -> Iterable[str]:
+        # Составная агрегация отдает все значения profile_email порциями
+        after = None
+        while True:
+            composite = {'size': 1000, 'sources': [{'email': {'terms': {'field': 'profile_email'}}}]}
+            if after:
+                composite['after'] = after
+            response = self.client.search(index=self.index, size=0, aggs={'emails': {'composite': composite}})
+            aggregation = response['aggregations']['emails']
+            for bucket in aggregation['buckets']:
+                yield bucket['key']['email']
+            after = aggregation.get('after_key')
+            if not after or not aggregation['buckets']:
+                return
+
+    def search(self, query: str, limit: int = 20, offset: int = 0, email: Optional[str] = None,
+               kinds: Optional[Iterable[str]] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        terms = query_terms(query)
+        if not terms:
+            return 0, []
+        filters = []
+        if email:
+            filters.append({'term': {'profile_email': email}})
+        kinds = list(kinds or [])
+        if kinds:
+            filters.append({'terms': {'kind': kinds}})
+
+        response = self.client.search(
+            index=self.index,
+            query={'bool': {
+                'must': {'multi_match': {'query': ' '.join(terms), 'fields': ['title^5', 'body'],
+                                         'operator': 'and'}},
+                'filter': filters
+            }},
+            highlight={'fields': {'body': {'fragment_size': 160, 'number_of_fragments': 1}},
+                       'pre_tags': ['<b>'], 'post_tags': ['</b>']},
+            from_=offset,
+            size=limit,
+            track_total_hits=True
+        )
+        hits = response['hits']
+        results = []
+        for hit in hits['hits']:
+            source = hit['_source']
+            fragments = hit.get('highlight', {}).get('body') or [source.get('body', '')[:160]]
+            results.append({
+                'email': source['profile_email'],
+                'kind': source['kind'],
+                'url': source['url'],
+                'title': source['title'],
+                'snippet': fragments[0],
+                'score': round(hit['_score'] or 0.0, 4)
+            })
+        return hits['total']['value'], results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'index': self.index,
+            'documents': self.client.count(index=self.index)['count']
+        }
+
+
+def create_backend(name: Optional[str] = None) -> FullTextBackend:
+    """Хранилище индекса по имени из настроек"""
+    name = (name or settings.FULLTEXT_BACKEND).lower()
+    if name == 'sqlite':
+        return SQLiteFTSBackend()
+    if name == 'elasticsearch':
+        return ElasticsearchBackend()
+    return FullTextBackend()
+
+
+class FullTextIndex:
+    """Индексирование профилей и поиск по собранному содержимому"""
+
+    def __init__(self, backend: Optional[FullTextBackend] = None):
+        self._backend = backend
+        self._lock = threading.Lock()
+
+        # Очередь индексирования: email -> данные профиля (None - удаление)
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._pending_lock = threading.Lock()
+        self._process_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def backend(self) -> FullTextBackend:
+        # Хранилище создается при первом обращении, чтобы импорт не открывал файлы и соединения
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = create_backend()
+        return self._backend
+
+    def index_profile(self, email: str, data: Dict[str, Any]) -> bool:
+        """Переиндексация профиля; False, если документы не изменились"""
+        documents = profile_documents(email, data)
+        digest = documents_digest(documents)
+        indexed_digest = self.backend.profile_digest(email)
+        if indexed_digest == digest or (not documents and indexed_digest is None):
+            return False
+        self.backend.replace_profile(email, documents, digest)
+        return True
+
+    def enqueue(self, email: str, data: Optional[Dict[str, Any]]) -> None:
+        """Постановка профиля в очередь индексирования (data=None - удаление документов)"""
+        with self._pending_lock:
+            self._pending[email] = data
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='fulltext-indexer', daemon=True)
+                    self._thread.start()
+        self._wakeup.set()
+
+    def process_pending(self) -> int:
+        """Индексирование профилей из очереди; возвращает число обработанных профилей"""
+        with self._process_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            for email, data in pending.items():
+                try:
+                    if data is None:
+                        self.backend.delete_profile(email)
+                    else:
+                        self.index_profile(email, data)
+                except Exception as e:
+                    # Ошибка индексирования не отменяет сохранение профиля
+                    logger.error(f"Error indexing content of {email}: {e}")
+            return len(pending)
+
+    def pending_count(self) -> int:
+        with self._pending_lock:
+            return len(self._pending)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.process_pending()
+
+    def rebuild(self, db: Session, batch_size: int = 200) -> Dict[str, int]:
+        """Переиндексация всех профилей и удаление документов несуществующих профилей"""
+        columns = [EmailProfile.data[key].label(key) for key in INDEXED_KEYS]
+        profiles = documents = 0
+        emails = set()
+        for row in db.query(EmailProfile.email, *columns).yield_per(batch_size):
+            data = {key: getattr(row, key) for key in INDEXED_KEYS}
+            profile_docs = profile_documents(row.email, data)
+            self.backend.replace_profile(row.email, profile_docs, documents_digest(profile_docs))
+            emails.add(row.email)
+            profiles += 1
+            documents += len(profile_docs)
+
+        stale = [email for email in self.backend.indexed_emails() if email not in emails]
+        for email in stale:
+            self.backend.delete_profile(email)
+        return {'profiles': profiles, 'documents': documents, 'removed_profiles': len(stale)}
+
+    def search(self, query: str, limit: int = 20, offset: int = 0, email: Optional[str] = None,
+               kinds: Optional[Iterable[str]] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        return self.backend.search(query, limit, offset, email, kinds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.backend.stats(), 'pending': self.pending_count()}
+
+
+# Глобальный полнотекстовый индекс
+fulltext_index = FullTextIndex()
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changed_profiles(session: Session, flush_context, instances) -> None:
+    """Запоминание профилей с измененными данными и удаленных профилей до фиксации транзакции"""
+    if settings.FULLTEXT_BACKEND.lower() == 'none':
+        return
+    for obj in session.deleted:
+        if isinstance(obj, EmailProfile) and obj.email:
+            # None - документы профиля удаляются из индекса
+            session.info.setdefault('fulltext_pending', {})[obj.email] = None
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, EmailProfile) or not obj.email:
+            continue
+        if obj in session.new or inspect(obj).attrs.data.history.has_changes():
+            session.info.setdefault('fulltext_pending', {})[obj.email] = obj.data
+
+
+@event.listens_for(Session, 'after_commit')
+def _index_committed_profiles(session: Session) -> None:
+    """Постановка профилей в очередь индексирования после успешной фиксации"""
+    pending = session.info.pop('fulltext_pending', None)
+    for email, data in (pending or {}).items():
+        if isinstance(data, dict):
+            # Копия индексируемых ключей: поток индексирования не читает объект сессии
+            data = {key: data.get(key) for key in INDEXED_KEYS}
+        fulltext_index.enqueue(email, data)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_profiles(session: Session) -> None:
+    session.info.pop('fulltext_pending', None)
@@ -0,0 +1,317 @@
+"""
+Дисковый HTTP-кэш страниц, общий для всех загрузчиков
+
+Страницы факультетов, профилей и каталогов повторяются в анализах
+разных email одной организации. Тела ответов 200 сохраняются в SQLite
+(settings.HTTP_CACHE_PATH) в сжатом zlib виде вместе с ETag и
+Last-Modified:
+
+    - свежая запись (срок из Cache-Control: max-age, Expires или
+      эвристики по Last-Modified) отдается без обращения к серверу;
+    - устаревшая запись с валидаторами перепроверяется условным
+      запросом (If-None-Match / If-Modified-Since), ответ 304 продлевает
+      ее без повторной загрузки тела;
+    - no-store, Vary: * и запросы с Authorization не кэшируются,
+      no-cache сохраняется, но перепроверяется при каждом обращении;
+    - при превышении HTTP_CACHE_MAX_BYTES удаляются записи, к которым
+      дольше всего не обращались (LRU).
+
+Чтение и запись SQLite, сжатие и вытеснение выполняются в отдельном пуле
+потоков (CACHE_IO_WORKERS), а не в цикле событий загрузчиков.
+"""
+
+import re
+import json
+import asyncio
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+
+from config.settings import settings
+from .metrics import record_cache_lookup, track_http_request
+from .url_canonicalizer import cache_key
+from .http_stream import read_body, detect_charset, decode_body, CHARSET_SNIFF_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Заголовки ответа, сохраняемые вместе с телом
+STORED_HEADERS = ('content-type', 'etag', 'last-modified', 'content-language')
+
+_MAX_AGE_RE = re.compile(r'max-age\s*=\s*"?(\d+)', re.IGNORECASE)
+
+# Потоки для операций с файлом кэша (SQLite все равно выполняет их по одной)
+CACHE_IO_WORKERS = 2
+
+# Доля возраста документа (Date - Last-Modified), в течение которой он считается свежим
+HEURISTIC_FRACTION = 0.1
+
+
+@dataclass
+class CachedResponse:
+    """Ответ сервера или кэша"""
+    url: str
+    status: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b''
+    from_cache: bool = False
+    revalidated: bool = False
+    truncated: bool = False
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get('content-type', '')
+
+    @property
+    def charset(self) -> str:
+        return detect_charset(self.content_type, self.body[:CHARSET_SNIFF_BYTES])
+
+    def text(self) -> str:
+        return decode_body(self.body, self.content_type)
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def cache_policy(headers, now: float) -> Optional[float]:
+    """
+    Срок свежести ответа (unix time) или None, если ответ нельзя сохранять
+
+    Кэш частный, поэтому private допускается, а s-maxage не учитывается.
+    """
+    cache_control = (headers.get('cache-control') or '').lower()
+    if 'no-store' in cache_control or (headers.get('vary') or '').strip() == '*':
+        return None
+    if 'no-cache' in cache_control:
+        return now
+
+    max_age = _MAX_AGE_RE.search(cache_control)
+    if max_age:
+        try:
+            age = int(headers.get('age') or 0)
+        except ValueError:
+            age = 0
+        return now + max(int(max_age.group(1)) - age, 0)
+
+    expires = headers.get('expires')
+    if expires:
+        expires_at = _parse_http_date(expires)
+        # Некорректный Expires (например, "0") означает, что ответ уже устарел
+        return expires_at if expires_at is not None else now
+
+    last_modified = _parse_http_date(headers.get('last-modified'))
+    if last_modified:
+        date = _parse_http_date(headers.get('date')) or now
+        lifetime = HEURISTIC_FRACTION * max(date - last_modified, 0)
+        return now + min(lifetime, settings.HTTP_CACHE_DEFAULT_TTL)
+    return now + settings.HTTP_CACHE_DEFAULT_TTL
+
+
+class HttpCache:
+    """HTTP-кэш в SQLite с условной перепроверкой и вытеснением LRU"""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        self.path = path or settings.HTTP_CACHE_PATH
+        self.max_bytes = max_bytes or settings.HTTP_CACHE_MAX_BYTES
+        self.enabled = settings.HTTP_CACHE_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+        self._connection = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._total_bytes = 0
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Соединение открывается при первом обращении"""
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            if self.path != ':memory:':
+                connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_http_cache_accessed ON http_cache (accessed_at);
+            """)
+            self._total_bytes = connection.execute('SELECT COALESCE(SUM(size), 0) FROM http_cache').fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, func, *args):
+        """Выполнение операции с кэшем в пуле потоков кэша"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=CACHE_IO_WORKERS, thread_name_prefix='http-cache')
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Запись кэша с распакованным телом или None"""
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT url, headers, body, etag, last_modified, expires_at FROM http_cache WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        url, headers, body, etag, last_modified, expires_at = row
+        return {
+            'url': url,
+            'headers': json.loads(headers),
+            'body': zlib.decompress(body),
+            'etag': etag,
+            'last_modified': last_modified,
+            'expires_at': expires_at
+        }
+
+    def _touch(self, key: str, expires_at: Optional[float] = None) -> None:
+        now = time.time()
+        with self._lock, self.connection:
+            if expires_at is None:
+                self.connection.execute('UPDATE http_cache SET accessed_at = ? WHERE key = ?', (now, key))
+            else:
+                self.connection.execute(
+                    'UPDATE http_cache SET accessed_at = ?, expires_at = ? WHERE key = ?', (now, expires_at, key)
+                )
+
+    def _store(self, key: str, response: CachedResponse, expires_at: float) -> None:
+        compressed = zlib.compress(response.body, settings.HTTP_CACHE_COMPRESSION_LEVEL)
+        # Одна запись не должна вытеснять большую часть кэша
+        if len(compressed) > self.max_bytes // 10:
+            return
+        headers = json.dumps(response.headers)
+        now = time.time()
+        with self._lock, self.connection:
+            previous = self.connection.execute('SELECT size FROM http_cache WHERE key = ?', (key,)).fetchone()
+            self.connection.execute(
+                'INSERT OR REPLACE INTO http_cache '
+                '(key, url, headers, body, size, etag, last_modified, stored_at, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, response.url, headers, compressed, len(compressed), response.headers.get('etag'),
+                 response.headers.get('last-modified'), now, expires_at, now)
+            )
+            self._total_bytes += len(compressed) - (previous[0] if previous else 0)
+            self.stats['stored'] += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Удаление давно не использованных записей до 90% бюджета (под блокировкой)"""
+        target = int(self.max_bytes * 0.9)
+        # Другие процессы могли изменить файл: объем пересчитывается перед вытеснением
+        total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM http_cache').fetchone()[0]
+        evicted = 0
+        for key, size in self.connection.execute('SELECT key, size FROM http_cache ORDER BY accessed_at').fetchall():
+            if total <= target:
+                break
+            self.connection.execute('DELETE FROM http_cache WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+        self._total_bytes = total
+        self.stats['evicted'] += evicted
+        if evicted:
+            logger.info(f"HTTP cache evicted {evicted} entries, {total} bytes left")
+
+    async def fetch(self, session, url: str, fetcher: str = 'http_cache',
+                    headers: Optional[Dict[str, str]] = None, max_bytes: Optional[int] = None,
+                    head_only: bool = False, **kwargs) -> CachedResponse:
+        """
+        GET через кэш; ошибки соединения и чтения пробрасываются вызывающему коду
+
+        Возвращает ответ с телом для статуса 200 (в том числе из кэша) и
+        ответ без тела для остальных статусов. Тело читается потоково
+        (http_stream.read_body): больше max_bytes - BodyTooLarge, с
+        head_only - только до </head>; усеченное тело не сохраняется.
+        """
+        headers = dict(headers or {})
+        cacheable = self.enabled and not any(name.lower() == 'authorization' for name in headers)
+        key = cache_key(url)
+        entry = None
+        if cacheable:
+            try:
+                entry = await self._run(self._load, key)
+            except sqlite3.Error as e:
+                logger.warning(f"HTTP cache lookup failed for {url}: {e}")
+
+        now = time.time()
+        if entry and entry['expires_at'] > now:
+            await self._run(self._touch, key)
+            self.stats['hits'] += 1
+            record_cache_lookup('http_cache', True)
+            return CachedResponse(entry['url'], 200, entry['headers'], entry['body'], from_cache=True)
+
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        with track_http_request(fetcher):
+            async with session.get(url, headers=headers, **kwargs) as response:
+                if response.status == 304 and entry:
+                    expires_at = cache_policy(response.headers, time.time())
+                    await self._run(self._touch, key, expires_at if expires_at is not None else time.time())
+                    self.stats['revalidated'] += 1
+                    record_cache_lookup('http_cache', True)
+                    return CachedResponse(entry['url'], 200, entry['headers'], entry['body'],
+                                          from_cache=True, revalidated=True)
+
+                result = CachedResponse(
+                    str(response.url), response.status,
+                    {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+                )
+                if cacheable:
+                    self.stats['misses'] += 1
+                    record_cache_lookup('http_cache', False)
+                if response.status != 200:
+                    return result
+                result.body, result.truncated = await read_body(response, max_bytes, head_only=head_only)
+                expires_at = None
+                if cacheable and not result.truncated:
+                    expires_at = cache_policy(response.headers, time.time())
+
+        if expires_at is not None:
+            try:
+                await self._run(self._store, key, result, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"HTTP cache store failed for {url}: {e}")
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self.connection.execute('SELECT COUNT(*) FROM http_cache').fetchone()[0]
+        return {
+            **self.stats,
+            'entries': entries,
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'enabled': self.enabled
+        }
+
+    def clear(self) -> int:
+        with self._lock, self.connection:
+            removed = self.connection.execute('DELETE FROM http_cache').rowcount
+            self._total_bytes = 0
+        return removed
+
+
+# Глобальный HTTP-кэш
+http_cache = HttpCache()
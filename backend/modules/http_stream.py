@@ -0,0 +1,120 @@
+"""
+Ограниченное потоковое чтение тел HTTP-ответов
+
+response.text() читает тело любого размера целиком, а медленный сервер
+удерживает слот соединения до общего таймаута сессии. read_body читает
+тело частями:
+
+    - ответ с Content-Length больше max_bytes отклоняется до чтения,
+      тело без Content-Length - как только превысит max_bytes
+      (BodyTooLarge);
+    - каждая часть должна прийти за read_timeout секунд
+      (asyncio.TimeoutError), иначе чтение прерывается;
+    - для извлечения только метаданных (head_only) чтение
+      останавливается после </head> или head_bytes байт, тело
+      возвращается усеченным.
+
+Кодировка определяется по BOM, заголовку Content-Type и мета-тегу
+в начале документа (detect_charset).
+"""
+
+import re
+import codecs
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Начало документа, в котором ищется <meta charset>
+CHARSET_SNIFF_BYTES = 4096
+
+_HEAD_END = b'</head'
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be')
+)
+
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+
+class BodyTooLarge(Exception):
+    """Тело ответа превышает допустимый размер"""
+
+    def __init__(self, url: str, limit: int, size: Optional[int] = None):
+        self.url = url
+        self.limit = limit
+        self.size = size
+        super().__init__(f"Response body of {url} exceeds {limit} bytes" + (f" ({size})" if size else ""))
+
+
+def _known_charset(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def detect_charset(content_type: str, first_chunk: bytes) -> str:
+    """Кодировка документа: BOM, затем Content-Type, затем <meta charset>, иначе utf-8"""
+    for bom, charset in _BOMS:
+        if first_chunk.startswith(bom):
+            return charset
+
+    header = _HEADER_CHARSET_RE.search(content_type or '')
+    charset = _known_charset(header.group(1)) if header else None
+    if charset:
+        return charset
+
+    meta = _META_CHARSET_RE.search(first_chunk[:CHARSET_SNIFF_BYTES])
+    charset = _known_charset(meta.group(1).decode('ascii', 'ignore')) if meta else None
+    return charset or 'utf-8'
+
+
+def decode_body(body: bytes, content_type: str = '') -> str:
+    return body.decode(detect_charset(content_type, body[:CHARSET_SNIFF_BYTES]), errors='replace')
+
+
+async def read_body(response, max_bytes: Optional[int] = None, read_timeout: Optional[float] = None,
+                    head_only: bool = False, head_bytes: Optional[int] = None) -> Tuple[bytes, bool]:
+    """
+    Тело ответа aiohttp и признак усечения
+
+    Превышение max_bytes без head_only - BodyTooLarge, задержка части
+    дольше read_timeout - asyncio.TimeoutError.
+    """
+    max_bytes = max_bytes or settings.HTTP_MAX_BODY_BYTES
+    read_timeout = read_timeout or settings.HTTP_READ_TIMEOUT
+    limit = min(head_bytes or settings.HTTP_HEAD_MAX_BYTES, max_bytes) if head_only else max_bytes
+    url = str(response.url)
+
+    length = response.content_length
+    if not head_only and length is not None and length > max_bytes:
+        raise BodyTooLarge(url, max_bytes, length)
+
+    body = bytearray()
+    while True:
+        chunk = await asyncio.wait_for(response.content.read(settings.HTTP_READ_CHUNK_BYTES), read_timeout)
+        if not chunk:
+            return bytes(body), False
+
+        search_from = max(len(body) - len(_HEAD_END), 0)
+        body.extend(chunk)
+
+        if head_only:
+            end = body[search_from:].lower().find(_HEAD_END)
+            if end != -1:
+                end += search_from
+                close = body.find(b'>', end)
+                return bytes(body[:close + 1 if close != -1 else end + len(_HEAD_END)]), True
+        if len(body) > limit:
+            if head_only:
+                return bytes(body[:limit]), True
+            raise BodyTooLarge(url, max_bytes)
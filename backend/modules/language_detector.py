@@ -0,0 +1,307 @@
+"""
+Офлайн-определение языка текста страницы
+
+TextBlob.detect_language() отправлял каждый текст в веб-сервис
+перевода: сетевой запрос на страницу, а в воркерах без доступа к сети -
+всегда 'unknown'. Здесь язык определяется локально:
+
+    - по преобладающей письменности (кириллица, латиница, греческое,
+      арабское, CJK и т.д.); для письменностей одного языка ответ
+      получается сразу;
+    - для латиницы и кириллицы - по профилям символьных триграмм слов
+      с границами (" th", "the", "he "). Профили строятся при первом
+      обращении из списков частотных слов языков (LANGUAGE_WORDS),
+      вес слова убывает с его рангом, как в реальном тексте;
+    - буквы, которые есть в алфавите только одного из языков
+      письменности (ы, э, ё - русский; і, ї, є, ґ - украинский; ъ внутри
+      слова - болгарский), добавляют этому языку LETTER_MARKER_SCORE:
+      триграммных профилей частотных слов недостаточно, чтобы отличать
+      русский от болгарского в текстах с редкими для списков словами.
+
+Оценка текста - сумма логарифмов вероятностей триграмм его слов
+(наивный Байес со сглаживанием). Оценки слов кэшируются, поэтому
+повторяющиеся на странице и между страницами слова считаются один раз;
+анализируется только начало текста (LANGUAGE_DETECT_MAX_CHARS).
+"""
+
+import re
+import math
+import logging
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = 'unknown'
+
+# Частотные слова языков в порядке убывания частоты
+LANGUAGE_WORDS = {
+    'en': """the of and to a in is that for it was on with he as you i at be this have from by
+        not but they his are or we an she which her all their one there been if were has would
+        so what when will my can more no who about up out them some could into him time than
+        its only other then also new like these over our any your after first how most people
+        because should such through where very well work years just university research
+        between while before being both each those many same under""",
+    'ru': """и в не на я что он с как а по это она то к но они мы из у же за вы так от его
+        все было о бы ее только мне уже когда ты для до вот если нет или ну еще был даже
+        при их был чтобы может этого тоже него там где есть надо ни быть себя после было
+        всех также который которые года время работы более можно очень университет
+        между через этом года человек были свой своей лет работа России работает
+        является области новых первый государственный сейчас нового данных
+        научных научной науки образования исследований института факультета
+        кафедры студентов преподавателей программ систем технологий методов
+        разработки анализа информации результатов проектов являются позволяет
+        используется которых которой этой этих нашей наших других основных
+        будет будут всего человека решения задачи развития управления""",
+    'uk': """і в не на що з я він як та до це а у за й від його але так ви все вона ми для
+        вони був по її коли тільки про є було вже як ще якщо бо ні мене щоб також де дуже
+        або може цього були які який яка року між через під час своїх університет
+        роботи після більше України людей саме тому наукових наукової освіти
+        досліджень інституту факультету кафедри студентів викладачів програм
+        систем технологій методів розробки аналізу інформації результатів
+        проєктів є які якої цієї цих наших інших основних можна буде будуть
+        також людини рішення завдання розвитку управління""",
+    'bg': """и на да е в не се за от с че това са като по ще ти му но какво аз той беше
+        който тя тези го или ни бе си има от при след още може когато които които
+        година също така много във със само всички между България университет
+        чрез трябва вече където години работи хората времето областта нещо
+        страната изследвания световната научни науката образованието
+        изследователски института факултета катедрата студентите
+        преподавателите програмите системите технологиите методите
+        разработване анализ информацията резултатите проектите която което
+        тази този нашата нашите други нови основни ще бъде бяха повече
+        всичко човека решения задачи развитие управление""",
+    'de': """der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als
+        auch es an werden aus er hat dass sie nach wird bei einer um am sind noch wie einem
+        über einen so zum war haben nur oder aber vor zur bis mehr durch man sein wurde sei
+        ich können dieser schon wenn ihre jahr zwischen universität forschung arbeit wir
+        diese keine unter""",
+    'fr': """de la le et les des en un du une que est pour qui dans a par plus pas au sur ne
+        se ce il sont la avec ou son comme mais nous on elle été aux leur cette ses tout
+        ont ils fait peut aussi sans entre dont elle être très deux même après où
+        université recherche travail depuis année notre vous bien""",
+    'es': """de la que el en y a los del se las por un para con no una su al lo como más
+        pero sus le ya o este sí porque esta entre cuando muy sin sobre también me hasta
+        hay donde quien desde todo nos durante todos uno les ni contra otros ese eso ante
+        ellos universidad investigación trabajo años año está son fue ha""",
+    'it': """di e il la che in a per un è del non una con le si da sono i al gli come
+        più della ma lo nel anche alla delle dei ha se questo cui ci o sua loro suo tra
+        essere stato quando molto dopo nella degli tutti fatto università ricerca lavoro
+        anni anno sul dal può""",
+    'pt': """de a o que e do da em um para é com não uma os no se na por mais as dos como
+        mas foi ao ele das tem à seu sua ou ser quando muito há nos já está eu também só
+        pelo pela até isso ela entre era depois sem mesmo aos ter seus quem nas você
+        universidade pesquisa trabalho anos ano são""",
+    'nl': """de van het een en in is dat op te zijn voor met die niet aan er om ook als
+        bij door maar dan wordt uit nog naar tot kan hij ze zich over werd of was worden
+        deze wel al heeft hebben geen meer wat jaar onder zo tussen universiteit
+        onderzoek werk ik we wij hun""",
+    'pl': """i w nie na się z że do to jest jak o a co po ale jego tak za od przez może
+        był już tylko jej są jako dla czy ich by go lub było przy także oraz być który
+        która które jednak tego tym roku latach między pod więc kiedy gdzie bardzo
+        uniwersytet badania pracy""",
+    'sv': """och i att det som en på är av för med till den har de inte om ett han men
+        var jag sig från vi så kan man när år sin hade ska eller nu efter under också
+        upp mot bara hon här där vara sina detta mellan universitet forskning arbete
+        genom blev kommer""",
+    'tr': """ve bir bu da de için ile çok daha olarak en gibi ama o ne var olan sonra
+        kadar her ya değil mi şey ben sen biz onun bunu ise göre ki yeni iki olan
+        arasında üniversite araştırma yıl yılında tarafından olduğu oldu nasıl""",
+}
+
+# Языки, различаемые по триграммам внутри письменности
+SCRIPT_LANGUAGES = {
+    'latin': ('en', 'de', 'fr', 'es', 'it', 'pt', 'nl', 'pl', 'sv', 'tr'),
+    'cyrillic': ('ru', 'uk', 'bg'),
+}
+
+# Буквы (шаблоны) алфавита только одного из языков письменности
+LETTER_MARKERS = {
+    'cyrillic': (
+        (re.compile('[ыэё]'), 'ru'),
+        (re.compile('[іїєґ]'), 'uk'),
+        (re.compile(r'ъ(?=\w)'), 'bg'),
+    ),
+}
+
+# Выигрыш языка за каждое вхождение его буквы-маркера (порядка оценки
+# нескольких совпавших с профилем триграмм)
+LETTER_MARKER_SCORE = 10.0
+
+# Письменности одного языка: (начало диапазона, конец диапазона, письменность)
+SCRIPT_RANGES = (
+    (0x0041, 0x024F, 'latin'),
+    (0x0370, 0x03FF, 'greek'),
+    (0x0400, 0x04FF, 'cyrillic'),
+    (0x0530, 0x058F, 'armenian'),
+    (0x0590, 0x05FF, 'hebrew'),
+    (0x0600, 0x06FF, 'arabic'),
+    (0x0900, 0x097F, 'devanagari'),
+    (0x0E00, 0x0E7F, 'thai'),
+    (0x10A0, 0x10FF, 'georgian'),
+    (0x1100, 0x11FF, 'hangul'),
+    (0x3040, 0x30FF, 'kana'),
+    (0x4E00, 0x9FFF, 'han'),
+    (0xAC00, 0xD7AF, 'hangul'),
+)
+
+SCRIPT_LANGUAGE = {
+    'greek': 'el',
+    'armenian': 'hy',
+    'hebrew': 'he',
+    'arabic': 'ar',
+    'devanagari': 'hi',
+    'thai': 'th',
+    'georgian': 'ka',
+    'hangul': 'ko',
+    'kana': 'ja',
+    'han': 'zh',
+}
+
+_WORD_RE = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+# Вес фоновой (не зависящей от языка) вероятности триграмм: чем больше, тем слабее выигрыш за совпадение с профилем
+BACKGROUND_WEIGHT = 1.0
+
+# Меньше триграмм (коротких слов вроде "GitHub") недостаточно для выбора языка
+MIN_TRIGRAMS = 20
+
+
+def _word_trigrams(word: str) -> List[str]:
+    padded = f' {word} '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _char_script(char: str) -> Optional[str]:
+    code = ord(char)
+    for start, end, script in SCRIPT_RANGES:
+        if start <= code <= end:
+            return script
+    return None
+
+
+def word_script(word: str) -> Optional[str]:
+    """Письменность слова (по большинству символов; кандзи с каной - японский)"""
+    if word.isascii():
+        return 'latin'
+    scripts = Counter(_char_script(char) for char in word)
+    scripts.pop(None, None)
+    if not scripts:
+        return None
+    if 'kana' in scripts:
+        return 'kana'
+    return scripts.most_common(1)[0][0]
+
+
+class LanguageDetector:
+    """Определение языка по письменности и триграммным профилям"""
+
+    def __init__(self, max_chars: Optional[int] = None, min_confidence: Optional[float] = None,
+                 word_cache_size: int = 50000):
+        self.max_chars = max_chars or settings.LANGUAGE_DETECT_MAX_CHARS
+        self.min_confidence = (settings.LANGUAGE_DETECT_MIN_CONFIDENCE
+                               if min_confidence is None else min_confidence)
+        self.word_cache_size = word_cache_size
+        self._profiles: Optional[Dict[str, Dict[str, float]]] = None
+        self._words: Dict[str, Tuple[Optional[str], Tuple[float, ...]]] = {}
+
+    @property
+    def profiles(self) -> Dict[str, Dict[str, float]]:
+        """Логарифмы вероятностей триграмм языков относительно общего фона"""
+        if self._profiles is None:
+            frequencies = {language: self._trigram_frequencies(words.split())
+                           for language, words in LANGUAGE_WORDS.items()}
+            vocabulary = set().union(*frequencies.values())
+            # Неизвестная профилю триграмма получает фоновую вероятность, общую для всех
+            # языков, и не влияет на выбор; известная - дает выигрыш log(1 + p / фон)
+            background = BACKGROUND_WEIGHT / (len(vocabulary) * 4)
+            self._profiles = {
+                language: {trigram: math.log(1.0 + p / background) for trigram, p in trigrams.items()}
+                for language, trigrams in frequencies.items()
+            }
+        return self._profiles
+
+    @staticmethod
+    def _trigram_frequencies(words: List[str]) -> Dict[str, float]:
+        counts: Counter = Counter()
+        for rank, word in enumerate(dict.fromkeys(word.lower() for word in words)):
+            # Частота слова в тексте примерно обратно пропорциональна рангу (закон Ципфа)
+            weight = 1.0 / (rank + 1)
+            for trigram in _word_trigrams(word):
+                counts[trigram] += weight
+        total = sum(counts.values())
+        return {trigram: count / total for trigram, count in counts.items()}
+
+    def _word_info(self, word: str) -> Tuple[Optional[str], Tuple[float, ...]]:
+        """Письменность слова и его оценки для языков этой письменности (кэшируются)"""
+        info = self._words.get(word)
+        if info is None:
+            script = word_script(word)
+            scores: Tuple[float, ...] = ()
+            if script in SCRIPT_LANGUAGES:
+                trigrams = _word_trigrams(word)
+                profiles = self.profiles
+                languages = SCRIPT_LANGUAGES[script]
+                markers = Counter()
+                for pattern, language in LETTER_MARKERS.get(script, ()):
+                    markers[language] += len(pattern.findall(word))
+                scores = tuple(
+                    sum(profiles[language].get(trigram, 0.0) for trigram in trigrams)
+                    + markers[language] * LETTER_MARKER_SCORE
+                    for language in languages
+                )
+            if len(self._words) >= self.word_cache_size:
+                self._words.clear()
+            info = self._words[word] = (script, scores)
+        return info
+
+    def detect_details(self, text: str) -> Dict[str, Any]:
+        """Язык, уверенность (0..1) и преобладающая письменность текста"""
+        words = Counter(_WORD_RE.findall((text or '')[:self.max_chars].lower()))
+        scripts: Counter = Counter()
+        totals: Dict[str, List[float]] = {}
+        trigram_counts: Counter = Counter()
+        for word, count in words.items():
+            script, scores = self._word_info(word)
+            if script is None:
+                continue
+            scripts[script] += len(word) * count
+            if scores:
+                script_totals = totals.setdefault(script, [0.0] * len(scores))
+                for i, score in enumerate(scores):
+                    script_totals[i] += score * count
+                trigram_counts[script] += (len(word) + 1) * count
+        if not scripts:
+            return {'language': UNKNOWN, 'confidence': 0.0, 'script': None}
+
+        script = scripts.most_common(1)[0][0]
+        if script == 'han' and scripts.get('kana'):
+            # Японский текст смешивает кандзи и кану
+            script = 'kana'
+        if script in SCRIPT_LANGUAGE:
+            return {'language': SCRIPT_LANGUAGE[script], 'confidence': 1.0, 'script': script}
+        if trigram_counts[script] < MIN_TRIGRAMS:
+            return {'language': UNKNOWN, 'confidence': 0.0, 'script': script}
+
+        ranked = sorted(zip(totals[script], SCRIPT_LANGUAGES[script]), reverse=True)
+        best_score, best_language = ranked[0]
+        # Средний выигрыш лучшего языка у второго на триграмму, приведенный к 0..1
+        margin = (best_score - ranked[1][0]) / trigram_counts[script]
+        confidence = round(1.0 - math.exp(-margin * 4), 3)
+        if confidence < self.min_confidence:
+            return {'language': UNKNOWN, 'confidence': confidence, 'script': script}
+        return {'language': best_language, 'confidence': confidence, 'script': script}
+
+    def detect(self, text: str) -> str:
+        """Код языка ISO 639-1 или 'unknown'"""
+        return self.detect_details(text)['language']
+
+    def detect_batch(self, texts: List[str]) -> List[str]:
+        """Коды языков для списка текстов (оценки слов общие для всего пакета)"""
+        return [self.detect(text) for text in texts]
+
+
+# Глобальный детектор языка
+language_detector = LanguageDetector()
@@ -0,0 +1,266 @@
+"""
+Метрики производительности Email Intelligence Collector
+
+Содержит гистограмму задержек в стиле HDR Histogram: значения хранятся
+в логарифмически-линейных корзинах с ограниченной относительной ошибкой,
+что позволяет дешево считать перцентили без хранения всех измерений.
+
+Метрики процесса (счетчики, gauge, гистограммы prometheus_client)
+регистрируются в собственном реестре и экспортируются в текстовом
+формате Prometheus через эндпоинт /metrics.
+"""
+
+import threading
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+
+class LatencyHistogram:
+    """HDR-подобная гистограмма задержек (значения в секундах)"""
+
+    def __init__(self, sub_bucket_bits: int = 7, unit: float = 1e-6):
+        # Точность: относительная ошибка не превышает 1 / 2^(sub_bucket_bits - 1)
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        self.unit = unit  # Дискрет измерения (по умолчанию микросекунды)
+
+        self.counts: Dict[int, int] = {}
+        self.total_count = 0
+        self.total_sum = 0.0
+        self.min_value: Optional[float] = None
+        self.max_value: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _bucket_index(self, value: int) -> int:
+        if value < self.sub_bucket_count:
+            return value
+
+        exponent = value.bit_length() - self.sub_bucket_bits
+        mantissa = value >> exponent
+        return self.sub_bucket_count + (exponent - 1) * self.sub_bucket_half + (mantissa - self.sub_bucket_half)
+
+    def _bucket_bounds(self, index: int) -> Tuple[int, int]:
+        """Границы корзины в единицах измерения (включительно)"""
+        if index < self.sub_bucket_count:
+            return index, index
+
+        offset = index - self.sub_bucket_count
+        exponent = offset // self.sub_bucket_half + 1
+        mantissa = offset % self.sub_bucket_half + self.sub_bucket_half
+        return mantissa << exponent, ((mantissa + 1) << exponent) - 1
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        """Запись измерения"""
+        value = max(0, int(seconds / self.unit))
+        index = self._bucket_index(value)
+
+        with self._lock:
+            self.counts[index] = self.counts.get(index, 0) + count
+            self.total_count += count
+            self.total_sum += seconds * count
+            if self.min_value is None or seconds < self.min_value:
+                self.min_value = seconds
+            if self.max_value is None or seconds > self.max_value:
+                self.max_value = seconds
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        """Слияние с другой гистограммой той же точности"""
+        with other._lock:
+            counts = dict(other.counts)
+            total_count, total_sum = other.total_count, other.total_sum
+            min_value, max_value = other.min_value, other.max_value
+
+        with self._lock:
+            for index, count in counts.items():
+                self.counts[index] = self.counts.get(index, 0) + count
+            self.total_count += total_count
+            self.total_sum += total_sum
+            if min_value is not None and (self.min_value is None or min_value < self.min_value):
+                self.min_value = min_value
+            if max_value is not None and (self.max_value is None or max_value > self.max_value):
+                self.max_value = max_value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts.clear()
+            self.total_count = 0
+            self.total_sum = 0.0
+            self.min_value = None
+            self.max_value = None
+
+    def percentiles(self, quantiles: Iterable[float]) -> Dict[float, float]:
+        """Значения перцентилей (квантили в диапазоне 0..1) за один проход"""
+        quantiles = sorted(quantiles)
+        result = {q: 0.0 for q in quantiles}
+
+        with self._lock:
+            if not self.total_count:
+                return result
+            buckets = sorted(self.counts.items())
+            total = self.total_count
+            max_value = self.max_value
+
+        cumulative = 0
+        q_iter = iter(quantiles)
+        q = next(q_iter, None)
+        for index, count in buckets:
+            cumulative += count
+            while q is not None and cumulative >= max(1, q * total):
+                low, high = self._bucket_bounds(index)
+                # Середина корзины, но не больше фактического максимума
+                result[q] = min((low + high) / 2 * self.unit, max_value)
+                q = next(q_iter, None)
+            if q is None:
+                break
+
+        return result
+
+    def percentile(self, quantile: float) -> float:
+        return self.percentiles([quantile])[quantile]
+
+    def cumulative_counts(self, upper_bounds: List[float]) -> List[int]:
+        """Количество измерений не больше каждой из границ (для экспорта корзин)"""
+        with self._lock:
+            buckets = sorted(self.counts.items())
+
+        result = []
+        position = 0
+        cumulative = 0
+        for bound in sorted(upper_bounds):
+            limit = bound / self.unit
+            while position < len(buckets) and self._bucket_bounds(buckets[position][0])[1] <= limit:
+                cumulative += buckets[position][1]
+                position += 1
+            result.append(cumulative)
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        """Сводка: количество, среднее и основные перцентили"""
+        values = self.percentiles([0.5, 0.95, 0.99])
+        with self._lock:
+            count = self.total_count
+            total_sum = self.total_sum
+            min_value, max_value = self.min_value, self.max_value
+
+        return {
+            'count': count,
+            'mean': total_sum / count if count else 0.0,
+            'min': min_value or 0.0,
+            'max': max_value or 0.0,
+            'p50': values[0.5],
+            'p95': values[0.95],
+            'p99': values[0.99]
+        }
+
+
+# Content-Type текстового формата экспозиции Prometheus
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Границы корзин гистограмм длительностей (секунды)
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+# Реестр метрик процесса (отдельный от глобального реестра prometheus_client)
+registry = CollectorRegistry()
+
+
+def render_metrics() -> bytes:
+    """Экспорт всех метрик реестра в текстовом формате Prometheus"""
+    return generate_latest(registry)
+
+
+# HTTP API
+HTTP_REQUESTS = Counter(
+    'eic_http_requests_total', 'HTTP requests handled by the API',
+    ['method', 'endpoint', 'status'], registry=registry)
+HTTP_REQUEST_SECONDS = Histogram(
+    'eic_http_request_seconds', 'API response time',
+    ['method', 'endpoint'], buckets=DEFAULT_BUCKETS, registry=registry)
+
+# Поисковые системы
+SEARCH_ENGINE_REQUESTS = Counter(
+    'eic_search_engine_requests_total', 'Search engine requests by response status',
+    ['engine', 'status'], registry=registry)
+SEARCH_ENGINE_SECONDS = Histogram(
+    'eic_search_engine_request_seconds', 'Search engine request latency',
+    ['engine'], buckets=DEFAULT_BUCKETS, registry=registry)
+
+# Коллекторы данных
+COLLECTOR_RUNS = Counter(
+    'eic_collector_runs_total', 'Collector runs by outcome (success, empty, error)',
+    ['collector', 'outcome'], registry=registry)
+COLLECTOR_SECONDS = Histogram(
+    'eic_collector_seconds', 'Collector run time',
+    ['collector'], buckets=DEFAULT_BUCKETS, registry=registry)
+
+# Кэши
+CACHE_REQUESTS = Counter(
+    'eic_cache_requests_total', 'Cache lookups by result (hit, miss)',
+    ['cache', 'result'], registry=registry)
+CACHE_HIT_RATIO = Gauge(
+    'eic_cache_hit_ratio', 'Cache hit ratio since process start',
+    ['cache'], registry=registry)
+
+# Пулы HTTP-соединений клиентов
+HTTP_CLIENT_IN_FLIGHT = Gauge(
+    'eic_http_client_requests_in_flight', 'Outgoing HTTP requests currently using a pool connection',
+    ['client'], registry=registry)
+HTTP_CLIENT_POOL_LIMIT = Gauge(
+    'eic_http_client_pool_limit', 'Connection limit of the HTTP client pool',
+    ['client'], registry=registry)
+HTTP_CLIENT_REQUESTS = Counter(
+    'eic_http_client_requests_total', 'Outgoing HTTP requests by client',
+    ['client'], registry=registry)
+
+# Объединение одновременных запросов (single-flight)
+COALESCED_REQUESTS = Counter(
+    'eic_coalesced_requests_total', 'Keyed single-flight calls by role (leader, follower, remote)',
+    ['operation', 'role'], registry=registry)
+
+# Дубликаты страниц (stage: result_page, scraped_page; scope: run, index)
+NEAR_DUPLICATES = Counter(
+    'eic_near_duplicates_total', 'Duplicate pages whose extraction was skipped',
+    ['stage', 'scope'], registry=registry)
+
+# База данных
+DB_SESSION_SECONDS = Histogram(
+    'eic_db_session_seconds', 'Lifetime of request-scoped database sessions',
+    buckets=DEFAULT_BUCKETS, registry=registry)
+
+
+# Обращения к кэшам для доли попаданий: кэш -> [попадания, всего]
+_cache_lookups: Dict[str, List[int]] = {}
+_cache_lookups_lock = threading.Lock()
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Учет обращения к кэшу и пересчет доли попаданий"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+    with _cache_lookups_lock:
+        lookups = _cache_lookups.setdefault(cache, [0, 0])
+        lookups[0] += int(hit)
+        lookups[1] += 1
+        ratio = lookups[0] / lookups[1]
+    CACHE_HIT_RATIO.labels(cache).set(ratio)
+
+
+def register_http_pool(client: str, limit: int) -> None:
+    """Регистрация лимита пула соединений HTTP-клиента"""
+    HTTP_CLIENT_POOL_LIMIT.labels(client).set(limit)
+
+
+class track_http_request:
+    """Контекстный менеджер: запрос занимает соединение пула клиента"""
+
+    def __init__(self, client: str):
+        self.client = client
+
+    def __enter__(self):
+        HTTP_CLIENT_REQUESTS.labels(self.client).inc()
+        HTTP_CLIENT_IN_FLIGHT.labels(self.client).inc()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        HTTP_CLIENT_IN_FLIGHT.labels(self.client).dec()
+        return False
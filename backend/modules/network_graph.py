@@ -0,0 +1,462 @@
+"""
+Глобальный граф связей по всем профилям
+
+Узлы графа - персоны (владельцы профилей и соавторы), организации и
+издания; ребра строятся из публикаций (соавторство, публикация в
+издании) и аффилиаций. Каждый профиль вносит свой набор ребер в таблицу
+network_edges, поэтому при записи профиля его ребра заменяются целиком,
+а граф остальных профилей не пересчитывается.
+
+Для расчета метрик граф загружается в разреженную матрицу смежности
+(CSR на массивах NumPy), PageRank, степенная и собственная
+центральность считаются векторно для всех узлов сразу. Снимок графа
+кэшируется и перестраивается только после изменения ребер.
+"""
+
+import re
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+import numpy as np
+from sqlalchemy import func, delete, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database.connection import SessionLocal
+from database.models import NetworkNode, NetworkEdge, EmailProfile
+from modules.digital_twin import COLLABORATOR_NAME_RE
+
+logger = logging.getLogger(__name__)
+
+# Веса ребер по типам связи
+EDGE_WEIGHTS = {
+    'coauthor': 1.0,
+    'published_in': 0.5,
+    'affiliated': 1.0
+}
+
+# Соавторов на публикацию (ограничение клики соавторства)
+MAX_AUTHORS_PER_PUBLICATION = 20
+
+# Попыток вставки узлов при конфликте с параллельной записью профиля
+NODE_INSERT_ATTEMPTS = 3
+
+
+def _normalize(label: str) -> str:
+    return re.sub(r'[^\w]+', ' ', label.lower()).strip()
+
+
+def node_key(kind: str, label: str) -> str:
+    """Ключ узла: тип и нормализованное название"""
+    return f"{kind}:{_normalize(label)}"[:300]
+
+
+def person_key(email: str) -> str:
+    """Ключ узла владельца профиля без имени"""
+    return f"person:{email.lower().strip()}"
+
+
+def owner_key(email: str, academic_profile: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Ключ узла владельца профиля
+
+    Владелец с известным именем - тот же узел, что и соавтор с этим именем
+    в публикациях других профилей (ключ по нормализованному имени);
+    без имени узел ключуется по email.
+    """
+    name = (academic_profile or {}).get('name')
+    if isinstance(name, str) and _normalize(name):
+        return node_key('person', name)
+    return person_key(email)
+
+
+def profile_graph(email: str, academic_profile: Dict[str, Any]) -> Tuple[Dict[str, Tuple[str, str]], List[Tuple[str, str, str, float]]]:
+    """
+    Узлы и ребра, которые вносит профиль
+
+    Возвращает ({key: (kind, label)}, [(source_key, target_key, kind, weight)]);
+    ребра неориентированные, пара ключей упорядочена.
+    """
+    subject = owner_key(email, academic_profile)
+    subject_name = academic_profile.get('name') or email
+    nodes = {subject: ('person', subject_name)}
+    weights: Dict[Tuple[str, str, str], float] = {}
+
+    def add_node(kind: str, label: Optional[str]) -> Optional[str]:
+        if not label or not isinstance(label, str) or not _normalize(label):
+            return None
+        key = node_key(kind, label)
+        nodes.setdefault(key, (kind, label.strip()[:255]))
+        return key
+
+    def add_edge(a: str, b: str, kind: str) -> None:
+        if a == b:
+            return
+        source, target = (a, b) if a < b else (b, a)
+        weights[(source, target, kind)] = weights.get((source, target, kind), 0.0) + EDGE_WEIGHTS[kind]
+
+    subject_name_normalized = _normalize(subject_name)
+
+    # Аффилиации
+    institutions = list(academic_profile.get('institutions', []))
+    for item in academic_profile.get('positions', []) + academic_profile.get('degrees', []):
+        if isinstance(item, dict) and item.get('university'):
+            institutions.append(item['university'])
+    for institution in institutions:
+        key = add_node('institution', institution)
+        if key:
+            add_edge(subject, key, 'affiliated')
+
+    # Публикации: соавторство и издания
+    for publication in academic_profile.get('publications', []):
+        if not isinstance(publication, dict):
+            continue
+
+        names = publication.get('authors')
+        if not isinstance(names, list):
+            names = COLLABORATOR_NAME_RE.findall(publication.get('context', '') or '')
+        authors = [subject]
+        for name in dict.fromkeys(names):
+            if not isinstance(name, str) or _normalize(name) == subject_name_normalized:
+                continue
+            key = add_node('person', name)
+            if key and key not in authors:
+                authors.append(key)
+            if len(authors) >= MAX_AUTHORS_PER_PUBLICATION:
+                break
+
+        for i, a in enumerate(authors):
+            for b in authors[i + 1:]:
+                add_edge(a, b, 'coauthor')
+
+        venue = add_node('venue', publication.get('journal'))
+        if venue:
+            for author in authors:
+                add_edge(author, venue, 'published_in')
+
+    edges = [(source, target, kind, weight) for (source, target, kind), weight in weights.items()]
+    return nodes, edges
+
+
+class NetworkGraph:
+    """Снимок графа: разреженная матрица смежности и метрики всех узлов"""
+
+    def __init__(self, keys: List[str], kinds: List[str], rows: np.ndarray,
+                 cols: np.ndarray, weights: np.ndarray):
+        self.keys = keys
+        self.kinds = kinds
+        self.index = {key: i for i, key in enumerate(keys)}
+        n = len(keys)
+
+        # Симметричная матрица в формате CSR (ребра хранятся в одном направлении)
+        all_rows = np.concatenate([rows, cols])
+        all_cols = np.concatenate([cols, rows])
+        all_weights = np.concatenate([weights, weights])
+        order = np.lexsort((all_cols, all_rows))
+        self.rows = all_rows[order]
+        self.cols = all_cols[order]
+        self.weights = all_weights[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.rows, minlength=n), out=self.indptr[1:])
+
+        self.n = n
+        self.edge_count = len(weights)
+        self._metrics: Optional[Dict[str, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_edges(cls, nodes: Dict[int, Tuple[str, str]],
+                   edges: Iterable[Tuple[int, int, float]]) -> 'NetworkGraph':
+        """Граф из узлов {id: (key, kind)} и ребер (source_id, target_id, weight)"""
+        ids = sorted(nodes)
+        position = {node_id: i for i, node_id in enumerate(ids)}
+        edge_list = [(position[s], position[t], w) for s, t, w in edges
+                     if s in position and t in position and s != t]
+
+        if edge_list:
+            data = np.array(edge_list, dtype=np.float64)
+            rows, cols, weights = data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2]
+        else:
+            rows = cols = np.zeros(0, dtype=np.int64)
+            weights = np.zeros(0, dtype=np.float64)
+        return cls([nodes[i][0] for i in ids], [nodes[i][1] for i in ids], rows, cols, weights)
+
+    def matvec(self, vector: np.ndarray) -> np.ndarray:
+        """Произведение матрицы смежности на вектор"""
+        return np.bincount(self.rows, weights=self.weights * vector[self.cols], minlength=self.n)
+
+    def pagerank(self, alpha: float = 0.85, tol: float = 1e-9, max_iter: int = 100) -> np.ndarray:
+        """Взвешенный PageRank (степенной метод)"""
+        n = self.n
+        if n == 0:
+            return np.zeros(0)
+        strength = np.bincount(self.rows, weights=self.weights, minlength=n)
+        dangling = strength == 0
+        inverse_strength = np.divide(1.0, strength, out=np.zeros(n), where=~dangling)
+
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            spread = self.matvec(rank * inverse_strength)
+            updated = alpha * (spread + rank[dangling].sum() / n) + (1 - alpha) / n
+            if np.abs(updated - rank).sum() < tol * n:
+                rank = updated
+                break
+            rank = updated
+        return rank
+
+    def degree_centrality(self) -> np.ndarray:
+        """Доля узлов, связанных с узлом"""
+        degree = np.diff(self.indptr).astype(np.float64)
+        return degree / (self.n - 1) if self.n > 1 else degree
+
+    def eigenvector_centrality(self, tol: float = 1e-8, max_iter: int = 200) -> np.ndarray:
+        """Собственная центральность (степенной метод для A + I, максимум = 1)"""
+        if self.n == 0:
+            return np.zeros(0)
+        vector = np.full(self.n, 1.0 / self.n)
+        for _ in range(max_iter):
+            # Сдвиг на I обеспечивает сходимость для двудольных компонент
+            updated = self.matvec(vector) + vector
+            norm = np.linalg.norm(updated)
+            if norm == 0:
+                return np.zeros(self.n)
+            updated /= norm
+            if np.abs(updated - vector).sum() < tol * self.n:
+                vector = updated
+                break
+            vector = updated
+        peak = vector.max()
+        return vector / peak if peak > 0 else vector
+
+    def metrics(self) -> Dict[str, np.ndarray]:
+        """Метрики всех узлов (считаются один раз на снимок)"""
+        with self._lock:
+            if self._metrics is None:
+                started = time.perf_counter()
+                pagerank = self.pagerank()
+                degree = np.diff(self.indptr)
+                degree_centrality = self.degree_centrality()
+                eigenvector = self.eigenvector_centrality()
+
+                # Сводная центральность: среднее метрик, нормированных на максимум
+                normalized = [
+                    metric / metric.max() if self.n and metric.max() > 0 else metric
+                    for metric in (pagerank, degree_centrality, eigenvector)
+                ]
+                self._metrics = {
+                    'pagerank': pagerank,
+                    'degree': degree,
+                    'degree_centrality': degree_centrality,
+                    'eigenvector_centrality': eigenvector,
+                    'centrality_score': sum(normalized) / 3 if self.n else np.zeros(0)
+                }
+                logger.info(f"Network metrics computed for {self.n} nodes, {self.edge_count} edges "
+                            f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+            return self._metrics
+
+    def node_metrics(self, key: str) -> Optional[Dict[str, Any]]:
+        """Метрики узла или None, если его нет в графе"""
+        i = self.index.get(key)
+        if i is None:
+            return None
+        metrics = self.metrics()
+        return {
+            'pagerank': round(float(metrics['pagerank'][i]), 6),
+            'degree': int(metrics['degree'][i]),
+            'degree_centrality': round(float(metrics['degree_centrality'][i]), 4),
+            'eigenvector_centrality': round(float(metrics['eigenvector_centrality'][i]), 4),
+            'centrality_score': round(float(metrics['centrality_score'][i]), 4)
+        }
+
+    def profile_metrics(self, email: str, academic_profile: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Метрики владельца профиля (узел определяется по имени из академического профиля)"""
+        return self.node_metrics(owner_key(email, academic_profile))
+
+    def top_nodes(self, metric: str = 'pagerank', limit: int = 10,
+                  kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Узлы с наибольшим значением метрики"""
+        values = self.metrics()[metric]
+        order = np.argsort(-values)
+        result = []
+        for i in order:
+            if kind and self.kinds[i] != kind:
+                continue
+            result.append({'key': self.keys[i], 'kind': self.kinds[i], metric: round(float(values[i]), 6)})
+            if len(result) >= limit:
+                break
+        return result
+
+
+class NetworkGraphStore:
+    """Хранение графа в базе, инкрементальное обновление и кэш снимка"""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._graph: Optional[NetworkGraph] = None
+        self._signature: Optional[Tuple[int, int, int, int]] = None
+        # Номер изменения ребер в этом процессе (увеличивается после фиксации)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def update_profile(self, db: Session, email: str, academic_profile: Optional[Dict[str, Any]]) -> int:
+        """
+        Замена ребер профиля (без фиксации транзакции)
+
+        Возвращает число ребер профиля после обновления.
+        """
+        email = email.lower().strip()
+        db.execute(delete(NetworkEdge).where(NetworkEdge.profile_email == email))
+        db.info['network_graph_changed'] = True
+        if not academic_profile:
+            return 0
+
+        nodes, edges = profile_graph(email, academic_profile)
+        node_ids = self._ensure_nodes(db, nodes)
+        for source, target, kind, weight in edges:
+            db.add(NetworkEdge(
+                source_id=node_ids[source],
+                target_id=node_ids[target],
+                kind=kind,
+                weight=weight,
+                profile_email=email
+            ))
+        return len(edges)
+
+    def delete_profile(self, db: Session, email: str) -> None:
+        """Удаление ребер профиля (без фиксации транзакции)"""
+        db.execute(delete(NetworkEdge).where(NetworkEdge.profile_email == email.lower().strip()))
+        db.info['network_graph_changed'] = True
+
+    def _ensure_nodes(self, db: Session, nodes: Dict[str, Tuple[str, str]]) -> Dict[str, int]:
+        existing: Dict[str, int] = {}
+        for _ in range(NODE_INSERT_ATTEMPTS):
+            missing = [key for key in nodes if key not in existing]
+            existing.update(db.query(NetworkNode.key, NetworkNode.id).filter(NetworkNode.key.in_(missing)).all())
+            missing = [key for key in missing if key not in existing]
+            if not missing:
+                return existing
+
+            created = [NetworkNode(key=key, kind=nodes[key][0], label=nodes[key][1]) for key in missing]
+            try:
+                # Точка сохранения: узел, одновременно созданный другой записью,
+                # откатывает только вставку узлов, а не всю транзакцию профиля
+                with db.begin_nested():
+                    db.add_all(created)
+            except IntegrityError:
+                logger.debug("Network nodes created concurrently, reloading")
+                continue
+            existing.update((node.key, node.id) for node in created)
+            return existing
+        raise RuntimeError(f"Could not create network nodes after {NODE_INSERT_ATTEMPTS} attempts")
+
+    def rebuild(self, db: Session, batch_size: int = 500) -> Dict[str, int]:
+        """Полное построение графа по всем профилям с академическими данными"""
+        db.execute(delete(NetworkEdge))
+        profiles = edges = 0
+        # Постраничный обход по email: фиксация пакета не обрывает выборку
+        last_email = ''
+        while True:
+            rows = db.query(
+                EmailProfile.email, EmailProfile.data['academic_profile'].label('academic_profile')
+            ).filter(EmailProfile.email > last_email).order_by(EmailProfile.email).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                if not row.academic_profile:
+                    continue
+                edges += self.update_profile(db, row.email, row.academic_profile)
+                profiles += 1
+            db.commit()
+            last_email = rows[-1].email
+        self.invalidate()
+        return {'profiles': profiles, 'edges': edges}
+
+    def _current_signature(self, db: Session) -> Tuple[int, int, int, int]:
+        """
+        Признак изменения графа
+
+        Замена ребер профиля тем же числом ребер может не изменить ни их
+        количество, ни максимальный id (SQLite повторно выдает rowid), поэтому
+        изменения этого процесса учитываются по номеру версии. Размер таблиц
+        замечает изменения, сделанные другими воркерами.
+        """
+        with self._lock:
+            version = self._version
+        count, max_id = db.query(func.count(NetworkEdge.id), func.max(NetworkEdge.id)).one()
+        node_count = db.query(func.count(NetworkNode.id)).scalar()
+        return version, count or 0, max_id or 0, node_count or 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._graph = None
+            self._signature = None
+
+    def get_graph(self, db: Optional[Session] = None) -> NetworkGraph:
+        """Актуальный снимок графа (перестраивается после изменения ребер)"""
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            signature = self._current_signature(db)
+            with self._lock:
+                if self._graph is not None and signature == self._signature:
+                    return self._graph
+
+            started = time.perf_counter()
+            nodes = {node_id: (key, kind) for node_id, key, kind in
+                     db.query(NetworkNode.id, NetworkNode.key, NetworkNode.kind).yield_per(5000)}
+            # Вес ребра - сумма вкладов всех профилей
+            edges = db.query(
+                NetworkEdge.source_id, NetworkEdge.target_id, func.sum(NetworkEdge.weight)
+            ).group_by(NetworkEdge.source_id, NetworkEdge.target_id).all()
+            graph = NetworkGraph.from_edges(nodes, edges)
+            logger.info(f"Network graph loaded: {graph.n} nodes, {graph.edge_count} edges "
+                        f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+            with self._lock:
+                self._graph = graph
+                self._signature = signature
+            return graph
+        finally:
+            if own_session:
+                db.close()
+
+    def get_stats(self, db: Optional[Session] = None) -> Dict[str, Any]:
+        """Размер графа и самые центральные узлы"""
+        graph = self.get_graph(db)
+        kinds: Dict[str, int] = {}
+        for kind in graph.kinds:
+            kinds[kind] = kinds.get(kind, 0) + 1
+        return {
+            'nodes': graph.n,
+            'edges': graph.edge_count,
+            'node_kinds': kinds,
+            'top_people': graph.top_nodes('pagerank', 10, kind='person'),
+            'top_institutions': graph.top_nodes('pagerank', 10, kind='institution')
+        }
+
+
+# Глобальное хранилище графа
+network_graph_store = NetworkGraphStore()
+
+
+@event.listens_for(Session, 'before_flush')
+def _delete_profile_edges(session: Session, flush_context, instances) -> None:
+    """Ребра удаленного профиля удаляются в той же транзакции"""
+    for obj in session.deleted:
+        if isinstance(obj, EmailProfile) and obj.email:
+            network_graph_store.delete_profile(session, obj.email)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_graph(session: Session) -> None:
+    """Снимок графа сбрасывается после фиксации изменений ребер"""
+    if session.info.pop('network_graph_changed', False):
+        network_graph_store.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_graph_changes(session: Session) -> None:
+    session.info.pop('network_graph_changed', None)
@@ -0,0 +1,177 @@
+"""
+Ленивая загрузка NLP-библиотек (spaCy, NLTK, TextBlob)
+
+Импорт spaCy и загрузка модели занимают секунды, а проверка данных
+NLTK может обращаться к сети (nltk.download). Раньше это выполнялось
+при импорте web_scraper, то есть при старте каждого воркера API.
+Теперь библиотеки импортируются при первом обращении к nlp_loader,
+а warm_up() позволяет загрузить их заранее (в фоне при старте
+приложения, settings.NLP_WARM_UP_ON_STARTUP).
+
+Признаки *_AVAILABLE проверяют только наличие пакета (find_spec) и не
+импортируют его.
+"""
+
+import time
+import logging
+import threading
+from importlib.util import find_spec
+from types import SimpleNamespace
+from typing import Dict, Any, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SPACY_AVAILABLE = find_spec('spacy') is not None
+NLTK_AVAILABLE = find_spec('nltk') is not None
+TEXTBLOB_AVAILABLE = find_spec('textblob') is not None
+
+# Данные NLTK: путь для nltk.data.find и имя пакета для nltk.download
+NLTK_RESOURCES = (
+    ('tokenizers/punkt', 'punkt'),
+    ('corpora/stopwords', 'stopwords'),
+    ('taggers/averaged_perceptron_tagger', 'averaged_perceptron_tagger'),
+    ('chunkers/maxent_ne_chunker', 'maxent_ne_chunker'),
+    ('corpora/words', 'words')
+)
+
+_NOT_LOADED = object()
+
+
+class NLPLoader:
+    """Однократная потокобезопасная загрузка NLP-библиотек по требованию"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._spacy_model = _NOT_LOADED
+        self._nltk = _NOT_LOADED
+        self._textblob = _NOT_LOADED
+        self.load_seconds: Dict[str, float] = {}
+
+    def spacy_model(self):
+        """Модель spaCy (settings.NLP_SPACY_MODEL) или None"""
+        if self._spacy_model is _NOT_LOADED:
+            with self._lock:
+                if self._spacy_model is _NOT_LOADED:
+                    self._spacy_model = self._timed('spacy', self._load_spacy)
+        return self._spacy_model
+
+    def nltk(self) -> Optional[SimpleNamespace]:
+        """Функции NLTK (word_tokenize, pos_tag, ne_chunk, Tree, stopwords) или None"""
+        if self._nltk is _NOT_LOADED:
+            with self._lock:
+                if self._nltk is _NOT_LOADED:
+                    self._nltk = self._timed('nltk', self._load_nltk)
+        return self._nltk
+
+    def textblob(self):
+        """Класс TextBlob или None"""
+        if self._textblob is _NOT_LOADED:
+            with self._lock:
+                if self._textblob is _NOT_LOADED:
+                    self._textblob = self._timed('textblob', self._load_textblob)
+        return self._textblob
+
+    def warm_up(self) -> Dict[str, Any]:
+        """Загрузка всех библиотек заранее; возвращает состояние загрузчика"""
+        self.spacy_model()
+        self.nltk()
+        self.textblob()
+        status = self.status()
+        logger.info(f"NLP warm-up finished: {status}")
+        return status
+
+    def status(self) -> Dict[str, Any]:
+        def state(value) -> str:
+            if value is _NOT_LOADED:
+                return 'not_loaded'
+            return 'loaded' if value is not None else 'unavailable'
+
+        return {
+            'spacy': state(self._spacy_model),
+            'nltk': state(self._nltk),
+            'textblob': state(self._textblob),
+            'load_seconds': dict(self.load_seconds)
+        }
+
+    def _timed(self, name: str, loader):
+        started = time.perf_counter()
+        try:
+            return loader()
+        except Exception as e:
+            # Сломанная установка отключает библиотеку, а не каждый вызов анализа
+            logger.error(f"Failed to load {name}: {e}")
+            return None
+        finally:
+            self.load_seconds[name] = round(time.perf_counter() - started, 3)
+
+    @staticmethod
+    def _load_spacy():
+        if not SPACY_AVAILABLE:
+            return None
+        try:
+            import spacy
+        except Exception as e:
+            logger.warning(f"spaCy is installed but could not be imported: {e}")
+            return None
+        try:
+            return spacy.load(settings.NLP_SPACY_MODEL)
+        except OSError:
+            logger.warning(f"spaCy model {settings.NLP_SPACY_MODEL} not found. "
+                           f"Install with: python -m spacy download {settings.NLP_SPACY_MODEL}")
+            return None
+        except Exception as e:
+            logger.warning(f"spaCy model {settings.NLP_SPACY_MODEL} could not be loaded: {e}")
+            return None
+
+    @staticmethod
+    def _load_nltk() -> Optional[SimpleNamespace]:
+        if not NLTK_AVAILABLE:
+            return None
+        try:
+            import nltk
+            from nltk.corpus import stopwords
+            from nltk.tokenize import word_tokenize, sent_tokenize
+            from nltk.tag import pos_tag
+            from nltk.chunk import ne_chunk
+            from nltk.tree import Tree
+        except Exception as e:
+            logger.warning(f"NLTK is installed but could not be imported: {e}")
+            return None
+
+        for path, package in NLTK_RESOURCES:
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                if not settings.NLP_DOWNLOAD_MISSING_DATA:
+                    logger.warning(f"NLTK data {package} not found")
+                    continue
+                try:
+                    nltk.download(package, quiet=True)
+                except Exception:
+                    logger.warning(f"Could not download NLTK {package} data")
+
+        return SimpleNamespace(
+            word_tokenize=word_tokenize,
+            sent_tokenize=sent_tokenize,
+            pos_tag=pos_tag,
+            ne_chunk=ne_chunk,
+            Tree=Tree,
+            stopwords=stopwords
+        )
+
+    @staticmethod
+    def _load_textblob():
+        if not TEXTBLOB_AVAILABLE:
+            return None
+        try:
+            from textblob import TextBlob
+        except Exception as e:
+            logger.warning(f"TextBlob is installed but could not be imported: {e}")
+            return None
+        return TextBlob
+
+
+# Глобальный загрузчик NLP-библиотек
+nlp_loader = NLPLoader()
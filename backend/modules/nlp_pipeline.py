@@ -0,0 +1,190 @@
+"""
+Пакетный NLP-анализ страниц в пуле процессов
+
+Раньше EnhancedWebScraper для каждой страницы вызывал spaCy nlp(text) и
+NLTK ne_chunk дважды (для персональной информации по всему тексту и для
+nlp_analysis по первым 10000 символам) прямо в цикле событий. Теперь
+каждая страница анализируется один раз:
+
+    - тексты страниц, одновременно обрабатываемых скрапером, собираются
+      в пакет (до NLP_BATCH_SIZE текстов или NLP_BATCH_WAIT секунд);
+    - пакет уходит в пул из NLP_WORKERS процессов, где spaCy
+      обрабатывает его через nlp.pipe с отключенными ненужными для NER
+      компонентами, а NLTK и TextBlob - по тексту;
+    - результат для страницы: entities_spacy, entities_nltk, sentiment
+      в прежнем формате nlp_analysis.
+
+При NLP_WORKERS = 0 пакет обрабатывается в потоке, вне цикла событий.
+Без установленных NLP-библиотек анализ не запускается вовсе.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Optional, Set
+
+from config.settings import settings
+from .nlp_loader import nlp_loader, SPACY_AVAILABLE, NLTK_AVAILABLE, TEXTBLOB_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+# Компоненты spaCy, нужные для именованных сущностей
+SPACY_NER_COMPONENTS = ('tok2vec', 'ner')
+
+NEUTRAL_SENTIMENT = {'polarity': 0.0, 'subjectivity': 0.0}
+
+
+def spacy_doc_entities(doc) -> Dict[str, List[str]]:
+    """Именованные сущности документа spaCy по меткам"""
+    entities = defaultdict(list)
+    for ent in doc.ents:
+        entities[ent.label_].append(ent.text)
+    return dict(entities)
+
+
+def nltk_entities(text: str) -> Dict[str, List[str]]:
+    """Именованные сущности NLTK (ne_chunk)"""
+    nltk_api = nlp_loader.nltk()
+    if not nltk_api:
+        return {}
+    try:
+        chunks = nltk_api.ne_chunk(nltk_api.pos_tag(nltk_api.word_tokenize(text)))
+        entities = defaultdict(list)
+        for chunk in chunks:
+            if isinstance(chunk, nltk_api.Tree):
+                entities[chunk.label()].append(' '.join(token for token, pos in chunk.leaves()))
+        return dict(entities)
+    except Exception as e:
+        logger.error(f"NLTK entity extraction error: {e}")
+        return {}
+
+
+def text_sentiment(text: str) -> Dict[str, float]:
+    """Тональность TextBlob"""
+    TextBlob = nlp_loader.textblob()
+    if not TextBlob:
+        return dict(NEUTRAL_SENTIMENT)
+    try:
+        sentiment = TextBlob(text).sentiment
+        return {'polarity': sentiment.polarity, 'subjectivity': sentiment.subjectivity}
+    except Exception as e:
+        logger.error(f"Sentiment analysis error: {e}")
+        return dict(NEUTRAL_SENTIMENT)
+
+
+def analyze_batch(texts: List[str], batch_size: int) -> List[Dict[str, Any]]:
+    """Анализ пакета текстов (выполняется в процессе пула)"""
+    spacy_results: List[Dict[str, List[str]]] = [{} for _ in texts]
+    nlp = nlp_loader.spacy_model()
+    if nlp is not None:
+        try:
+            disable = [name for name in nlp.pipe_names if name not in SPACY_NER_COMPONENTS]
+            for i, doc in enumerate(nlp.pipe(texts, batch_size=batch_size, disable=disable)):
+                spacy_results[i] = spacy_doc_entities(doc)
+        except Exception as e:
+            logger.error(f"spaCy batch entity extraction error: {e}")
+
+    return [
+        {
+            'entities_spacy': spacy_entities,
+            'entities_nltk': nltk_entities(text),
+            'sentiment': text_sentiment(text)
+        }
+        for text, spacy_entities in zip(texts, spacy_results)
+    ]
+
+
+def _init_worker() -> None:
+    """Загрузка моделей при старте процесса пула"""
+    nlp_loader.warm_up()
+
+
+class NLPPipeline:
+    """Сборка текстов страниц в пакеты и их анализ в пуле процессов"""
+
+    def __init__(self, workers: Optional[int] = None, batch_size: Optional[int] = None,
+                 batch_wait: Optional[float] = None):
+        self.workers = settings.NLP_WORKERS if workers is None else workers
+        self.batch_size = batch_size or settings.NLP_BATCH_SIZE
+        self.batch_wait = settings.NLP_BATCH_WAIT if batch_wait is None else batch_wait
+        self.max_text_chars = settings.NLP_MAX_TEXT_CHARS
+        self.enabled = SPACY_AVAILABLE or NLTK_AVAILABLE or TEXTBLOB_AVAILABLE
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: List[tuple] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Ссылки на выполняющиеся пакеты, чтобы задачи не удалил сборщик мусора
+        self._batches: Set[asyncio.Task] = set()
+        self.stats = {'texts': 0, 'batches': 0}
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        if self._executor is None:
+            # spawn: процесс пула не наследует потоки и блокировки родителя
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(settings.NLP_WORKER_START_METHOD),
+                initializer=_init_worker
+            )
+        return self._executor
+
+    async def analyze(self, text: str) -> Dict[str, Any]:
+        """Результат анализа текста страницы (текст попадает в ближайший пакет)"""
+        if not self.enabled:
+            return {'entities_spacy': {}, 'entities_nltk': {}, 'sentiment': dict(NEUTRAL_SENTIMENT)}
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text[:self.max_text_chars], future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_wait, self._flush)
+        return await future
+
+    async def analyze_many(self, texts: List[str]) -> List[Dict[str, Any]]:
+        return await asyncio.gather(*(self.analyze(text) for text in texts))
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[tuple]) -> None:
+        texts = [text for text, _ in batch]
+        loop = asyncio.get_running_loop()
+        self.stats['texts'] += len(texts)
+        self.stats['batches'] += 1
+        try:
+            try:
+                results = await loop.run_in_executor(self._get_executor(), analyze_batch, texts, self.batch_size)
+            except BrokenProcessPool:
+                logger.warning("NLP worker pool is broken, analyzing batch in a thread")
+                self._executor = None
+                results = await loop.run_in_executor(None, analyze_batch, texts, self.batch_size)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Глобальный NLP-конвейер
+nlp_pipeline = NLPPipeline()
@@ -0,0 +1,267 @@
+"""
+Поиск дубликатов страниц по SimHash
+
+Зеркала, перепечатанные биографии и копии одной страницы приходят из
+разных поисковых систем под разными URL. Для загруженной страницы (до
+разбора HTML) считается 64-битный SimHash по шинглам ее текста и хеш
+самого текста. Если отпечаток отличается от уже обработанного не более
+чем на NEAR_DUPLICATE_MAX_DISTANCE бит и текст совпадает, извлечение
+данных пропускается, а используются данные найденного дубликата.
+
+Близкого отпечатка недостаточно: страницы сотрудников одного шаблона
+(общие навигация и подвал) отличаются на несколько бит, и их контакты
+были бы приписаны другому человеку. Поэтому SimHash только отбирает
+кандидатов, а данные берутся повторно лишь при совпадении хеша текста.
+
+Отпечатки хранятся в памяти на время анализа (NearDuplicateIndex) и в
+таблице page_fingerprints между анализами (FingerprintStore). Поиск
+кандидатов идет по четырем 16-битным полосам отпечатка: при расстоянии
+не больше 3 бит хотя бы одна полоса совпадает. Запросы к таблице
+синхронные, поэтому NearDuplicateDetector выполняет их в потоке, вне
+цикла событий, через отдельное соединение BackgroundSessionLocal.
+"""
+
+import re
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import or_
+
+from config.settings import settings
+from database.connection import BackgroundSessionLocal
+from database.models import PageFingerprint
+from .metrics import NEAR_DUPLICATES
+from .url_canonicalizer import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+
+# Длина шингла (слов) для текста страницы
+SHINGLE_SIZE = 3
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_SCRIPT_RE = re.compile(r'<(script|style|noscript)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+_BIT_SHIFTS = np.arange(SIMHASH_BITS, dtype=np.uint64)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def html_text(html: str) -> str:
+    """Видимый текст HTML без разбора в дерево (достаточно для отпечатка)"""
+    return _TAG_RE.sub(' ', _SCRIPT_RE.sub(' ', html or ''))
+
+
+def simhash(tokens: List[str], shingle_size: int = 1) -> Optional[int]:
+    """64-битный SimHash последовательности слов (None для пустого текста)"""
+    if shingle_size > 1 and len(tokens) >= shingle_size:
+        features = [' '.join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+    else:
+        features = tokens
+    if not features:
+        return None
+
+    unique, counts = np.unique(np.array(features), return_counts=True)
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+         for feature in unique),
+        dtype=np.uint64, count=len(unique)
+    )
+    # Разряды всех хешей сразу: +вес для единичного бита, -вес для нулевого
+    bits = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.int64)
+    scores = (counts[:, None] * (2 * bits - 1)).sum(axis=0)
+    return sum(1 << int(i) for i in np.flatnonzero(scores > 0))
+
+
+def text_fingerprint(text: str, shingle_size: int = 1) -> Optional[int]:
+    """Отпечаток текста или None, если текст слишком короткий для сравнения"""
+    tokens = tokenize(text)
+    if len(tokens) < settings.NEAR_DUPLICATE_MIN_TOKENS:
+        return None
+    return simhash(tokens, shingle_size)
+
+
+def content_digest(tokens: List[str]) -> str:
+    """Хеш текста без учета разметки, регистра и пробелов"""
+    return hashlib.blake2b(' '.join(tokens).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def page_fingerprint(html: str) -> Optional[Tuple[int, str]]:
+    """(SimHash шинглов, хеш текста) страницы или None, если текст слишком короткий"""
+    tokens = tokenize(html_text(html))
+    if len(tokens) < settings.NEAR_DUPLICATE_MIN_TOKENS:
+        return None
+    return simhash(tokens, SHINGLE_SIZE), content_digest(tokens)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def bands(fingerprint: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(fingerprint >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+def _to_signed(fingerprint: int) -> int:
+    return fingerprint - (1 << SIMHASH_BITS) if fingerprint >= 1 << (SIMHASH_BITS - 1) else fingerprint
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << SIMHASH_BITS) if value < 0 else value
+
+
+class NearDuplicateIndex:
+    """Отпечатки, обработанные в рамках одного анализа"""
+
+    def __init__(self, max_distance: Optional[int] = None):
+        self.max_distance = settings.NEAR_DUPLICATE_MAX_DISTANCE if max_distance is None else max_distance
+        self._bands: List[Dict[int, List[str]]] = [{} for _ in range(BANDS)]
+        self._fingerprints: Dict[str, int] = {}
+        self._digests: Dict[str, Optional[str]] = {}
+        self._data: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def add(self, key: str, fingerprint: int, data: Any = None, digest: Optional[str] = None) -> None:
+        if key in self._fingerprints:
+            return
+        self._fingerprints[key] = fingerprint
+        self._digests[key] = digest
+        self._data[key] = data
+        for band_index, band in enumerate(bands(fingerprint)):
+            self._bands[band_index].setdefault(band, []).append(key)
+
+    def find(self, fingerprint: int, digest: Optional[str] = None) -> Optional[Tuple[str, int, Any]]:
+        """Ближайший почти-дубликат: (ключ, расстояние, данные); с digest - только с тем же текстом"""
+        best = None
+        for band_index, band in enumerate(bands(fingerprint)):
+            for key in self._bands[band_index].get(band, ()):
+                if digest is not None and self._digests[key] != digest:
+                    continue
+                distance = hamming_distance(fingerprint, self._fingerprints[key])
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (key, distance, self._data[key])
+        return best
+
+
+class FingerprintStore:
+    """Отпечатки страниц в базе данных для поиска дубликатов между анализами"""
+
+    def __init__(self, session_factory=BackgroundSessionLocal, max_distance: Optional[int] = None):
+        self.session_factory = session_factory
+        self.max_distance = settings.NEAR_DUPLICATE_MAX_DISTANCE if max_distance is None else max_distance
+
+    def find(self, kind: str, fingerprint: int, digest: str,
+             exclude_url: Optional[str] = None) -> Optional[Tuple[str, int, Any]]:
+        """Сохраненная страница с тем же текстом и извлеченными данными: (url, расстояние, данные)"""
+        fingerprint_bands = bands(fingerprint)
+        since = datetime.utcnow() - timedelta(seconds=settings.NEAR_DUPLICATE_TTL)
+        db = self.session_factory()
+        try:
+            candidates = db.query(PageFingerprint.url, PageFingerprint.simhash, PageFingerprint.extracted_data).filter(
+                PageFingerprint.kind == kind,
+                PageFingerprint.content_digest == digest,
+                PageFingerprint.extracted_data.isnot(None),
+                PageFingerprint.updated_at >= since,
+                or_(*[getattr(PageFingerprint, f'band{i}') == band for i, band in enumerate(fingerprint_bands)])
+            ).limit(200).all()
+        except Exception as e:
+            logger.warning(f"Error looking up page fingerprints: {e}")
+            return None
+        finally:
+            db.close()
+
+        best = None
+        for url, stored, data in candidates:
+            if url == exclude_url:
+                continue
+            distance = hamming_distance(fingerprint, _to_unsigned(stored))
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (url, distance, data)
+        return best
+
+    def record(self, url: str, kind: str, fingerprint: int, digest: str, extracted_data: Any = None) -> None:
+        """Сохранение отпечатка (повторная запись обновляет отпечаток и данные)"""
+        db = self.session_factory()
+        try:
+            row = db.query(PageFingerprint).filter(PageFingerprint.url == url, PageFingerprint.kind == kind).first()
+            if row is None:
+                row = PageFingerprint(url=url, kind=kind)
+                db.add(row)
+            row.simhash = _to_signed(fingerprint)
+            row.content_digest = digest
+            for i, band in enumerate(bands(fingerprint)):
+                setattr(row, f'band{i}', band)
+            row.extracted_data = extracted_data
+            row.updated_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Error saving page fingerprint for {url}: {e}")
+        finally:
+            db.close()
+
+
+class NearDuplicateDetector:
+    """
+    Проверка загруженных страниц одного анализа на дубликаты
+
+    kind разделяет отпечатки с данными разного формата: result_page
+    (SearchResultProcessor) и scraped_page (EnhancedWebScraper).
+    signature - результат page_fingerprint(): (SimHash, хеш текста).
+    """
+
+    def __init__(self, store: Optional[FingerprintStore] = None, persistent: bool = True):
+        self.enabled = settings.NEAR_DUPLICATE_ENABLED
+        self.store = (store or FingerprintStore()) if persistent else None
+        self.run_index: Dict[str, NearDuplicateIndex] = {}
+        self.stats: Dict[str, int] = {}
+
+    async def check(self, kind: str, url: str, signature: Optional[Tuple[int, str]]) -> Optional[Tuple[str, Any]]:
+        """(URL дубликата, его данные) или None, если страницу нужно обработать"""
+        if not self.enabled or signature is None:
+            return None
+        url = canonicalize_url(url)
+        fingerprint, digest = signature
+
+        match = self.run_index.setdefault(kind, NearDuplicateIndex()).find(fingerprint, digest)
+        scope = 'run'
+        if match is None and self.store is not None:
+            match = await asyncio.to_thread(self.store.find, kind, fingerprint, digest, url)
+            scope = 'index'
+        if match is None:
+            return None
+
+        duplicate_url, distance, data = match
+        if data is None:
+            # Дубликат из текущего анализа еще обрабатывается
+            return None
+        self.record_hit(kind, scope)
+        logger.info(f"Near-duplicate {kind} {url} ~ {duplicate_url} (distance {distance}, {scope})")
+        return duplicate_url, data
+
+    def record_hit(self, kind: str, scope: str) -> None:
+        """Учет найденного дубликата"""
+        self.stats[kind] = self.stats.get(kind, 0) + 1
+        NEAR_DUPLICATES.labels(kind, scope).inc()
+
+    async def remember(self, kind: str, url: str, signature: Optional[Tuple[int, str]], data: Any) -> None:
+        """Учет обработанной страницы в текущем анализе и в базе"""
+        if not self.enabled or signature is None:
+            return
+        url = canonicalize_url(url)
+        fingerprint, digest = signature
+        self.run_index.setdefault(kind, NearDuplicateIndex()).add(url, fingerprint, data, digest)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.record, url, kind, fingerprint, digest, data)
@@ -0,0 +1,157 @@
+"""
+Разобранная страница, общая для всех извлекателей данных
+
+Раньше каждый извлекатель EnhancedWebScraper сам вызывал soup.get_text()
+(персональная и контактная информация, ключевые слова, NLP-анализ, текст
+для nlp_pipeline - до пяти обходов дерева на страницу) и сам искал
+ссылки и мета-теги. _extract_keywords_enhanced к тому же удалял из
+дерева script/style/nav/header/footer (decompose), и извлекатели после
+него видели уже другую страницу.
+
+ParsedDocument разбирает HTML один раз и лениво, с кэшированием,
+вычисляет:
+
+    text          - весь видимый текст (как soup.get_text());
+    content_text  - текст без навигации, шапки и подвала, без изменения
+                    дерева;
+    title, meta   - заголовок и мета-теги (property/name -> content);
+    anchors,
+    links         - <a href> и все ссылки (<a href>, <link href>).
+
+select() сначала сверяет классы, id и атрибуты, которых требует
+CSS-селектор, с индексом документа (один обход дерева) и не обходит
+дерево для селекторов, заведомо ничего не находящих. Из трех десятков
+селекторов персональной информации на обычной странице совпадают
+единицы.
+"""
+
+import re
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from bs4 import BeautifulSoup, Tag
+
+# Блоки, не относящиеся к содержимому страницы (ключевые слова, NLP-анализ)
+NON_CONTENT_TAGS = ('script', 'style', 'nav', 'header', 'footer')
+
+_SELECTOR_ATTRIBUTE_RE = re.compile(r'\[\s*([\w-]+)[^\]]*\]')
+_SELECTOR_CLASS_RE = re.compile(r'\.([\w-]+)')
+_SELECTOR_ID_RE = re.compile(r'#([\w-]+)')
+
+
+def selector_requirements(selector: str) -> Optional[Tuple[Set[str], Set[str], Set[str]]]:
+    """
+    Классы, id и имена атрибутов, без которых селектор не совпадет ни с чем
+
+    None - селектор с перечислением, псевдоклассами или экранированием,
+    для него проверка не выполняется.
+    """
+    if any(char in selector for char in ',:\\'):
+        return None
+    attributes = {name.lower() for name in _SELECTOR_ATTRIBUTE_RE.findall(selector)}
+    plain = _SELECTOR_ATTRIBUTE_RE.sub(' ', selector)
+    classes = {name.lower() for name in _SELECTOR_CLASS_RE.findall(plain)}
+    ids = {name.lower() for name in _SELECTOR_ID_RE.findall(plain)}
+    return classes, ids, attributes
+
+
+class ParsedDocument:
+    """HTML-страница, разобранная один раз, с ленивыми производными данными"""
+
+    def __init__(self, html: Optional[str] = None, url: str = '', soup: Optional[BeautifulSoup] = None,
+                 parser: str = 'html.parser'):
+        self.url = url
+        self._html = html
+        self._parser = parser
+        self._soup = soup
+        self._cache: Dict[str, object] = {}
+
+    @classmethod
+    def wrap(cls, source: Union['ParsedDocument', BeautifulSoup, Tag]) -> 'ParsedDocument':
+        """Документ для извлекателей, которые по-прежнему могут получить BeautifulSoup"""
+        if isinstance(source, ParsedDocument):
+            return source
+        return cls(soup=source)
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = BeautifulSoup(self._html or '', self._parser)
+        return self._soup
+
+    def _cached(self, key: str, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def text(self) -> str:
+        """Весь видимый текст страницы"""
+        return self._cached('text', self.soup.get_text)
+
+    @property
+    def content_text(self) -> str:
+        """Текст без script/style/nav/header/footer (дерево не изменяется)"""
+        def compute() -> str:
+            skipped = {id(string) for tag in self.soup.find_all(NON_CONTENT_TAGS) for string in tag.strings}
+            if not skipped:
+                return self.text
+            return ''.join(string for string in self.soup.strings if id(string) not in skipped)
+        return self._cached('content_text', compute)
+
+    @property
+    def title(self) -> Optional[str]:
+        def compute() -> Optional[str]:
+            title_tag = self.soup.find('title')
+            return title_tag.get_text().strip() if title_tag else None
+        return self._cached('title', compute)
+
+    @property
+    def meta(self) -> Dict[str, str]:
+        """Содержимое мета-тегов по property или name (первое вхождение)"""
+        def compute() -> Dict[str, str]:
+            meta = {}
+            for tag in self.soup.find_all('meta'):
+                content = tag.get('content', '')
+                for attribute in ('property', 'name'):
+                    key = tag.get(attribute)
+                    if key and key not in meta:
+                        meta[key] = content
+            return meta
+        return self._cached('meta', compute)
+
+    @property
+    def anchors(self) -> List[Tag]:
+        """Ссылки <a href> в порядке документа"""
+        return self._cached('anchors', lambda: self.soup.find_all('a', href=True))
+
+    @property
+    def links(self) -> List[Tag]:
+        """Все ссылки страницы: <a href>, затем <link href>"""
+        return self._cached('links', lambda: self.anchors + self.soup.find_all('link', href=True))
+
+    @property
+    def index(self) -> Tuple[Set[str], Set[str], Set[str]]:
+        """Классы, id и имена атрибутов, встречающиеся в документе"""
+        def compute() -> Tuple[Set[str], Set[str], Set[str]]:
+            classes, ids, attributes = set(), set(), set()
+            for tag in self.soup.find_all(True):
+                if not tag.attrs:
+                    continue
+                attributes.update(tag.attrs)
+                for name in tag.get('class') or ():
+                    classes.add(name.lower())
+                if tag.get('id'):
+                    ids.add(str(tag['id']).lower())
+            return classes, ids, attributes
+        return self._cached('index', compute)
+
+    def select(self, selector: str) -> List[Tag]:
+        """soup.select() без обхода дерева для селекторов, которым нечему совпасть"""
+        requirements = selector_requirements(selector)
+        if requirements is not None:
+            classes, ids, attributes = self.index
+            required_classes, required_ids, required_attributes = requirements
+            if (not required_classes <= classes or not required_ids <= ids
+                    or not required_attributes <= attributes):
+                return []
+        return self.soup.select(selector)
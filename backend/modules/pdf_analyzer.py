@@ -17,6 +17,9 @@ from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 import time
 
+from .tracing import span
+from config.settings import settings
+
 # PDF processing libraries
 try:
     import PyPDF2
@@ -135,10 +138,11 @@ class PDFAnalyzer:
     async def _search_engine_for_pdfs(self, search_url: str, engine_name: str) -> List[str]:
         """Поиск PDF ссылок через поисковую систему"""
         try:
-            async with self.session.get(search_url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                if response.status == 200:
-                    content = await response.text()
-                    return self._extract_pdf_links(content)
+            with span(f'http.pdf_search.{engine_name}', 'http', url=search_url):
+                async with self.session.get(search_url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    if response.status == 200:
+                        content = await response.text()
+                        return self._extract_pdf_links(content)
         except Exception as e:
             logger.warning(f"Failed to search {engine_name}: {e}")
         return []
@@ -147,17 +151,18 @@ class PDFAnalyzer:
         """Поиск в академических репозиториях"""
         results = []
         try:
-            async with self.session.get(search_url, timeout=aiohttp.ClientTimeout(total=15)) as response:
-                if response.status == 200:
-                    content = await response.text()
+            with span(f'http.repository.{repo_name}', 'http', url=search_url):
+                async with self.session.get(search_url, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    if response.status == 200:
+                        content = await response.text()
                     
-                    # Извлекаем ссылки на статьи/документы
-                    if 'scholar.google' in search_url:
-                        results.extend(await self._parse_google_scholar(content, email))
-                    elif 'researchgate' in search_url:
-                        results.extend(await self._parse_researchgate(content, email))
-                    elif 'arxiv' in search_url:
-                        results.extend(await self._parse_arxiv(content, email))
+                        # Извлекаем ссылки на статьи/документы
+                        if 'scholar.google' in search_url:
+                            results.extend(await self._parse_google_scholar(content, email))
+                        elif 'researchgate' in search_url:
+                            results.extend(await self._parse_researchgate(content, email))
+                        elif 'arxiv' in search_url:
+                            results.extend(await self._parse_arxiv(content, email))
                         
         except Exception as e:
             logger.warning(f"Failed to search {repo_name}: {e}")
@@ -209,7 +214,8 @@ class PDFAnalyzer:
                 f.write(pdf_data)
             
             # Анализ содержимого
-            analysis_result = await self._analyze_pdf_content(temp_path, target_email, pdf_url)
+            with span('parse.pdf', 'parse', url=pdf_url, bytes=len(pdf_data)):
+                analysis_result = await self._analyze_pdf_content(temp_path, target_email, pdf_url)
             
             # Удаление временного файла
             temp_path.unlink(missing_ok=True)
@@ -223,11 +229,12 @@ class PDFAnalyzer:
     async def _download_pdf(self, pdf_url: str) -> Optional[bytes]:
         """Скачивание PDF файла"""
         try:
-            async with self.session.get(pdf_url, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                if response.status == 200 and 'pdf' in response.headers.get('content-type', '').lower():
-                    content = await response.read()
-                    if len(content) > 1000:  # Минимальный размер PDF
-                        return content
+            with span('http.pdf_download', 'http', url=pdf_url):
+                async with self.session.get(pdf_url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                    if response.status == 200 and 'pdf' in response.headers.get('content-type', '').lower():
+                        content = await response.read()
+                        if len(content) > 1000:  # Минимальный размер PDF
+                            return content
         except Exception as e:
             logger.warning(f"Failed to download PDF {pdf_url}: {e}")
         return None
@@ -252,6 +259,7 @@ class PDFAnalyzer:
                 'email_found': len(email_contexts) > 0,
                 'email_contexts': email_contexts,
                 'text_length': len(text),
+                'text_excerpt': text[:settings.FULLTEXT_PDF_TEXT_CHARS],
                 'all_emails': metadata.get('all_emails', []),
                 'confidence_score': self._calculate_pdf_confidence(email_contexts, metadata),
                 'analysis_timestamp': datetime.now().isoformat()
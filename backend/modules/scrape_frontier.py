@@ -0,0 +1,249 @@
+"""
+Приоритетная очередь загрузки страниц (frontier)
+
+Результаты поиска загружаются не по порядку списка, а по приоритету:
+
+    priority = (relevance_score + FRONTIER_BASE_PRIORITY)
+               * yield_factor(host)
+               / (1 + FRONTIER_HOST_DIVERSITY_PENALTY * загружено_с_хоста)
+
+yield_factor - доля страниц хоста, с которых в прошлых анализах удалось
+извлечь данные (сглаженная, 1.0 для неизвестного хоста). Хосты, которые
+не дают данных, опускаются в конец очереди; повторные страницы одного
+хоста уступают страницам других хостов.
+
+Загрузка идет параллельно (FRONTIER_CONCURRENCY), но не более
+FRONTIER_PER_HOST_CONCURRENCY запросов к одному хосту и не чаще одного
+запроса в FRONTIER_HOST_DELAY секунд. Очередь останавливается, когда
+исчерпан бюджет страниц, байт или времени; оставшиеся URL не
+загружаются.
+"""
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple, Callable, Awaitable
+from urllib.parse import urlsplit
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Результат загрузки: (данные, размер ответа в байтах, полезные ли данные)
+FetchResult = Tuple[Any, int, Optional[bool]]
+
+
+class HostYieldTracker:
+    """Доля страниц хоста, с которых были извлечены данные (между анализами)"""
+
+    def __init__(self, max_hosts: int = 10000):
+        self.max_hosts = max_hosts
+        self._hosts: "OrderedDict[str, List[int]]" = OrderedDict()
+
+    def record(self, host: str, useful: bool) -> None:
+        stats = self._hosts.pop(host, None) or [0, 0]
+        stats[0] += 1
+        stats[1] += int(useful)
+        self._hosts[host] = stats
+        if len(self._hosts) > self.max_hosts:
+            self._hosts.popitem(last=False)
+
+    def factor(self, host: str) -> float:
+        """Множитель приоритета: 1.0 без истории, от ~0 до ~2 по мере накопления"""
+        attempts, useful = self._hosts.get(host, (0, 0))
+        return 2.0 * (useful + 1) / (attempts + 2)
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {host: {'attempts': attempts, 'useful': useful}
+                for host, (attempts, useful) in self._hosts.items()}
+
+
+# Глобальная статистика хостов
+host_yield_tracker = HostYieldTracker()
+
+
+@dataclass
+class FrontierEntry:
+    url: str
+    host: str
+    relevance: float
+    order: int
+    item: Any = None
+
+
+@dataclass
+class _HostState:
+    in_flight: int = 0
+    dispatched: int = 0
+    next_allowed: float = 0.0
+
+
+@dataclass
+class FrontierBudget:
+    max_pages: int = field(default_factory=lambda: settings.FRONTIER_MAX_PAGES)
+    max_bytes: int = field(default_factory=lambda: settings.FRONTIER_MAX_BYTES)
+    max_seconds: float = field(default_factory=lambda: settings.FRONTIER_TIME_BUDGET)
+
+
+class ScrapeFrontier:
+    """Очередь URL с приоритетами, вежливостью по хостам и бюджетом загрузки"""
+
+    def __init__(self, budget: Optional[FrontierBudget] = None,
+                 concurrency: Optional[int] = None,
+                 per_host_concurrency: Optional[int] = None,
+                 host_delay: Optional[float] = None,
+                 yield_tracker: Optional[HostYieldTracker] = None):
+        self.budget = budget or FrontierBudget()
+        self.concurrency = concurrency or settings.FRONTIER_CONCURRENCY
+        self.per_host_concurrency = per_host_concurrency or settings.FRONTIER_PER_HOST_CONCURRENCY
+        self.host_delay = settings.FRONTIER_HOST_DELAY if host_delay is None else host_delay
+        self.yield_tracker = yield_tracker or host_yield_tracker
+
+        self.entries: List[FrontierEntry] = []
+        self._pending: List[FrontierEntry] = []
+        self._hosts: Dict[str, _HostState] = {}
+        self.stats = {
+            'queued': 0,
+            'fetched': 0,
+            'failed': 0,
+            'skipped': 0,
+            'bytes': 0,
+            'stop_reason': None
+        }
+
+    def add(self, url: str, relevance: float = 0.0, item: Any = None) -> None:
+        host = (urlsplit(url).hostname or '').lower()
+        entry = FrontierEntry(url, host, relevance or 0.0, len(self.entries), item)
+        self.entries.append(entry)
+        self._pending.append(entry)
+        self.stats['queued'] += 1
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def priority(self, entry: FrontierEntry) -> float:
+        state = self._hosts.get(entry.host)
+        dispatched = state.dispatched if state else 0
+        return ((entry.relevance + settings.FRONTIER_BASE_PRIORITY)
+                * self.yield_tracker.factor(entry.host)
+                / (1 + settings.FRONTIER_HOST_DIVERSITY_PENALTY * dispatched))
+
+    def _pop_ready(self, now: float) -> Tuple[Optional[FrontierEntry], Optional[float]]:
+        """
+        Лучший URL, хост которого доступен, или (None, время ожидания до
+        освобождения ближайшего хоста)
+
+        Приоритет зависит от числа уже загруженных страниц хоста, поэтому
+        пересчитывается при каждом выборе; очередь одного анализа
+        невелика (десятки URL).
+        """
+        best = best_priority = None
+        wait = None
+        for entry in self._pending:
+            state = self._hosts.get(entry.host)
+            if state is not None:
+                if state.in_flight >= self.per_host_concurrency:
+                    continue
+                if state.next_allowed > now:
+                    delay = state.next_allowed - now
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+            entry_priority = self.priority(entry)
+            if best is None or entry_priority > best_priority or (
+                    entry_priority == best_priority and entry.order < best.order):
+                best, best_priority = entry, entry_priority
+        if best is not None:
+            self._pending.remove(best)
+        return best, wait
+
+    def _budget_exhausted(self) -> Optional[str]:
+        if self.stats['fetched'] + self.stats['failed'] >= self.budget.max_pages:
+            return 'pages'
+        if self.stats['bytes'] >= self.budget.max_bytes:
+            return 'bytes'
+        return None
+
+    async def _fetch(self, entry: FrontierEntry, fetch: Callable[[FrontierEntry], Awaitable[FetchResult]]):
+        state = self._hosts[entry.host]
+        try:
+            data, size, useful = await fetch(entry)
+        except Exception as e:
+            logger.warning(f"Error fetching {entry.url}: {e}")
+            self.stats['failed'] += 1
+            self.yield_tracker.record(entry.host, False)
+            return entry, None
+        finally:
+            state.in_flight -= 1
+            state.next_allowed = time.monotonic() + self.host_delay
+
+        self.stats['fetched'] += 1
+        self.stats['bytes'] += size
+        if useful is not None:
+            self.yield_tracker.record(entry.host, useful)
+        return entry, data
+
+    async def run(self, fetch: Callable[[FrontierEntry], Awaitable[FetchResult]]) -> Dict[int, Any]:
+        """
+        Загрузка очереди; fetch(entry) возвращает (данные, байты, полезность)
+
+        Полезность None - страница не учитывается в статистике хоста
+        (например, данные взяты у почти-дубликата). Возвращает данные по
+        entry.order для загруженных URL.
+        """
+        started = time.monotonic()
+        results: Dict[int, Any] = {}
+        in_flight = set()
+        stop_reason = None
+
+        while True:
+            elapsed = time.monotonic() - started
+            if elapsed >= self.budget.max_seconds:
+                stop_reason = 'time'
+                break
+            stop_reason = stop_reason or self._budget_exhausted()
+
+            # Исчерпанный бюджет страниц или байт останавливает только выдачу новых URL
+            wait = None
+            while not stop_reason and len(in_flight) < self.concurrency \
+                    and len(in_flight) + self.stats['fetched'] + self.stats['failed'] < self.budget.max_pages:
+                entry, wait = self._pop_ready(time.monotonic())
+                if entry is None:
+                    break
+                state = self._hosts.setdefault(entry.host, _HostState())
+                state.in_flight += 1
+                state.dispatched += 1
+                in_flight.add(asyncio.ensure_future(self._fetch(entry, fetch)))
+
+            if not in_flight and (stop_reason or not self._pending):
+                break
+
+            timeout = self.budget.max_seconds - elapsed
+            if wait is not None:
+                timeout = min(wait, timeout)
+            if in_flight:
+                done, in_flight = await asyncio.wait(in_flight, timeout=timeout,
+                                                     return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    entry, data = task.result()
+                    if data is not None:
+                        results[entry.order] = data
+            else:
+                await asyncio.sleep(timeout)
+
+        # Бюджет времени исчерпан: незавершенные загрузки отменяются
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+        self.stats['stop_reason'] = stop_reason
+        self.stats['skipped'] = len(self._pending) + len(in_flight)
+        self.stats['duration'] = round(time.monotonic() - started, 3)
+        if stop_reason:
+            logger.info(f"Scrape frontier stopped by {stop_reason} budget, {self.stats['skipped']} URLs skipped")
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'hosts': {host: state.dispatched for host, state in self._hosts.items()}}
@@ -3,7 +3,7 @@ import aiohttp
 import re
 import json
 import time
-from typing import Dict, List, Optional, Any, Set
+from typing import Dict, List, Optional, Any, Set, Tuple, Union
 from urllib.parse import urljoin, urlparse, quote_plus
 from bs4 import BeautifulSoup
 import logging
@@ -12,6 +12,21 @@ from datetime import datetime
 import random
 import hashlib
 
+from .metrics import (
+    SEARCH_ENGINE_REQUESTS,
+    SEARCH_ENGINE_SECONDS,
+    record_cache_lookup,
+    register_http_pool,
+    track_http_request
+)
+from .tracing import span
+from config.settings import settings
+from .page_fingerprint import NearDuplicateDetector, page_fingerprint
+from .scrape_frontier import ScrapeFrontier
+from .http_cache import http_cache
+from .url_canonicalizer import canonicalize_url, unwrap_redirect
+from .parsed_document import ParsedDocument
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -47,6 +62,8 @@ class SearchEngineManager:
         self.session = None
         self.cache: Dict[str, List[SearchResult]] = {}
         self.last_request_time: Dict[str, float] = {}
+        # Дубликаты, удаленные по каноническому URL (duplicates_canonical - различающиеся строкой)
+        self.url_dedup_stats = {'duplicates_removed': 0, 'duplicates_canonical': 0}
         
         # Поисковые системы и их настройки
         self.search_engines = {
@@ -100,6 +117,7 @@ class SearchEngineManager:
             connector=connector,
             timeout=timeout
         )
+        register_http_pool('search_engines', connector.limit)
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -132,6 +150,7 @@ class SearchEngineManager:
             return []
             
         cache_key = self._get_cache_key(query, engine)
+        record_cache_lookup('search_engine', cache_key in self.cache)
         if cache_key in self.cache:
             logger.info(f"Cache hit for {engine} search: {query}")
             return self.cache[cache_key]
@@ -161,22 +180,29 @@ class SearchEngineManager:
         elif engine == 'bing':
             headers['Accept-Language'] = 'en-US,en;q=0.8'
             
+        start_time = time.perf_counter()
         try:
-            async with self.session.get(search_url, headers=headers) as response:
-                if response.status != 200:
-                    logger.warning(f"Search engine {engine} returned status {response.status}")
-                    return []
-                    
-                html = await response.text()
+            with track_http_request('search_engines'), span(f'http.{engine}', 'http', url=search_url):
+                async with self.session.get(search_url, headers=headers) as response:
+                    SEARCH_ENGINE_REQUESTS.labels(engine, response.status).inc()
+                    if response.status != 200:
+                        logger.warning(f"Search engine {engine} returned status {response.status}")
+                        return []
+                        
+                    html = await response.text()
+            SEARCH_ENGINE_SECONDS.labels(engine).observe(time.perf_counter() - start_time)
+            
+            with span(f'parse.{engine}', 'parse', bytes=len(html)):
                 results = self._parse_search_results(html, engine, engine_config['selectors'])
-                
-                # Кешируем результаты
-                self.cache[cache_key] = results
-                
-                logger.info(f"Found {len(results)} results from {engine}")
-                return results
+            
+            # Кешируем результаты
+            self.cache[cache_key] = results
+            
+            logger.info(f"Found {len(results)} results from {engine}")
+            return results
                 
         except Exception as e:
+            SEARCH_ENGINE_REQUESTS.labels(engine, 'error').inc()
             logger.error(f"Error searching {engine}: {str(e)}")
             return []
             
@@ -213,6 +239,9 @@ class SearchEngineManager:
                     # DuckDuckGo использует перенаправления
                     import urllib.parse
                     url = urllib.parse.unquote(url.split('uddg=')[1])
+                
+                # Остальные обертки редиректов (//duckduckgo.com/l/, bing.com/ck/a)
+                url = unwrap_redirect(url)
                     
                 # Извлекаем описание
                 snippet_elem = result_elem.select_one(selectors['snippet'])
@@ -280,16 +309,31 @@ class SearchEngineManager:
                 continue
             all_results.extend(results)
             
-        # Удаляем дубликаты по URL
+        # Удаляем дубликаты по каноническому URL
+        unique_results = self._unique_results(
+            sorted(all_results, key=lambda x: x.relevance_score, reverse=True)
+        )
+                
+        return unique_results[:self.config.max_results]
+        
+    def _unique_results(self, results: List[SearchResult]) -> List[SearchResult]:
+        """Первый результат для каждого канонического URL"""
         unique_results = []
+        seen_keys = set()
         seen_urls = set()
         
-        for result in sorted(all_results, key=lambda x: x.relevance_score, reverse=True):
-            if result.url not in seen_urls:
-                unique_results.append(result)
-                seen_urls.add(result.url)
-                
-        return unique_results[:self.config.max_results]
+        for result in results:
+            key = canonicalize_url(result.url)
+            if key in seen_keys:
+                self.url_dedup_stats['duplicates_removed'] += 1
+                if result.url not in seen_urls:
+                    self.url_dedup_stats['duplicates_canonical'] += 1
+                continue
+            unique_results.append(result)
+            seen_keys.add(key)
+            seen_urls.add(result.url)
+            
+        return unique_results
         
     def create_search_queries_for_email(self, email: str) -> List[str]:
         """Создание поисковых запросов для email"""
@@ -339,17 +383,16 @@ class SearchEngineManager:
                 logger.error(f"Error in comprehensive search for query '{query}': {str(e)}")
                 
         # Обработка и фильтрация результатов
-        unique_results = []
-        seen_urls = set()
-        
-        for result in sorted(all_results, key=lambda x: x.relevance_score, reverse=True):
-            if result.url not in seen_urls and self._is_relevant_result(result, email):
-                unique_results.append(result)
-                seen_urls.add(result.url)
+        unique_results = self._unique_results([
+            result for result in sorted(all_results, key=lambda x: x.relevance_score, reverse=True)
+            if self._is_relevant_result(result, email)
+        ])
                 
         search_stats['end_time'] = datetime.now().isoformat()
         search_stats['total_results'] = len(all_results)
         search_stats['unique_urls'] = len(unique_results)
+        search_stats['url_duplicates_removed'] = self.url_dedup_stats['duplicates_removed']
+        search_stats['url_duplicates_canonical'] = self.url_dedup_stats['duplicates_canonical']
         
         return {
             'email': email,
@@ -395,11 +438,15 @@ class SearchResultProcessor:
     
     def __init__(self):
         self.session = None
+        # Копии страниц (зеркала, перепечатки) не разбираются повторно
+        self.near_duplicates = NearDuplicateDetector()
+        self.frontier_stats: Dict[str, Any] = {}
         
     async def __aenter__(self):
-        connector = aiohttp.TCPConnector(limit=5)
+        connector = aiohttp.TCPConnector(limit=settings.FRONTIER_CONCURRENCY)
         timeout = aiohttp.ClientTimeout(total=30)
         self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        register_http_pool('search_result_processor', connector.limit)
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -407,71 +454,100 @@ class SearchResultProcessor:
             await self.session.close()
             
     async def process_search_results(self, results: List[SearchResult]) -> List[SearchResult]:
-        """Обработка результатов поиска для извлечения дополнительной информации"""
-        processed_results = []
-        
+        """
+        Обработка результатов поиска для извлечения дополнительной информации
+
+        Страницы загружаются параллельно через ScrapeFrontier в порядке
+        приоритета (релевантность, разнообразие хостов, их прошлая отдача)
+        с ограничением запросов к одному хосту. Результаты, не загруженные
+        из-за исчерпания бюджета, возвращаются без extracted_data.
+        """
+        frontier = ScrapeFrontier()
         for result in results:
-            try:
-                # Извлекаем дополнительные данные с найденных страниц
-                extracted_data = await self._extract_page_data(result.url)
-                result.extracted_data = extracted_data
-                processed_results.append(result)
-                
-                # Задержка между запросами
-                await asyncio.sleep(0.5)
-                
-            except Exception as e:
-                logger.warning(f"Error processing result {result.url}: {str(e)}")
-                processed_results.append(result)  # Добавляем даже с ошибкой
-                
-        return processed_results
+            frontier.add(result.url, result.relevance_score, result)
+        
+        async def fetch(entry):
+            extracted_data, size = await self._fetch_page_data(entry.url)
+            if 'duplicate_of' in extracted_data:
+                return extracted_data, size, None
+            useful = bool(
+                extracted_data.get('emails') or extracted_data.get('social_links')
+                or any((extracted_data.get('contact_info') or {}).values())
+            )
+            return extracted_data, size, useful
+        
+        fetched = await frontier.run(fetch)
+        for order, extracted_data in fetched.items():
+            if not extracted_data:
+                continue
+            frontier.entries[order].item.extracted_data = extracted_data
+        
+        self.frontier_stats = frontier.get_stats()
+        return results
         
     async def _extract_page_data(self, url: str) -> Dict[str, Any]:
         """Извлечение данных со страницы"""
+        extracted_data, _ = await self._fetch_page_data(url)
+        return extracted_data
+        
+    async def _fetch_page_data(self, url: str) -> Tuple[Dict[str, Any], int]:
+        """Извлечение данных со страницы и число загруженных из сети байт"""
+        size = 0
         try:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
-            async with self.session.get(url, headers=headers) as response:
-                if response.status != 200:
-                    return {}
-                    
-                html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
+            with span('http.result_page', 'http', url=url):
+                response = await http_cache.fetch(self.session, url, 'search_result_processor', headers=headers)
+            if response.status != 200:
+                return {}, size
+            # Бюджет очереди учитывает только загруженные из сети байты
+            if not response.from_cache:
+                size = len(response.body)
+            html = response.text()
+            
+            # Текст страницы совпадает с уже разобранной: берем ее данные без разбора HTML
+            page_signature = page_fingerprint(html)
+            duplicate = await self.near_duplicates.check('result_page', url, page_signature)
+            if duplicate:
+                duplicate_url, duplicate_data = duplicate
+                return {**duplicate_data, 'duplicate_of': duplicate_url}, size
+            
+            with span('parse.result_page', 'parse', bytes=len(html)):
+                document = ParsedDocument(html, url)
                 
                 data = {
-                    'page_title': self._extract_page_title(soup),
-                    'meta_description': self._extract_meta_description(soup),
-                    'emails': self._extract_emails(soup),
-                    'social_links': self._extract_social_links(soup),
-                    'contact_info': self._extract_contact_info(soup)
+                    'page_title': self._extract_page_title(document),
+                    'meta_description': self._extract_meta_description(document),
+                    'emails': self._extract_emails(document),
+                    'social_links': self._extract_social_links(document),
+                    'contact_info': self._extract_contact_info(document)
                 }
-                
-                return data
+            
+            await self.near_duplicates.remember('result_page', url, page_signature, data)
+            return data, size
                 
         except Exception as e:
             logger.warning(f"Error extracting data from {url}: {str(e)}")
-            return {}
+            return {}, size
             
-    def _extract_page_title(self, soup: BeautifulSoup) -> str:
+    def _extract_page_title(self, document: Union[ParsedDocument, BeautifulSoup]) -> str:
         """Извлечение заголовка страницы"""
-        title_tag = soup.find('title')
-        return title_tag.get_text().strip() if title_tag else ""
+        return ParsedDocument.wrap(document).title or ""
         
-    def _extract_meta_description(self, soup: BeautifulSoup) -> str:
+    def _extract_meta_description(self, document: Union[ParsedDocument, BeautifulSoup]) -> str:
         """Извлечение мета-описания"""
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        return meta_desc.get('content', '') if meta_desc else ""
+        return ParsedDocument.wrap(document).meta.get('description', '')
         
-    def _extract_emails(self, soup: BeautifulSoup) -> List[str]:
+    def _extract_emails(self, document: Union[ParsedDocument, BeautifulSoup]) -> List[str]:
         """Извлечение email адресов"""
-        text = soup.get_text()
+        text = ParsedDocument.wrap(document).text
         email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
         emails = re.findall(email_pattern, text)
         return list(set(emails))  # Удаляем дубликаты
         
-    def _extract_social_links(self, soup: BeautifulSoup) -> List[Dict[str, str]]:
+    def _extract_social_links(self, document: Union[ParsedDocument, BeautifulSoup]) -> List[Dict[str, str]]:
         """Извлечение ссылок на социальные сети"""
         social_links = []
         social_domains = {
@@ -483,8 +559,7 @@ class SearchResultProcessor:
             'github.com': 'GitHub'
         }
         
-        links = soup.find_all('a', href=True)
-        for link in links:
+        for link in ParsedDocument.wrap(document).anchors:
             href = link.get('href', '').lower()
             for domain, platform in social_domains.items():
                 if domain in href:
@@ -497,9 +572,9 @@ class SearchResultProcessor:
                     
         return social_links
         
-    def _extract_contact_info(self, soup: BeautifulSoup) -> Dict[str, List[str]]:
+    def _extract_contact_info(self, document: Union[ParsedDocument, BeautifulSoup]) -> Dict[str, List[str]]:
         """Извлечение контактной информации"""
-        text = soup.get_text()
+        text = ParsedDocument.wrap(document).text
         
         # Поиск телефонов
         phone_patterns = [
@@ -8,6 +8,8 @@ from bs4 import BeautifulSoup
 import logging
 
 from config.settings import settings
+from .http_cache import http_cache
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -26,14 +28,16 @@ class BaseCollector:
         raise NotImplementedError
     
     async def _get_page(self, url: str, **kwargs) -> Optional[str]:
-        """Безопасное получение страницы"""
+        """Безопасное получение страницы (через общий HTTP-кэш)"""
+        headers = kwargs.pop('headers', self.headers)
         try:
-            async with self.session.get(url, headers=self.headers, **kwargs) as response:
-                if response.status == 200:
-                    return await response.text()
-                else:
-                    logger.warning(f"HTTP {response.status} for {url}")
-                    return None
+            with span('http.get_page', 'http', url=url):
+                response = await http_cache.fetch(self.session, url, 'collectors', headers=headers, **kwargs)
+            if response.status == 200:
+                return response.text()
+            else:
+                logger.warning(f"HTTP {response.status} for {url}")
+                return None
         except Exception as e:
             logger.error(f"Error fetching {url}: {e}")
             return None
@@ -0,0 +1,282 @@
+"""
+Легковесная трассировка этапов анализа
+
+Спаны вкладываются друг в друга через contextvars, поэтому корректно
+работают внутри asyncio.gather: каждая задача наследует текущий спан
+на момент создания. Вне активной трассы span() ничего не делает.
+
+Трасса экспортируется в формате Chrome Trace Event (открывается в
+chrome://tracing и Perfetto) и может быть возвращена в ответе API в виде
+дерева спанов.
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import functools
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar[Optional['Trace']] = ContextVar('current_trace', default=None)
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class Span:
+    """Интервал выполнения с атрибутами и дочерними спанами"""
+
+    __slots__ = ('name', 'category', 'span_id', 'parent_id', 'start', 'end',
+                 'attributes', 'children', 'tid', 'error')
+
+    def __init__(self, name: str, category: str, parent: Optional['Span'],
+                 tid: int, attributes: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.children: List['Span'] = []
+        self.tid = tid
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class Trace:
+    """Трасса одного анализа"""
+
+    def __init__(self, name: str, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = attributes
+        self.started_at = datetime.utcnow()
+        self.origin = time.perf_counter()
+        self.roots: List[Span] = []
+        self.span_count = 0
+        self._tids: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def _tid(self) -> int:
+        """Номер дорожки: отдельная для каждой asyncio-задачи, чтобы параллельные спаны не перекрывались"""
+        try:
+            key = id(asyncio.current_task())
+        except RuntimeError:
+            key = threading.get_ident()
+        with self._lock:
+            if key not in self._tids:
+                self._tids[key] = len(self._tids) + 1
+            return self._tids[key]
+
+    def _open(self, name: str, category: str, parent: Optional[Span],
+              attributes: Dict[str, Any]) -> Span:
+        span = Span(name, category, parent, self._tid(), attributes)
+        with self._lock:
+            (parent.children if parent else self.roots).append(span)
+            self.span_count += 1
+        return span
+
+    def _iter_spans(self):
+        stack = list(reversed(self.roots))
+        while stack:
+            span = stack.pop()
+            yield span
+            stack.extend(reversed(span.children))
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Экспорт в формат Chrome Trace Event (полные события ph=X)"""
+        pid = os.getpid()
+        events = [{
+            'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+            'args': {'name': f'task-{tid}'}
+        } for tid in sorted(set(self._tids.values()))]
+
+        for span in self._iter_spans():
+            args = {
+                'span_id': span.span_id,
+                'parent_id': span.parent_id,
+                **{key: _jsonable(value) for key, value in span.attributes.items()}
+            }
+            if span.error:
+                args['error'] = span.error
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': round((span.start - self.origin) * 1e6, 3),
+                'dur': round(span.duration * 1e6, 3),
+                'pid': pid,
+                'tid': span.tid,
+                'args': args
+            })
+
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'trace_id': self.trace_id,
+                'name': self.name,
+                'started_at': self.started_at.isoformat(),
+                **{key: _jsonable(value) for key, value in self.attributes.items()}
+            }
+        }
+
+    def to_tree(self) -> Dict[str, Any]:
+        """Дерево спанов для ответа API"""
+        def node(span: Span) -> Dict[str, Any]:
+            data = {
+                'name': span.name,
+                'category': span.category,
+                'start_ms': round((span.start - self.origin) * 1000, 3),
+                'duration_ms': round(span.duration * 1000, 3)
+            }
+            if span.attributes:
+                data['attributes'] = {key: _jsonable(value) for key, value in span.attributes.items()}
+            if span.error:
+                data['error'] = span.error
+            if span.children:
+                data['children'] = [node(child) for child in span.children]
+            return data
+
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'started_at': self.started_at.isoformat(),
+            'span_count': self.span_count,
+            'spans': [node(span) for span in self.roots]
+        }
+
+    def save(self, directory: Optional[str] = None) -> Optional[str]:
+        """Сохранение трассы в JSON-файл, возвращает путь к файлу"""
+        if directory is None:
+            from config.settings import settings
+            directory = settings.TRACE_EXPORT_DIR
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            timestamp = self.started_at.strftime('%Y%m%d_%H%M%S')
+            path = os.path.join(directory, f"{self.name}_{timestamp}_{self.trace_id[:8]}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+            return path
+        except Exception as e:
+            logger.error(f"Error saving trace {self.trace_id}: {e}")
+            return None
+
+
+def _jsonable(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class span:
+    """
+    Контекстный менеджер спана (синхронный и асинхронный)
+
+    Пример:
+        async with span('search.google', 'http', url=url):
+            ...
+    """
+
+    __slots__ = ('name', 'category', 'attributes', '_span', '_token')
+
+    def __init__(self, name: str, category: str = 'function', **attributes):
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+        self._span: Optional[Span] = None
+        self._token = None
+
+    def __enter__(self) -> Optional[Span]:
+        trace = _current_trace.get()
+        if trace is None:
+            return None
+        self._span = trace._open(self.name, self.category, _current_span.get(), self.attributes)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._span is None:
+            return False
+        self._span.end = time.perf_counter()
+        if exc_type is not None:
+            self._span.error = f"{exc_type.__name__}: {exc_val}"
+        _current_span.reset(self._token)
+        return False
+
+    async def __aenter__(self) -> Optional[Span]:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return self.__exit__(exc_type, exc_val, exc_tb)
+
+
+def traced(name: Optional[str] = None, category: str = 'function'):
+    """Декоратор: выполнение функции (sync или async) оборачивается в спан"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, category):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class start_trace:
+    """
+    Запуск новой трассы в текущем контексте
+
+    Пример:
+        with start_trace('comprehensive_analysis', email=email) as trace:
+            await system.analyze_email(email)
+        trace.save()
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.trace = Trace(name, **attributes)
+        self._root = span(name, 'request', **attributes)
+        self._token = None
+
+    def __enter__(self) -> Trace:
+        self._token = _current_trace.set(self.trace)
+        self._root.__enter__()
+        return self.trace
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._root.__exit__(exc_type, exc_val, exc_tb)
+        _current_trace.reset(self._token)
+        return False
+
+
+def current_trace() -> Optional[Trace]:
+    """Активная трасса текущего контекста"""
+    return _current_trace.get()
+
+
+def current_span() -> Optional[Span]:
+    """Активный спан текущего контекста"""
+    return _current_span.get()
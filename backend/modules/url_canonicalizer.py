@@ -0,0 +1,244 @@
+"""
+Канонизация URL для ключей дедупликации и кэшей
+
+Одна и та же страница приходит из разных поисковых систем в разном
+виде: http и https, со слэшем на конце и без, с utm-метками, с
+мобильного поддомена или обернутой в редирект Google/DuckDuckGo/Bing.
+canonicalize_url приводит такие варианты к одному ключу; загружается
+при этом исходный (развернутый из редиректа) URL.
+
+Правила:
+    - разворачиваются редиректы поисковых систем;
+    - схема приводится к https, хост - к нижнему регистру без www., m.,
+      mobile. и порта по умолчанию; синонимы доменов заменяются
+      (twitter.com -> x.com);
+    - удаляются фрагмент, повторные и завершающий слэши, index.html;
+    - удаляются параметры отслеживания (utm_*, gclid, fbclid, ...), а
+      также ref, si и т.п. на хостах, где они служат для отслеживания
+      (HOST_TRACKING_PARAMS); остальные параметры сортируются;
+    - для отдельных хостов (HOST_RULES) оставляются только значимые
+      параметры и путь приводится к нижнему регистру.
+"""
+
+import re
+import base64
+import logging
+from typing import Dict, List, Any, Optional, Iterable
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# Параметры отслеживания, не влияющие на содержимое страницы
+TRACKING_PARAMS = {
+    'gclid', 'dclid', 'fbclid', 'yclid', 'msclkid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', 'ref_src', 'ref_url', 'referrer', 'spm',
+    'trk', 'trkinfo', 'originalsubdomain'
+}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_', 'hsa_')
+
+# Параметры отслеживания отдельных хостов: на других сайтах те же имена
+# значимы (?ref=<ветка> на GitHub, ?si= в поисковых формах)
+HOST_TRACKING_PARAMS: Dict[str, set] = {
+    'youtube.com': {'si', 'feature'},
+    'spotify.com': {'si'},
+    'amazon.com': {'ref', 'ref_'},
+    'producthunt.com': {'ref'},
+    'medium.com': {'source'}
+}
+
+_HOST_PREFIXES = ('www.', 'm.', 'mobile.')
+
+HOST_ALIASES = {
+    'twitter.com': 'x.com',
+    'fb.com': 'facebook.com',
+    'youtu.be': 'youtube.com'
+}
+
+# Правила хостов: keep_params - оставляемые параметры (пустое множество -
+# все параметры удаляются), lowercase_path - путь не зависит от регистра
+HOST_RULES: Dict[str, Dict[str, Any]] = {
+    'linkedin.com': {'keep_params': set(), 'lowercase_path': True},
+    'x.com': {'keep_params': set(), 'lowercase_path': True},
+    'github.com': {'keep_params': {'tab'}, 'lowercase_path': True},
+    'facebook.com': {'keep_params': {'id'}, 'lowercase_path': True},
+    'instagram.com': {'keep_params': set(), 'lowercase_path': True},
+    'tiktok.com': {'keep_params': set(), 'lowercase_path': True},
+    'youtube.com': {'keep_params': {'v', 'list'}, 'lowercase_path': False},
+    'researchgate.net': {'keep_params': set(), 'lowercase_path': False},
+    'scholar.google.com': {'keep_params': {'user'}, 'lowercase_path': False},
+    'orcid.org': {'keep_params': set(), 'lowercase_path': False},
+    'arxiv.org': {'keep_params': set(), 'lowercase_path': False}
+}
+
+_INDEX_PAGES = re.compile(r'/(index|default)\.(html?|php|aspx?)$', re.IGNORECASE)
+_MAX_REDIRECT_DEPTH = 3
+_OTHER_SCHEME = re.compile(r'^[a-z][a-z0-9+.-]*:(?!\d)', re.IGNORECASE)
+
+
+def _redirect_target(parts) -> Optional[str]:
+    """Целевой URL редиректа поисковой системы или None"""
+    host = (parts.hostname or '').lower()
+    path = parts.path
+    params = dict(parse_qsl(parts.query, keep_blank_values=True))
+
+    if (host.endswith('google.com') or not host) and path == '/url':
+        return params.get('q') or params.get('url')
+    if host.endswith('duckduckgo.com') and path.startswith('/l/'):
+        return params.get('uddg')
+    if host.endswith('bing.com') and path.startswith('/ck/a'):
+        # u=a1<base64url от целевого URL>
+        encoded = params.get('u', '')
+        if encoded.startswith('a1'):
+            try:
+                padded = encoded[2:] + '=' * (-len(encoded[2:]) % 4)
+                return base64.urlsafe_b64decode(padded).decode('utf-8')
+            except Exception:
+                return None
+    return None
+
+
+def unwrap_redirect(url: str) -> str:
+    """URL без обертки редиректа поисковой системы (Google /url, DDG /l/, Bing /ck/a)"""
+    for _ in range(_MAX_REDIRECT_DEPTH):
+        candidate = url.strip()
+        if candidate.startswith('//'):
+            candidate = f'https:{candidate}'
+        try:
+            target = _redirect_target(urlsplit(candidate))
+        except ValueError:
+            return url
+        if not target:
+            return url
+        url = target
+    return url
+
+
+def _canonical_host(host: str) -> str:
+    host = host.lower().rstrip('.')
+    for prefix in _HOST_PREFIXES:
+        if host.startswith(prefix) and host.count('.') > 1:
+            host = host[len(prefix):]
+            break
+    return HOST_ALIASES.get(host, host)
+
+
+def _host_entry(table: Dict[str, Any], host: str, default: Any) -> Any:
+    if host in table:
+        return table[host]
+    # Поддомены получают правило родительского домена (uk.linkedin.com)
+    for domain, entry in table.items():
+        if host.endswith('.' + domain):
+            return entry
+    return default
+
+
+def _host_rule(host: str) -> Dict[str, Any]:
+    return _host_entry(HOST_RULES, host, {})
+
+
+def is_tracking_param(key: str, host: str) -> bool:
+    """Параметр отслеживания: общий или известный для хоста (host без www.)"""
+    lowered = key.lower()
+    if lowered in TRACKING_PARAMS or lowered.startswith(TRACKING_PREFIXES):
+        return True
+    return lowered in _host_entry(HOST_TRACKING_PARAMS, host, ())
+
+
+def canonicalize_url(url: str) -> str:
+    """Канонический ключ URL; некорректный URL возвращается без изменений"""
+    if not url or not isinstance(url, str):
+        return url
+    original = url
+    url = unwrap_redirect(url.strip())
+    if '://' not in url:
+        if _OTHER_SCHEME.match(url):
+            # mailto:, tel:, javascript: и т.п.
+            return original
+        url = f'https://{url.lstrip("/")}'
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return original
+    if parts.scheme.lower() not in ('http', 'https') or not parts.hostname:
+        return original
+
+    host = _canonical_host(parts.hostname)
+    if port and port not in (80, 443):
+        host = f'{host}:{port}'
+    rule = _host_rule(host)
+
+    # youtu.be/<id> - короткая ссылка на видео
+    path = parts.path
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if parts.hostname.lower() == 'youtu.be' and path.strip('/'):
+        query.append(('v', path.strip('/')))
+        path = '/watch'
+
+    path = re.sub(r'/{2,}', '/', path)
+    path = _INDEX_PAGES.sub('', path).rstrip('/')
+    if rule.get('lowercase_path'):
+        path = path.lower()
+
+    keep = rule.get('keep_params')
+    params = []
+    for key, value in query:
+        if is_tracking_param(key, host):
+            continue
+        if keep is not None and key.lower() not in keep:
+            continue
+        params.append((key, value))
+    params.sort()
+
+    return urlunsplit(('https', host, path or '', urlencode(params), ''))
+
+
+def cache_key(url: str) -> str:
+    """
+    Ключ HTTP-кэша: без фрагмента и параметров отслеживания
+
+    В отличие от canonicalize_url хост, схема, путь и значимые параметры
+    не меняются - разные варианты могут отдавать разное содержимое.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    host = (parts.hostname or '').lower()
+    if port and (parts.scheme, port) not in (('http', 80), ('https', 443)):
+        host = f'{host}:{port}'
+    tracking_host = _canonical_host(parts.hostname or '')
+    params = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(key, tracking_host)
+    ]
+    return urlunsplit((parts.scheme.lower(), host, parts.path or '/', urlencode(params), ''))
+
+
+class UrlDeduplicator:
+    """Дедупликация URL по каноническому ключу с подсчетом удаленных дубликатов"""
+
+    def __init__(self):
+        self._seen: Dict[str, set] = {}
+        self.removed: Dict[str, int] = {}
+
+    def add(self, url: str, category: str = 'urls') -> bool:
+        """True для нового URL, False для дубликата (учитывается в статистике)"""
+        seen = self._seen.setdefault(category, set())
+        key = canonicalize_url(url)
+        if key in seen:
+            self.removed[category] = self.removed.get(category, 0) + 1
+            return False
+        seen.add(key)
+        return True
+
+    def unique(self, urls: Iterable[str], category: str = 'urls') -> List[str]:
+        return [url for url in urls if self.add(url, category)]
+
+    def contains(self, url: str, category: str = 'urls') -> bool:
+        return canonicalize_url(url) in self._seen.get(category, ())
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.removed)
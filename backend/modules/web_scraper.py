@@ -12,38 +12,28 @@ from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 import hashlib
 from concurrent.futures import ThreadPoolExecutor
-# Опциональные импорты для NLP
 try:
-    import spacy
-    SPACY_AVAILABLE = True
+    from .metrics import record_cache_lookup, register_http_pool
+    from .tracing import span
+    from .page_fingerprint import NearDuplicateDetector, page_fingerprint
+    from .url_canonicalizer import UrlDeduplicator, canonicalize_url
+    from .http_cache import http_cache
+    from .http_stream import BodyTooLarge
+    from .nlp_loader import nlp_loader
+    from .nlp_pipeline import nlp_pipeline, spacy_doc_entities, nltk_entities, text_sentiment
+    from .language_detector import language_detector
+    from .parsed_document import ParsedDocument
 except ImportError:
-    spacy = None
-    SPACY_AVAILABLE = False
-
-try:
-    from textblob import TextBlob
-    TEXTBLOB_AVAILABLE = True
-except ImportError:
-    TextBlob = None
-    TEXTBLOB_AVAILABLE = False
-
-try:
-    import nltk
-    from nltk.corpus import stopwords
-    from nltk.tokenize import word_tokenize, sent_tokenize
-    from nltk.tag import pos_tag
-    from nltk.chunk import ne_chunk
-    from nltk.tree import Tree
-    NLTK_AVAILABLE = True
-except ImportError:
-    nltk = None
-    stopwords = None
-    word_tokenize = None
-    sent_tokenize = None
-    pos_tag = None
-    ne_chunk = None
-    Tree = None
-    NLTK_AVAILABLE = False
+    from metrics import record_cache_lookup, register_http_pool
+    from tracing import span
+    from page_fingerprint import NearDuplicateDetector, page_fingerprint
+    from url_canonicalizer import UrlDeduplicator, canonicalize_url
+    from http_cache import http_cache
+    from http_stream import BodyTooLarge
+    from nlp_loader import nlp_loader
+    from nlp_pipeline import nlp_pipeline, spacy_doc_entities, nltk_entities, text_sentiment
+    from language_detector import language_detector
+    from parsed_document import ParsedDocument
 
 try:
     from .email_validator import EmailValidator
@@ -61,58 +51,6 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-# Инициализация NLTK (если не загружены)
-if NLTK_AVAILABLE:
-    try:
-        nltk.data.find('tokenizers/punkt')
-    except LookupError:
-        try:
-            nltk.download('punkt')
-        except:
-            logger.warning("Could not download NLTK punkt data")
-        
-    try:
-        nltk.data.find('corpora/stopwords')
-    except LookupError:
-        try:
-            nltk.download('stopwords')
-        except:
-            logger.warning("Could not download NLTK stopwords data")
-        
-    try:
-        nltk.data.find('taggers/averaged_perceptron_tagger')
-    except LookupError:
-        try:
-            nltk.download('averaged_perceptron_tagger')
-        except:
-            logger.warning("Could not download NLTK POS tagger data")
-        
-    try:
-        nltk.data.find('chunkers/maxent_ne_chunker')
-    except LookupError:
-        try:
-            nltk.download('maxent_ne_chunker')
-        except:
-            logger.warning("Could not download NLTK NE chunker data")
-        
-    try:
-        nltk.data.find('corpora/words')
-    except LookupError:
-        try:
-            nltk.download('words')
-        except:
-            logger.warning("Could not download NLTK words data")
-
-# Загрузка spaCy модели (если доступна)
-if SPACY_AVAILABLE:
-    try:
-        nlp = spacy.load("en_core_web_sm")
-    except OSError:
-        logger.warning("spaCy english model not found. Install with: python -m spacy download en_core_web_sm")
-        nlp = None
-else:
-    nlp = None
-
 @dataclass
 class ScrapingConfig:
     """Конфигурация для веб-скрапинга"""
@@ -123,6 +61,7 @@ class ScrapingConfig:
     retry_attempts: int = 3
     retry_delay: float = 1.0
     cache_ttl: int = 3600  # секунды
+    max_page_bytes: Optional[int] = None  # None - settings.HTTP_MAX_BODY_BYTES
     respect_robots_txt: bool = True
     delay_between_requests: float = 1.0
     
@@ -234,89 +173,56 @@ class RateLimiter:
 class NLPProcessor:
     """Обработка текста с использованием NLP"""
     
+    DEFAULT_STOP_WORDS = {
+        'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+        'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through',
+        'during', 'before', 'after', 'above', 'below', 'between',
+        'among', 'this', 'that', 'these', 'those', 'are', 'was',
+        'were', 'been', 'have', 'has', 'had', 'will', 'would',
+        'could', 'should', 'may', 'might', 'must', 'can'
+    }
+    
     def __init__(self):
-        if NLTK_AVAILABLE and stopwords:
+        self._stop_words = None
+        
+    @property
+    def stop_words(self) -> Set[str]:
+        """Стоп-слова NLTK (загружаются при первом обращении)"""
+        if self._stop_words is None:
+            nltk_api = nlp_loader.nltk()
             try:
-                self.stop_words = set(stopwords.words('english'))
-            except:
-                self.stop_words = {
-                    'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-                    'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through',
-                    'during', 'before', 'after', 'above', 'below', 'between',
-                    'among', 'this', 'that', 'these', 'those', 'are', 'was',
-                    'were', 'been', 'have', 'has', 'had', 'will', 'would',
-                    'could', 'should', 'may', 'might', 'must', 'can'
-                }
-        else:
-            self.stop_words = {
-                'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-                'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through',
-                'during', 'before', 'after', 'above', 'below', 'between',
-                'among', 'this', 'that', 'these', 'those', 'are', 'was',
-                'were', 'been', 'have', 'has', 'had', 'will', 'would',
-                'could', 'should', 'may', 'might', 'must', 'can'
-            }
+                self._stop_words = set(nltk_api.stopwords.words('english')) if nltk_api else self.DEFAULT_STOP_WORDS
+            except Exception:
+                self._stop_words = self.DEFAULT_STOP_WORDS
+        return self._stop_words
         
     def extract_entities_spacy(self, text: str) -> Dict[str, List[str]]:
         """Извлечение именованных сущностей с помощью spaCy"""
+        nlp = nlp_loader.spacy_model()
         if not nlp:
             return {}
             
-        doc = nlp(text)
-        entities = defaultdict(list)
-        
-        for ent in doc.ents:
-            entities[ent.label_].append(ent.text)
-            
-        return dict(entities)
+        return spacy_doc_entities(nlp(text))
         
     def extract_entities_nltk(self, text: str) -> Dict[str, List[str]]:
         """Извлечение именованных сущностей с помощью NLTK"""
-        if not NLTK_AVAILABLE or not word_tokenize or not pos_tag or not ne_chunk:
-            return {}
-            
-        try:
-            tokens = word_tokenize(text)
-            pos_tags = pos_tag(tokens)
-            chunks = ne_chunk(pos_tags)
-            
-            entities = defaultdict(list)
-            
-            for chunk in chunks:
-                if isinstance(chunk, Tree):
-                    entity_text = ' '.join([token for token, pos in chunk.leaves()])
-                    entities[chunk.label()].append(entity_text)
-                    
-            return dict(entities)
-        except Exception as e:
-            logger.error(f"NLTK entity extraction error: {e}")
-            return {}
+        return nltk_entities(text)
             
     def analyze_sentiment(self, text: str) -> Dict[str, float]:
         """Анализ тональности текста"""
-        if not TEXTBLOB_AVAILABLE or not TextBlob:
-            return {'polarity': 0.0, 'subjectivity': 0.0}
-            
-        try:
-            blob = TextBlob(text)
-            return {
-                'polarity': blob.sentiment.polarity,
-                'subjectivity': blob.sentiment.subjectivity
-            }
-        except Exception as e:
-            logger.error(f"Sentiment analysis error: {e}")
-            return {'polarity': 0.0, 'subjectivity': 0.0}
+        return text_sentiment(text)
             
     def extract_keywords_advanced(self, text: str, top_k: int = 20) -> List[Dict[str, Any]]:
         """Продвинутое извлечение ключевых слов"""
-        if not NLTK_AVAILABLE or not word_tokenize or not pos_tag:
+        nltk_api = nlp_loader.nltk()
+        if not nltk_api:
             # Fallback к простому извлечению ключевых слов
             return self._extract_keywords_simple(text, top_k)
             
         try:
             # Токенизация и фильтрация
-            tokens = word_tokenize(text.lower())
-            pos_tags = pos_tag(tokens)
+            tokens = nltk_api.word_tokenize(text.lower())
+            pos_tags = nltk_api.pos_tag(tokens)
             
             # Оставляем только существительные, прилагательные и глаголы
             relevant_pos = ['NN', 'NNS', 'NNP', 'NNPS', 'JJ', 'JJR', 'JJS', 'VB', 'VBD', 'VBG', 'VBN', 'VBP', 'VBZ']
@@ -364,11 +270,13 @@ class NLPProcessor:
             
     def extract_person_info_nlp(self, text: str) -> Dict[str, Any]:
         """Извлечение информации о человеке с помощью NLP"""
-        info = {}
+        return self.person_info_from_entities(self.extract_entities_spacy(text), self.extract_entities_nltk(text))
         
-        # Извлечение сущностей
-        spacy_entities = self.extract_entities_spacy(text)
-        nltk_entities = self.extract_entities_nltk(text)
+    @staticmethod
+    def person_info_from_entities(spacy_entities: Dict[str, List[str]],
+                                  nltk_entities: Dict[str, List[str]]) -> Dict[str, Any]:
+        """Имена, организации и местоположения из сущностей spaCy и NLTK"""
+        info = {}
         
         # Объединение результатов
         all_entities = {}
@@ -406,6 +314,7 @@ class EnhancedWebScraper:
         self.session = None
         self.visited_urls: Set[str] = set()
         self.cache: Dict[str, Dict[str, Any]] = {}
+        self.near_duplicates = NearDuplicateDetector()
         
         # Компоненты для улучшенной функциональности
         self.error_tracker = ErrorTracker()
@@ -429,6 +338,7 @@ class EnhancedWebScraper:
             timeout=timeout,
             headers=self.headers
         )
+        register_http_pool('web_scraper', connector.limit)
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -437,8 +347,8 @@ class EnhancedWebScraper:
             await self.session.close()
             
     def _get_cache_key(self, url: str) -> str:
-        """Генерация ключа кеша"""
-        return hashlib.md5(url.encode()).hexdigest()
+        """Генерация ключа кеша по каноническому URL"""
+        return hashlib.md5(canonicalize_url(url).encode()).hexdigest()
         
     def _is_cache_valid(self, cache_data: Dict[str, Any]) -> bool:
         """Проверка актуальности кеша"""
@@ -484,7 +394,10 @@ class EnhancedWebScraper:
             }
         }
         
-        urls_to_process = urls[:self.config.max_pages]
+        # Варианты одного URL (http/https, utm-метки, m.) загружаются один раз
+        url_dedup = UrlDeduplicator()
+        urls_to_process = url_dedup.unique(urls)[:self.config.max_pages]
+        results['performance_stats']['duplicate_urls_removed'] = url_dedup.get_stats().get('urls', 0)
         semaphore = asyncio.Semaphore(self.config.concurrent_requests)
         tasks = []
         for url in urls_to_process:
@@ -514,6 +427,7 @@ class EnhancedWebScraper:
             datetime.fromisoformat(results['performance_stats']['start_time'])
         ).total_seconds()
         
+        results['performance_stats']['near_duplicates'] = self.near_duplicates.stats.get('scraped_page', 0)
         results['errors'] = self.error_tracker.get_error_summary()
         
         return results
@@ -523,7 +437,9 @@ class EnhancedWebScraper:
         async with semaphore:
             try:
                 cache_key = self._get_cache_key(url)
-                if cache_key in self.cache and self._is_cache_valid(self.cache[cache_key]):
+                cache_hit = cache_key in self.cache and self._is_cache_valid(self.cache[cache_key])
+                record_cache_lookup('scraper_page', cache_hit)
+                if cache_hit:
                     logger.info(f"Cache hit for {url}")
                     return self.cache[cache_key]['data']
                 
@@ -542,8 +458,13 @@ class EnhancedWebScraper:
                             self.rate_limiter.adjust_delay(domain, True)
                             return page_data
                         
-                    except aiohttp.ClientError as e:
-                        self.error_tracker.log_error(url, "client_error", str(e), {'attempt': attempt + 1})
+                    except BodyTooLarge as e:
+                        # Повторная загрузка не уменьшит страницу
+                        self.error_tracker.log_error(url, "body_too_large", str(e))
+                        break
+                        
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        self.error_tracker.log_error(url, "client_error", str(e) or e.__class__.__name__, {'attempt': attempt + 1})
                         
                         if attempt < self.config.retry_attempts - 1:
                             await asyncio.sleep(self.config.retry_delay * (attempt + 1))
@@ -561,77 +482,92 @@ class EnhancedWebScraper:
     
     async def _fetch_and_parse_page(self, url: str) -> Optional[Dict[str, Any]]:
         """Получение и парсинг страницы"""
-        self.visited_urls.add(url)
-        
-        async with self.session.get(url, headers=self.headers) as response:
-            if response.status != 200:
-                self.error_tracker.log_error(url, "http_error", f"Status {response.status}")
-                return None
-            
-            content_type = response.headers.get('content-type', '')
-            if 'text/html' not in content_type:
-                self.error_tracker.log_error(url, "content_type_error", f"Unexpected content type: {content_type}")
-                return None
-            
-            html = await response.text()
-            soup = BeautifulSoup(html, 'html.parser')
+        self.visited_urls.add(canonicalize_url(url))
+        
+        with span('http.scrape_page', 'http', url=url):
+            response = await http_cache.fetch(self.session, url, 'web_scraper', headers=self.headers,
+                                              max_bytes=self.config.max_page_bytes)
+        if response.status != 200:
+            self.error_tracker.log_error(url, "http_error", f"Status {response.status}")
+            return None
+        
+        content_type = response.content_type
+        if 'text/html' not in content_type:
+            self.error_tracker.log_error(url, "content_type_error", f"Unexpected content type: {content_type}")
+            return None
+        
+        html = response.text()
+        
+        # Копия уже разобранной страницы (тот же текст): извлечение и NLP не повторяются
+        page_signature = page_fingerprint(html)
+        duplicate = await self.near_duplicates.check('scraped_page', url, page_signature)
+        if duplicate:
+            duplicate_url, duplicate_data = duplicate
+            return {**duplicate_data, 'url': url, 'duplicate_of': duplicate_url}
+        
+        # HTML разбирается, а текст, ссылки и мета-теги вычисляются один раз для всех извлекателей
+        with span('parse.scrape_page', 'parse', bytes=len(html)):
+            document = ParsedDocument(html, url)
             
             platform_selectors = self._get_platform_selectors(url)
-            
+            page_text = document.text
+        
+        # Сущности и тональность считаются один раз на страницу, пакетами в процессах NLP
+        with span('nlp.scrape_page', 'nlp', chars=min(len(page_text), nlp_pipeline.max_text_chars)):
+            nlp_result = await nlp_pipeline.analyze(page_text)
+        
+        with span('parse.extract_page', 'parse'):
             page_data = {
                 'url': url,
-                'title': self._extract_title(soup),
-                'person_info': self._extract_person_info_enhanced(soup, platform_selectors),
-                'contact_info': self._extract_contact_info_enhanced(soup),
-                'social_links': self._extract_social_links_enhanced(soup),
-                'meta_info': self._extract_meta_info(soup),
-                'content_keywords': self._extract_keywords_enhanced(soup),
-                'nlp_analysis': self._perform_nlp_analysis(soup)
+                'title': self._extract_title(document),
+                'person_info': self._extract_person_info_enhanced(document, platform_selectors, nlp_result),
+                'contact_info': self._extract_contact_info_enhanced(document),
+                'social_links': self._extract_social_links_enhanced(document),
+                'meta_info': self._extract_meta_info(document),
+                'content_keywords': self._extract_keywords_enhanced(document),
+                'nlp_analysis': self._perform_nlp_analysis(document, nlp_result)
             }
-            
-            return page_data
+        
+        await self.near_duplicates.remember('scraped_page', url, page_signature, page_data)
+        return page_data
     
-    def _extract_title(self, soup: BeautifulSoup) -> Optional[str]:
+    def _extract_title(self, document: Union[ParsedDocument, BeautifulSoup]) -> Optional[str]:
         """Извлечение заголовка страницы"""
-        title_tag = soup.find('title')
-        return title_tag.get_text().strip() if title_tag else None
+        return ParsedDocument.wrap(document).title
         
-    def _extract_meta_info(self, soup: BeautifulSoup) -> Dict[str, str]:
+    def _extract_meta_info(self, document: Union[ParsedDocument, BeautifulSoup]) -> Dict[str, str]:
         """Извлечение мета-информации"""
         meta_info = {}
         
-        # Open Graph теги
-        og_tags = soup.find_all('meta', property=lambda x: x and x.startswith('og:'))
-        for tag in og_tags:
-            property_name = tag.get('property', '').replace('og:', '')
-            content = tag.get('content', '')
-            if property_name and content:
-                meta_info[f'og_{property_name}'] = content
-        
-        # Twitter Card теги
-        twitter_tags = soup.find_all('meta', attrs={'name': lambda x: x and x.startswith('twitter:')})
-        for tag in twitter_tags:
-            name = tag.get('name', '').replace('twitter:', '')
-            content = tag.get('content', '')
-            if name and content:
-                meta_info[f'twitter_{name}'] = content
-        
-        # Стандартные мета-теги
-        standard_tags = ['description', 'keywords', 'author']
-        for tag_name in standard_tags:
-            tag = soup.find('meta', attrs={'name': tag_name})
-            if tag and tag.get('content'):
-                meta_info[tag_name] = tag['content']
+        for key, content in ParsedDocument.wrap(document).meta.items():
+            if not content:
+                continue
+            # Open Graph и Twitter Card теги
+            if key.startswith('og:'):
+                meta_info[f'og_{key[3:]}'] = content
+            elif key.startswith('twitter:'):
+                meta_info[f'twitter_{key[8:]}'] = content
+            # Стандартные мета-теги
+            elif key in ('description', 'keywords', 'author'):
+                meta_info[key] = content
         
         return meta_info
     
-    def _extract_person_info_enhanced(self, soup: BeautifulSoup, platform_selectors: Dict[str, List[str]]) -> Dict[str, Any]:
-        """Улучшенное извлечение персональной информации с учетом платформы"""
+    def _extract_person_info_enhanced(self, document: Union[ParsedDocument, BeautifulSoup],
+                                      platform_selectors: Dict[str, List[str]],
+                                      nlp_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Улучшенное извлечение персональной информации с учетом платформы
+
+        nlp_result - готовый результат nlp_pipeline; без него сущности
+        извлекаются синхронно.
+        """
+        document = ParsedDocument.wrap(document)
         person_info = {}
         
         for info_type, selectors in platform_selectors.items():
             for selector in selectors:
-                elements = soup.select(selector)
+                elements = document.select(selector)
                 for elem in elements:
                     text = elem.get_text().strip()
                     if text and len(text) < 200:
@@ -651,8 +587,12 @@ class EnhancedWebScraper:
                 if person_info.get(info_type):
                     break
         
-        page_text = soup.get_text()
-        nlp_info = self.nlp_processor.extract_person_info_nlp(page_text)
+        if nlp_result is not None:
+            nlp_info = self.nlp_processor.person_info_from_entities(
+                nlp_result['entities_spacy'], nlp_result['entities_nltk']
+            )
+        else:
+            nlp_info = self.nlp_processor.extract_person_info_nlp(document.text)
         
         if not person_info.get('name') and nlp_info.get('names'):
             for name in nlp_info['names']:
@@ -668,15 +608,16 @@ class EnhancedWebScraper:
         
         return person_info
         
-    def _extract_contact_info_enhanced(self, soup: BeautifulSoup) -> Dict[str, List[str]]:
+    def _extract_contact_info_enhanced(self, document: Union[ParsedDocument, BeautifulSoup]) -> Dict[str, List[str]]:
         """Улучшенное извлечение контактной информации"""
+        document = ParsedDocument.wrap(document)
         contact_info = {
             'emails': [],
             'phones': [],
             'addresses': []
         }
         
-        page_text = soup.get_text()
+        page_text = document.text
         
         phone_patterns = [
             r'\+?1?[\s.-]?\(?[0-9]{3}\)?[\s.-]?[0-9]{3}[\s.-]?[0-9]{4}',
@@ -689,7 +630,7 @@ class EnhancedWebScraper:
             emails = EmailValidator.extract_emails_from_text(page_text)
             contact_info['emails'] = list(set(emails))
         except Exception as e:
-            self.error_tracker.log_error(soup.find('title', default='unknown').get_text() if soup.find('title') else 'unknown','email_extraction_error', str(e))
+            self.error_tracker.log_error(document.url or document.title or 'unknown', 'email_extraction_error', str(e))
         
         all_phones = []
         for pattern in phone_patterns:
@@ -716,7 +657,7 @@ class EnhancedWebScraper:
         
         return contact_info
         
-    def _extract_social_links_enhanced(self, soup: BeautifulSoup) -> List[Dict[str, str]]:
+    def _extract_social_links_enhanced(self, document: Union[ParsedDocument, BeautifulSoup]) -> List[Dict[str, str]]:
         """Улучшенное извлечение ссылок на социальные сети"""
         social_links = []
         
@@ -741,55 +682,51 @@ class EnhancedWebScraper:
             'soundcloud.com': 'SoundCloud'
         }
         
-        link_sources = [
-            soup.find_all('a', href=True),
-            soup.find_all('link', href=True),
-            soup.find_all('[data-url]'),
-        ]
-        
         found_urls = set()
         
-        for source in link_sources:
-            for link in source:
-                href = link.get('href') or link.get('data-url')
-                if not href:
-                    continue
-                    
-                href = href.lower()
-                
-                for domain, platform in social_domains.items():
-                    if domain in href and href not in found_urls:
-                        social_links.append({
-                            'platform': platform,
-                            'url': href,
-                            'text': link.get_text().strip() if hasattr(link, 'get_text') else '',
-                            'context': self._get_link_context(link)
-                        })
-                        found_urls.add(href)
-                        break
+        for link in ParsedDocument.wrap(document).links:
+            href = link['href'].lower()
+            
+            for domain, platform in social_domains.items():
+                if domain in href and href not in found_urls:
+                    social_links.append({
+                        'platform': platform,
+                        'url': href,
+                        'text': link.get_text().strip() if hasattr(link, 'get_text') else '',
+                        'context': self._get_link_context(link)
+                    })
+                    found_urls.add(href)
+                    break
         
         return social_links
         
-    def _extract_keywords_enhanced(self, soup: BeautifulSoup) -> List[Dict[str, Any]]:
-        """Улучшенное извлечение ключевых слов с помощью NLP"""
-        for element in soup(['script', 'style', 'nav', 'header', 'footer']):
-            element.decompose()
-        
-        text = soup.get_text()
+    def _extract_keywords_enhanced(self, document: Union[ParsedDocument, BeautifulSoup]) -> List[Dict[str, Any]]:
+        """Улучшенное извлечение ключевых слов с помощью NLP (без навигации, шапки и подвала)"""
+        return self.nlp_processor.extract_keywords_advanced(ParsedDocument.wrap(document).content_text)
         
-        return self.nlp_processor.extract_keywords_advanced(text)
-        
-    def _perform_nlp_analysis(self, soup: BeautifulSoup) -> Dict[str, Any]:
-        """Выполнение NLP анализа страницы"""
-        text = soup.get_text()
-        
-        if len(text) > 10000:
-            text = text[:10000]
+    def _perform_nlp_analysis(self, document: Union[ParsedDocument, BeautifulSoup],
+                              nlp_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Выполнение NLP анализа страницы (nlp_result - готовый результат nlp_pipeline)
+
+        Длина и язык считаются по тому же тексту страницы, что и сущности в nlp_pipeline.
+        """
+        text = ParsedDocument.wrap(document).text
+        
+        if len(text) > nlp_pipeline.max_text_chars:
+            text = text[:nlp_pipeline.max_text_chars]
+        
+        if nlp_result is None:
+            nlp_result = {
+                'sentiment': self.nlp_processor.analyze_sentiment(text),
+                'entities_spacy': self.nlp_processor.extract_entities_spacy(text),
+                'entities_nltk': self.nlp_processor.extract_entities_nltk(text)
+            }
         
         analysis = {
-            'sentiment': self.nlp_processor.analyze_sentiment(text),
-            'entities_spacy': self.nlp_processor.extract_entities_spacy(text),
-            'entities_nltk': self.nlp_processor.extract_entities_nltk(text),
+            'sentiment': nlp_result['sentiment'],
+            'entities_spacy': nlp_result['entities_spacy'],
+            'entities_nltk': nlp_result['entities_nltk'],
             'text_length': len(text),
             'language_detected': self._detect_language(text)
         }
@@ -837,15 +774,8 @@ class EnhancedWebScraper:
         return ''
         
     def _detect_language(self, text: str) -> str:
-        """Базовое определение языка"""
-        if not TEXTBLOB_AVAILABLE or not TextBlob:
-            return 'unknown'
-            
-        try:
-            blob = TextBlob(text)
-            return blob.detect_language()
-        except:
-            return 'unknown'
+        """Определение языка без обращения к сети (код ISO 639-1 или 'unknown')"""
+        return language_detector.detect(text)
             
     def _merge_page_data_enhanced(self, results: Dict[str, Any], page_data: Dict[str, Any]):
         """Улучшенное объединение данных страницы"""
@@ -869,7 +799,8 @@ class EnhancedWebScraper:
         results['content_analysis'][url] = {
             'title': page_data.get('title'),
             'keywords': page_data.get('content_keywords', []),
-            'meta_info': page_data.get('meta_info', {})
+            'meta_info': page_data.get('meta_info', {}),
+            'language': page_data.get('nlp_analysis', {}).get('language_detected', 'unknown')
         }
         
         if 'nlp_analysis' not in results:
@@ -882,6 +813,7 @@ class EnhancedWebScraper:
         return {
             'visited_urls_count': len(self.visited_urls),
             'cache_size': len(self.cache),
+            'http_cache': http_cache.get_stats(),
             'error_summary': self.error_tracker.get_error_summary(),
             'rate_limiter_stats': {
                 'domains': len(self.rate_limiter.delays),
@@ -899,40 +831,6 @@ class EnhancedWebScraperCompat(EnhancedWebScraper):
     async def scrape_websites(self, urls: List[str]) -> Dict[str, Any]:
         """Обратная совместимость для старого API"""
         return await self.scrape_websites_enhanced(urls)
-        
-    def _extract_title(self, soup: BeautifulSoup) -> Optional[str]:
-        """Извлечение заголовка страницы"""
-        title_tag = soup.find('title')
-        return title_tag.get_text().strip() if title_tag else None
-        
-    def _extract_meta_info(self, soup: BeautifulSoup) -> Dict[str, str]:
-        """Извлечение мета-информации"""
-        meta_info = {}
-        
-        # Open Graph теги
-        og_tags = soup.find_all('meta', property=lambda x: x and x.startswith('og:'))
-        for tag in og_tags:
-            property_name = tag.get('property', '').replace('og:', '')
-            content = tag.get('content', '')
-            if property_name and content:
-                meta_info[f'og_{property_name}'] = content
-        
-        # Twitter Card теги
-        twitter_tags = soup.find_all('meta', attrs={'name': lambda x: x and x.startswith('twitter:')})
-        for tag in twitter_tags:
-            name = tag.get('name', '').replace('twitter:', '')
-            content = tag.get('content', '')
-            if name and content:
-                meta_info[f'twitter_{name}'] = content
-        
-        # Стандартные мета-теги
-        standard_tags = ['description', 'keywords', 'author']
-        for tag_name in standard_tags:
-            tag = soup.find('meta', attrs={'name': tag_name})
-            if tag and tag.get('content'):
-                meta_info[tag_name] = tag['content']
-        
-        return meta_info
 
 # Заменяем WebScraper на совместимую версию
 WebScraper = EnhancedWebScraperCompat
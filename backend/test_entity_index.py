@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Тесты инвертированного индекса сущностей
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+# Добавляем путь к модулям
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from database.models import Base, EmailProfile, ProfileEntity
+from modules.entity_index import entity_index, profile_entities, normalize_phone, normalize_url
+from modules.fulltext_index import fulltext_index, FullTextBackend
+
+JANE_DATA = {
+    'person_info': {'name': 'Jane Doe'},
+    'social_profiles': [
+        {'platform': 'LinkedIn', 'url': 'https://www.linkedin.com/in/Jane-Doe/?trk=public'},
+        {'platform': 'GitHub', 'url': 'https://github.com/janedoe'}
+    ],
+    'phone_numbers': ['+7 (916) 123-45-67']
+}
+
+
+class TestNormalization(unittest.TestCase):
+    """Тесты нормализации ключей"""
+
+    def test_profile_entities(self):
+        """Тест ключей данных профиля"""
+        self.assertEqual(profile_entities(JANE_DATA), {
+            ('url', 'linkedin.com/in/jane-doe'),
+            ('url', 'github.com/janedoe'),
+            ('username', 'linkedin:jane-doe'),
+            ('username', 'github:janedoe'),
+            ('phone', '+79161234567'),
+            ('name', 'jane doe')
+        })
+        self.assertEqual(profile_entities(None), set())
+
+    def test_normalize_values(self):
+        """Тест нормализации телефонов и URL"""
+        self.assertEqual(normalize_phone('8 916 123 45 67', 'RU'), '+79161234567')
+        self.assertIsNone(normalize_phone('123'))
+        self.assertEqual(normalize_url('http://m.facebook.com/JaneDoe/'), 'facebook.com/janedoe')
+        self.assertIsNone(normalize_url('mailto:jane@example.com'))
+
+
+class TestEntityIndex(unittest.TestCase):
+    """Тесты обновления индекса при записи профилей"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.tmpdir.name}/entities.sqlite", poolclass=NullPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        # Индекс без хранилища: тест не создает файлов индекса
+        self.backend, fulltext_index._backend = fulltext_index._backend, FullTextBackend()
+
+        self.db.add(EmailProfile(email='jane@example.com', data=JANE_DATA))
+        self.db.add(EmailProfile(email='j.doe@example.org', data={
+            'social_profiles': [{'platform': 'LinkedIn', 'url': 'https://linkedin.com/in/jane-doe'}],
+            'phone_numbers': ['89161234567']
+        }))
+        self.db.commit()
+
+    def tearDown(self):
+        fulltext_index.process_pending()
+        fulltext_index._backend = self.backend
+        self.db.close()
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def lookup(self, kind: str, value: str) -> list:
+        return entity_index.lookup(self.db, kind, value)[1]
+
+    def test_lookup_after_insert(self):
+        """Тест поиска профилей по общим ключам"""
+        self.assertEqual(self.lookup('url', 'https://uk.linkedin.com/in/Jane-Doe'), [])
+        self.assertEqual(self.lookup('url', 'linkedin.com/in/JANE-DOE'),
+                         ['j.doe@example.org', 'jane@example.com'])
+        self.assertEqual(self.lookup('phone', '+7 916 123-45-67'),
+                         ['j.doe@example.org', 'jane@example.com'])
+        self.assertEqual(self.lookup('username', 'github:@JaneDoe'), ['jane@example.com'])
+
+        linked = entity_index.linked_profiles(self.db, 'jane@example.com')
+        self.assertEqual([item['email'] for item in linked], ['j.doe@example.org'])
+        self.assertEqual(len(linked[0]['matches']), 3)
+
+    def test_lookup_after_update(self):
+        """Тест замены ключей при изменении данных профиля"""
+        profile = self.db.query(EmailProfile).filter(EmailProfile.email == 'jane@example.com').one()
+        profile.data = {**JANE_DATA, 'phone_numbers': ['+44 20 7946 0958']}
+        self.db.commit()
+
+        self.assertEqual(self.lookup('phone', '+79161234567'), ['j.doe@example.org'])
+        self.assertEqual(self.lookup('phone', '+442079460958'), ['jane@example.com'])
+        self.assertEqual(self.lookup('name', 'Jane  Doe.'), ['jane@example.com'])
+
+        # Изменение без затрагивания данных не трогает индекс
+        profile.source_count = 5
+        self.db.commit()
+        self.assertEqual(self.db.query(ProfileEntity).filter(
+            ProfileEntity.profile_email == 'jane@example.com').count(), 6)
+
+    def test_lookup_after_delete(self):
+        """Тест удаления ключей вместе с профилем"""
+        profile = self.db.query(EmailProfile).filter(EmailProfile.email == 'jane@example.com').one()
+        self.db.delete(profile)
+        self.db.commit()
+
+        self.assertEqual(self.lookup('url', 'https://linkedin.com/in/jane-doe'), ['j.doe@example.org'])
+        self.assertEqual(self.lookup('username', 'github:janedoe'), [])
+        self.assertEqual(entity_index.linked_profiles(self.db, 'j.doe@example.org'), [])
+        self.assertEqual(entity_index.get_stats(self.db)['profiles'], 1)
+
+    def test_rebuild(self):
+        """Тест перестроения индекса по существующим профилям"""
+        self.db.query(ProfileEntity).delete()
+        self.db.commit()
+
+        self.assertEqual(entity_index.rebuild(self.db, batch_size=1), {'profiles': 2, 'entries': 9})
+        self.assertEqual(self.lookup('phone', '+79161234567'),
+                         ['j.doe@example.org', 'jane@example.com'])
+
+
+if __name__ == '__main__':
+    unittest.main()
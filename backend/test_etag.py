@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Тесты условных запросов (ETag / If-None-Match) к профилю
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+
+# Добавляем путь к модулям
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, EmailProfile
+from modules.fulltext_index import fulltext_index, FullTextBackend
+from app.etag import make_etag
+from app.refresh import update_profile_data
+from app.main import get_profile, get_digital_twin_aggregate
+
+
+class TestProfileETag(unittest.TestCase):
+    """Тесты ETag эндпоинтов профиля"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.tmpdir.name}/profiles.sqlite")
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        # Индекс без хранилища: тест не создает файлов индекса
+        self.backend, fulltext_index._backend = fulltext_index._backend, FullTextBackend()
+        update_profile_data(self.db, 'jane@uni.edu', {'sources': ['google'], 'person_info': {'name': 'Jane'}}, 'general')
+
+    def tearDown(self):
+        fulltext_index.process_pending()
+        fulltext_index._backend = self.backend
+        self.db.close()
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def get(self, if_none_match=None):
+        return asyncio.run(get_profile('jane@uni.edu', fields=None, limit=None,
+                                       if_none_match=if_none_match, db=self.db))
+
+    def test_not_modified_on_matching_etag(self):
+        """Тест ответа 304 на совпадающий If-None-Match"""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['etag']
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['etag'], etag)
+        self.assertEqual(self.get(f'"other", W/{etag}').status_code, 304)
+
+    def test_modified_after_update(self):
+        """Тест ответа 200 после изменения профиля"""
+        etag = self.get().headers['etag']
+        update_profile_data(self.db, 'jane@uni.edu', {'person_info': {'name': 'Jane Doe'}}, 'general')
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['etag'], etag)
+        self.assertEqual(json.loads(response.body)['data']['data']['person_info'], {'name': 'Jane Doe'})
+
+    def test_unchanged_content_keeps_etag(self):
+        """Тест обновления без изменения содержимого"""
+        etag = self.get().headers['etag']
+        # Повторный сбор с теми же данными меняет только служебные ключи
+        update_profile_data(self.db, 'jane@uni.edu', {'person_info': {'name': 'Jane'}}, 'general')
+        self.assertEqual(self.get(etag).status_code, 304)
+
+    def test_aggregate_etag_includes_data_age(self):
+        """Тест ETag агрегированного двойника с возрастом данных"""
+        update_profile_data(self.db, 'jane@uni.edu', {'person_info': {'name': 'Jane Doe'}}, 'general')
+        response = asyncio.run(get_digital_twin_aggregate('jane@uni.edu', if_none_match=None, db=self.db))
+        profile = self.db.query(EmailProfile).one()
+        self.assertEqual(response.headers['etag'], make_etag('aggregate', (profile.id, profile.content_version), 0))
+        self.assertEqual(json.loads(response.body)['data']['timeline']['data_age_days'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
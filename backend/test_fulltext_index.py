@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Тесты полнотекстового индекса
+"""
+
+import os
+import sys
+import unittest
+
+# Добавляем путь к модулям
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.fulltext_index import ElasticsearchBackend, FullTextIndex
+
+PROFILE_DATA = {
+    'search_results': [
+        {'url': 'https://uni.edu/jane', 'title': 'Jane Doe', 'snippet': 'Professor of physics'},
+        {'url': 'https://blog.example.org/jane', 'title': 'Jane Doe blog', 'snippet': 'Notes on optics'}
+    ]
+}
+
+
+class FakeIndices:
+    def __init__(self):
+        self.created = []
+
+    def exists(self, index):
+        return index in self.created
+
+    def create(self, index, mappings):
+        self.created.append(index)
+
+
+class FakeElasticsearch:
+    """Клиент Elasticsearch в памяти, записывающий вызовы bulk и delete_by_query"""
+
+    def __init__(self):
+        self.indices = FakeIndices()
+        self.documents = {}
+        self.calls = []
+
+    def bulk(self, operations, **kwargs):
+        self.calls.append(('bulk', kwargs))
+        for action, doc in zip(operations[::2], operations[1::2]):
+            self.documents[action['index']['_id']] = doc
+
+    def delete_by_query(self, index, query, **kwargs):
+        self.calls.append(('delete_by_query', kwargs))
+        email = query['bool']['filter']['term']['profile_email']
+        keep = set(query['bool']['must_not']['ids']['values'])
+        for doc_id, doc in list(self.documents.items()):
+            if doc['profile_email'] == email and doc_id not in keep:
+                del self.documents[doc_id]
+
+    def search(self, index, query, size, source=None, **kwargs):
+        email = query['term']['profile_email']
+        hits = [{'_source': {key: doc[key] for key in source}}
+                for doc in self.documents.values() if doc['profile_email'] == email]
+        return {'hits': {'hits': hits[:size]}}
+
+
+class TestElasticsearchBackend(unittest.TestCase):
+    """Тесты ElasticsearchBackend с клиентом в памяти"""
+
+    def setUp(self):
+        self.client = FakeElasticsearch()
+        self.index = FullTextIndex(ElasticsearchBackend(client=self.client, index='profiles'))
+
+    def test_index_without_forced_refresh(self):
+        """Тест индексирования без refresh=True"""
+        self.assertTrue(self.index.index_profile('jane@uni.edu', PROFILE_DATA))
+        self.assertEqual([name for name, _ in self.client.calls], ['bulk', 'delete_by_query'])
+        for _, kwargs in self.client.calls:
+            self.assertNotIn('refresh', kwargs)
+        self.assertEqual(len(self.client.documents), 2)
+        self.assertEqual(len({doc['digest'] for doc in self.client.documents.values()}), 1)
+
+    def test_unchanged_profile_not_reindexed(self):
+        """Тест повторного индексирования тех же данных"""
+        self.index.index_profile('jane@uni.edu', PROFILE_DATA)
+        self.client.calls.clear()
+        self.assertFalse(self.index.index_profile('jane@uni.edu', dict(PROFILE_DATA)))
+        self.assertEqual(self.client.calls, [])
+
+    def test_changed_profile_replaces_documents(self):
+        """Тест замены документов профиля"""
+        self.index.index_profile('jane@uni.edu', PROFILE_DATA)
+        self.index.index_profile('jane@uni.edu', {'search_results': PROFILE_DATA['search_results'][:1]})
+        self.assertEqual(list(self.client.documents), ['jane@uni.edu|search_result|https://uni.edu/jane'])
+
+    def test_queued_delete(self):
+        """Тест удаления документов через очередь индексирования"""
+        self.index.index_profile('jane@uni.edu', PROFILE_DATA)
+        self.index.index_profile('john@uni.edu', {'search_results': [{'url': 'https://uni.edu/john', 'title': 'John'}]})
+        self.index.enqueue('jane@uni.edu', None)
+        self.index.process_pending()
+        self.assertEqual(self.index.pending_count(), 0)
+        self.assertEqual({doc['profile_email'] for doc in self.client.documents.values()}, {'john@uni.edu'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Тесты офлайн-определения языка
+"""
+
+import os
+import sys
+import unittest
+
+# Добавляем путь к модулям
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.language_detector import LanguageDetector, UNKNOWN
+
+FIXTURES = {
+    'ru': [
+        "Кафедра информатики предлагает программы бакалавриата и магистратуры по направлениям прикладной математики.",
+        "Лаборатория занимается исследованиями в области машинного обучения и обработки естественного языка.",
+        "Профессор Иванов читает лекции по теории вероятностей и руководит аспирантами на факультете.",
+        "Наша команда разрабатывает программное обеспечение для анализа больших данных в медицине.",
+        "Статья опубликована в журнале и посвящена методам оптимизации нейронных сетей.",
+    ],
+    'uk': [
+        "Кафедра інформатики пропонує програми бакалаврату та магістратури з прикладної математики.",
+        "Лабораторія займається дослідженнями в галузі машинного навчання та обробки природної мови.",
+        "Професор Іваненко читає лекції з теорії ймовірностей і керує аспірантами на факультеті.",
+        "Наша команда розробляє програмне забезпечення для аналізу великих даних у медицині.",
+    ],
+    'bg': [
+        "Катедрата по информатика предлага програми за бакалавър и магистър по приложна математика.",
+        "Лабораторията се занимава с изследвания в областта на машинното обучение и обработката на естествен език.",
+        "Професор Иванов чете лекции по теория на вероятностите и ръководи докторанти във факултета.",
+        "Нашият екип разработва софтуер за анализ на големи данни в медицината.",
+    ],
+    'en': [
+        "The department of computer science offers undergraduate and graduate programs in applied mathematics.",
+        "Our laboratory works on machine learning and natural language processing for medical data.",
+        "John Smith is a professor of computer science at Stanford, where he leads a group working on machine learning.",
+    ],
+    'de': [
+        "Der Lehrstuhl für Informatik bietet Bachelor- und Masterstudiengänge in angewandter Mathematik an.",
+        "Unser Labor beschäftigt sich mit maschinellem Lernen und der Verarbeitung natürlicher Sprache.",
+        "Kontaktieren Sie mich per E-Mail, wenn Sie an einer Zusammenarbeit interessiert sind.",
+    ],
+}
+
+
+class TestLanguageDetector(unittest.TestCase):
+    """Тесты LanguageDetector"""
+
+    def setUp(self):
+        self.detector = LanguageDetector(max_chars=2000, min_confidence=0.1)
+
+    def test_fixtures(self):
+        """Тест определения языка фрагментов страниц"""
+        for language, texts in FIXTURES.items():
+            for text in texts:
+                with self.subTest(language=language, text=text[:40]):
+                    self.assertEqual(self.detector.detect(text), language)
+
+    def test_letter_markers(self):
+        """Тест букв, которые есть только в одном из кириллических алфавитов"""
+        for text, language in (
+            ("Мы работаем вместе с этой группой уже несколько лет и её проектами.", 'ru'),
+            ("Ми працюємо разом з цією групою вже кілька років і її проєктами.", 'uk'),
+            ("Ние работим заедно с тази група вече няколко години и във всички проекти.", 'bg'),
+        ):
+            with self.subTest(language=language):
+                self.assertEqual(self.detector.detect(text), language)
+
+    def test_script_languages(self):
+        """Тест языков, определяемых по письменности"""
+        self.assertEqual(self.detector.detect("张伟是北京大学计算机科学教授，领导一个研究小组。"), 'zh')
+        self.assertEqual(self.detector.detect("山田太郎は東京大学の教授で、機械学習の研究をしています。"), 'ja')
+        self.assertEqual(self.detector.detect("Ο Γιάννης είναι καθηγητής πληροφορικής στο Πανεπιστήμιο Αθηνών."), 'el')
+
+    def test_unknown(self):
+        """Тест текстов без достаточных признаков языка"""
+        for text in ('', '12345', 'GitHub', 'Home About Contact'):
+            with self.subTest(text=text):
+                self.assertEqual(self.detector.detect(text), UNKNOWN)
+
+    def test_detect_details(self):
+        """Тест уверенности и письменности результата"""
+        details = self.detector.detect_details(FIXTURES['ru'][1])
+        self.assertEqual(details['script'], 'cyrillic')
+        self.assertGreater(details['confidence'], 0.1)
+        self.assertLessEqual(details['confidence'], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
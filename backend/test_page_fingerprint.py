@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Тесты поиска дубликатов страниц
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+
+# Добавляем путь к модулям
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.page_fingerprint import NearDuplicateDetector, page_fingerprint, hamming_distance
+
+NAVIGATION = ' '.join(f'menu item {i} department faculty news events' for i in range(40))
+
+
+def staff_page(name: str, email: str, heading: str = '<h1>') -> str:
+    return (f'<html><body><nav>{NAVIGATION}</nav>{heading}{name}</h1>'
+            f'<p>Contact {email}</p><footer>{NAVIGATION}</footer></body></html>')
+
+
+class TestNearDuplicateDetector(unittest.TestCase):
+    """Тесты NearDuplicateDetector"""
+
+    def setUp(self):
+        self.detector = NearDuplicateDetector(persistent=False)
+        self.detector.enabled = True
+        self.jane = page_fingerprint(staff_page('Jane Doe', 'jane@uni.edu'))
+        asyncio.run(self.detector.remember('scraped_page', 'https://uni.edu/jane', self.jane,
+                                           {'emails': ['jane@uni.edu']}))
+
+    def test_template_page_not_reused(self):
+        """Тест страницы другого человека на том же шаблоне"""
+        john = page_fingerprint(staff_page('John Roe', 'john@uni.edu'))
+        self.assertLessEqual(hamming_distance(self.jane[0], john[0]), self.detector.run_index['scraped_page'].max_distance)
+        self.assertIsNone(asyncio.run(self.detector.check('scraped_page', 'https://uni.edu/john', john)))
+
+    def test_copy_reused(self):
+        """Тест копии страницы с другой разметкой"""
+        copy = page_fingerprint(staff_page('Jane Doe', 'jane@uni.edu', '<h1 class="name">'))
+        duplicate = asyncio.run(self.detector.check('scraped_page', 'https://mirror.org/jane', copy))
+        self.assertEqual(duplicate, ('https://uni.edu/jane', {'emails': ['jane@uni.edu']}))
+        self.assertEqual(self.detector.stats, {'scraped_page': 1})
+
+    def test_short_text_ignored(self):
+        """Тест короткого текста"""
+        self.assertIsNone(page_fingerprint('<p>Jane Doe</p>'))
+
+
+if __name__ == '__main__':
+    unittest.main()
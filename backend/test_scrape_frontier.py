@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Тесты приоритетной очереди загрузки страниц
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+
+# Добавляем путь к модулям
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.scrape_frontier import ScrapeFrontier, FrontierBudget, HostYieldTracker
+
+
+def make_frontier(urls, budget=None, concurrency=1, tracker=None) -> ScrapeFrontier:
+    frontier = ScrapeFrontier(
+        budget=budget or FrontierBudget(max_pages=100, max_bytes=10 ** 9, max_seconds=10),
+        concurrency=concurrency,
+        per_host_concurrency=1,
+        host_delay=0,
+        yield_tracker=tracker or HostYieldTracker()
+    )
+    for url, relevance in urls:
+        frontier.add(url, relevance, item=url)
+    return frontier
+
+
+class TestFrontierOrdering(unittest.TestCase):
+    """Тесты порядка загрузки"""
+
+    def run_order(self, frontier: ScrapeFrontier) -> list:
+        order = []
+
+        async def fetch(entry):
+            order.append(entry.url)
+            # Без учета в статистике хостов: порядок зависит только от релевантности и числа страниц хоста
+            return entry.item, 100, None
+
+        results = asyncio.run(frontier.run(fetch))
+        self.assertEqual(len(results), len(order))
+        return order
+
+    def test_relevance_and_host_diversity(self):
+        """Тест порядка по релевантности с уступкой повторных страниц хоста"""
+        frontier = make_frontier([
+            ('https://c.org/team', 0.1),
+            ('https://a.org/people/1', 0.9),
+            ('https://a.org/people/2', 0.8),
+            ('https://b.org/profile', 0.6)
+        ])
+        self.assertEqual(self.run_order(frontier), [
+            'https://a.org/people/1',
+            'https://b.org/profile',
+            'https://a.org/people/2',
+            'https://c.org/team'
+        ])
+
+    def test_equal_priority_keeps_insertion_order(self):
+        """Тест сохранения порядка добавления при равном приоритете"""
+        urls = [(f'https://host{i}.org/', 0.5) for i in range(4)]
+        self.assertEqual(self.run_order(make_frontier(urls)), [url for url, _ in urls])
+
+    def test_unproductive_host_goes_last(self):
+        """Тест понижения хоста, с которого не извлекаются данные"""
+        tracker = HostYieldTracker()
+        for _ in range(5):
+            tracker.record('directory.org', False)
+        frontier = make_frontier([
+            ('https://directory.org/jane', 0.9),
+            ('https://example.org/jane', 0.2)
+        ], tracker=tracker)
+        self.assertEqual(self.run_order(frontier), ['https://example.org/jane', 'https://directory.org/jane'])
+
+    def test_per_host_concurrency(self):
+        """Тест ограничения параллельных запросов к одному хосту"""
+        frontier = make_frontier([(f'https://a.org/{i}', 0.5) for i in range(3)]
+                                 + [('https://b.org/1', 0.1)], concurrency=3)
+        active = {}
+        peak = {}
+
+        async def fetch(entry):
+            active[entry.host] = active.get(entry.host, 0) + 1
+            peak[entry.host] = max(peak.get(entry.host, 0), active[entry.host])
+            await asyncio.sleep(0.01)
+            active[entry.host] -= 1
+            return entry.item, 10, True
+
+        results = asyncio.run(frontier.run(fetch))
+        self.assertEqual(len(results), 4)
+        self.assertEqual(peak, {'a.org': 1, 'b.org': 1})
+        self.assertEqual(frontier.get_stats()['hosts'], {'a.org': 3, 'b.org': 1})
+
+
+class TestFrontierBudget(unittest.TestCase):
+    """Тесты бюджета загрузки"""
+
+    urls = [(f'https://host{i}.org/', 1.0 - i / 10) for i in range(5)]
+
+    def test_page_budget(self):
+        """Тест остановки по числу страниц"""
+        frontier = make_frontier(self.urls, budget=FrontierBudget(max_pages=2, max_bytes=10 ** 9, max_seconds=10),
+                                 concurrency=3)
+
+        async def fetch(entry):
+            return entry.item, 100, True
+
+        results = asyncio.run(frontier.run(fetch))
+        self.assertEqual(sorted(results), [0, 1])
+        self.assertEqual(frontier.stats['stop_reason'], 'pages')
+        self.assertEqual(frontier.stats['skipped'], 3)
+
+    def test_failed_fetches_count_against_pages(self):
+        """Тест учета неудачных загрузок в бюджете страниц"""
+        frontier = make_frontier(self.urls, budget=FrontierBudget(max_pages=3, max_bytes=10 ** 9, max_seconds=10))
+
+        async def fetch(entry):
+            if entry.order < 2:
+                raise ConnectionError('refused')
+            return entry.item, 100, True
+
+        results = asyncio.run(frontier.run(fetch))
+        self.assertEqual(list(results), [2])
+        self.assertEqual((frontier.stats['failed'], frontier.stats['fetched']), (2, 1))
+        self.assertEqual(frontier.stats['stop_reason'], 'pages')
+
+    def test_byte_budget(self):
+        """Тест остановки по объему загруженных данных"""
+        frontier = make_frontier(self.urls, budget=FrontierBudget(max_pages=100, max_bytes=250, max_seconds=10))
+
+        async def fetch(entry):
+            return entry.item, 100, True
+
+        results = asyncio.run(frontier.run(fetch))
+        self.assertEqual(len(results), 3)
+        self.assertEqual(frontier.stats['bytes'], 300)
+        self.assertEqual(frontier.stats['stop_reason'], 'bytes')
+        self.assertEqual(frontier.stats['skipped'], 2)
+
+    def test_time_budget(self):
+        """Тест отмены незавершенных загрузок по бюджету времени"""
+        frontier = make_frontier(self.urls, budget=FrontierBudget(max_pages=100, max_bytes=10 ** 9, max_seconds=0.2),
+                                 concurrency=2)
+
+        async def fetch(entry):
+            await asyncio.sleep(0 if entry.order == 0 else 5)
+            return entry.item, 100, True
+
+        results = asyncio.run(frontier.run(fetch))
+        self.assertEqual(list(results), [0])
+        self.assertEqual(frontier.stats['stop_reason'], 'time')
+        self.assertEqual(frontier.stats['skipped'], 4)
+        self.assertLess(frontier.stats['duration'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Тесты объединения запросов (single-flight) с блокировкой в базе
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+
+# Добавляем путь к модулям
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from database.models import Base, CollectionLock
+from app.single_flight import SingleFlight
+
+
+class TestSingleFlightDbLock(unittest.TestCase):
+    """Тесты блокировки между воркерами"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.tmpdir.name}/locks.sqlite", poolclass=NullPool)
+        Base.metadata.create_all(bind=self.engine, tables=[CollectionLock.__table__])
+        self.session_factory = sessionmaker(bind=self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def worker(self, lock_ttl: float = 5) -> SingleFlight:
+        return SingleFlight(use_db_lock=True, lock_ttl=lock_ttl, poll_interval=0.05,
+                            session_factory=self.session_factory)
+
+    def test_second_acquirer_blocked(self):
+        """Тест второго воркера, пока блокировка первого действует"""
+        first, second = self.worker(), self.worker()
+        self.assertTrue(first._try_acquire('search:a@example.com'))
+        self.assertFalse(second._try_acquire('search:a@example.com'))
+        self.assertTrue(second._try_acquire('search:b@example.com'))
+
+        # Чужая блокировка не снимается при освобождении
+        second._release_db_lock('search:a@example.com')
+        self.assertTrue(first._is_locked('search:a@example.com'))
+
+        first._release_db_lock('search:a@example.com')
+        self.assertTrue(second._try_acquire('search:a@example.com'))
+
+    def test_follower_waits_for_leader(self):
+        """Тест ожидания второго воркера и получения результата лидера"""
+        first, second = self.worker(), self.worker()
+        saved = {}
+        calls = []
+
+        async def collect():
+            calls.append('collect')
+            await asyncio.sleep(0.3)
+            saved['result'] = 'profile'
+            return 'profile'
+
+        async def scenario():
+            leader = asyncio.create_task(first.do('search:a@example.com', collect))
+            await asyncio.sleep(0.1)
+            follower = await second.do('search:a@example.com', collect, recheck=lambda: saved.get('result'))
+            return await leader, follower
+
+        leader, follower = asyncio.run(scenario())
+        self.assertEqual(leader, ('profile', False))
+        self.assertEqual(follower, ('profile', True))
+        self.assertEqual(calls, ['collect'])
+
+    def test_lock_renewed_while_running(self):
+        """Тест продления блокировки во время долгого сбора"""
+        first, second = self.worker(lock_ttl=0.6), self.worker(lock_ttl=0.6)
+        checks = []
+
+        async def collect():
+            await asyncio.sleep(1.0)
+            checks.append(second._try_acquire('search:a@example.com'))
+            return 'profile'
+
+        asyncio.run(first.do('search:a@example.com', collect))
+        self.assertEqual(checks, [False])
+        self.assertFalse(first._is_locked('search:a@example.com'))
+
+    def test_lock_table_error_fails(self):
+        """Тест ошибки таблицы блокировок: сбор не выполняется"""
+        Base.metadata.drop_all(bind=self.engine, tables=[CollectionLock.__table__])
+        calls = []
+
+        async def collect():
+            calls.append('collect')
+            return 'profile'
+
+        with self.assertRaises(Exception):
+            asyncio.run(self.worker().do('search:a@example.com', collect))
+        self.assertEqual(calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
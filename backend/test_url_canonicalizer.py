@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Тесты канонизации URL
+"""
+
+import os
+import sys
+import unittest
+
+# Добавляем путь к модулям
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.url_canonicalizer import canonicalize_url, cache_key, unwrap_redirect, UrlDeduplicator
+
+# (исходный URL, канонический ключ)
+CANONICAL_CASES = [
+    # Редиректы поисковых систем
+    ('https://www.google.com/url?q=https://example.org/people/jane&sa=U&ved=2ahUKE',
+     'https://example.org/people/jane'),
+    ('/url?q=https%3A%2F%2Fexample.org%2Fpeople%2Fjane%3Futm_source%3Dgoogle&sa=U',
+     'https://example.org/people/jane'),
+    ('https://duckduckgo.com/l/?uddg=https%3A%2F%2Fexample.org%2Fpeople%2Fjane&rut=abc',
+     'https://example.org/people/jane'),
+    ('//duckduckgo.com/l/?uddg=https%3A%2F%2Fwww.example.org%2Fpeople%2Fjane%2F',
+     'https://example.org/people/jane'),
+    ('https://www.bing.com/ck/a?!&&p=abc&u=a1aHR0cHM6Ly93d3cuZXhhbXBsZS5vcmcvcGVvcGxlL2phbmUvP3V0bV9zb3VyY2U9YmluZw&ntb=1',
+     'https://example.org/people/jane'),
+    # Схема, хост, www./m./mobile., порт
+    ('http://example.org/people/jane', 'https://example.org/people/jane'),
+    ('https://WWW.Example.ORG/people/jane', 'https://example.org/people/jane'),
+    ('https://m.example.org/people/jane', 'https://example.org/people/jane'),
+    ('https://mobile.example.org/people/jane', 'https://example.org/people/jane'),
+    ('https://www.org/people', 'https://www.org/people'),
+    ('https://example.org:443/people/jane', 'https://example.org/people/jane'),
+    ('https://example.org:8443/people/jane', 'https://example.org:8443/people/jane'),
+    ('https://twitter.com/JaneDoe', 'https://x.com/janedoe'),
+    # Путь: фрагмент, слэши, index.html
+    ('https://example.org//people///jane/#contacts', 'https://example.org/people/jane'),
+    ('https://example.org/people/index.html', 'https://example.org/people'),
+    ('https://example.org/People/Jane', 'https://example.org/People/Jane'),
+    # Параметры отслеживания
+    ('https://example.org/page?utm_source=x&utm_medium=y&id=5', 'https://example.org/page?id=5'),
+    ('https://example.org/page?gclid=1&fbclid=2&msclkid=3&_ga=4', 'https://example.org/page'),
+    ('https://example.org/page?pk_campaign=a&mtm_source=b&hsa_acc=c&b=2&a=1', 'https://example.org/page?a=1&b=2'),
+    # ref и si удаляются только на хостах, где служат для отслеживания
+    ('https://example.org/search?ref=main&si=2', 'https://example.org/search?ref=main&si=2'),
+    ('https://open.spotify.com/show/abc?si=123', 'https://open.spotify.com/show/abc'),
+    ('https://www.amazon.com/dp/B000?ref=sr_1_1', 'https://amazon.com/dp/B000'),
+    ('https://www.producthunt.com/@jane?ref=header', 'https://producthunt.com/@jane'),
+    # Хосты с путем без учета регистра и значимыми параметрами
+    ('https://www.linkedin.com/in/Jane-Doe/?originalSubdomain=uk&trk=public', 'https://linkedin.com/in/jane-doe'),
+    ('https://uk.linkedin.com/in/Jane-Doe', 'https://uk.linkedin.com/in/jane-doe'),
+    ('https://github.com/JaneDoe?tab=repositories&ref=x', 'https://github.com/janedoe?tab=repositories'),
+    ('https://m.facebook.com/profile.php?id=100&ref=bookmarks', 'https://facebook.com/profile.php?id=100'),
+    ('https://www.instagram.com/JaneDoe/?igshid=abc', 'https://instagram.com/janedoe'),
+    ('https://www.youtube.com/watch?v=AbC123&feature=share&si=xyz', 'https://youtube.com/watch?v=AbC123'),
+    ('https://youtu.be/AbC123?si=xyz', 'https://youtube.com/watch?v=AbC123'),
+    ('https://scholar.google.com/citations?user=AbCd&hl=en', 'https://scholar.google.com/citations?user=AbCd'),
+    ('https://www.researchgate.net/profile/Jane-Doe', 'https://researchgate.net/profile/Jane-Doe'),
+    # Не HTTP и некорректные URL не изменяются
+    ('mailto:jane@example.org', 'mailto:jane@example.org'),
+    ('javascript:void(0)', 'javascript:void(0)'),
+    ('', ''),
+]
+
+# (исходный URL, ключ HTTP-кэша)
+CACHE_KEY_CASES = [
+    ('https://Example.org/page?utm_source=x&b=2&a=1#top', 'https://example.org/page?b=2&a=1'),
+    ('http://example.org', 'http://example.org/'),
+    ('https://www.example.org/people/Jane/', 'https://www.example.org/people/Jane/'),
+    ('https://github.com/org/repo/blob/main/README.md?ref=dev', 'https://github.com/org/repo/blob/main/README.md?ref=dev'),
+    ('https://www.youtube.com/watch?v=AbC123&si=xyz', 'https://www.youtube.com/watch?v=AbC123'),
+    ('https://example.org:8080/page', 'https://example.org:8080/page'),
+]
+
+
+class TestCanonicalizeUrl(unittest.TestCase):
+    """Тесты canonicalize_url"""
+
+    def test_canonical_cases(self):
+        """Тест таблицы исходных URL и канонических ключей"""
+        for url, expected in CANONICAL_CASES:
+            with self.subTest(url=url):
+                self.assertEqual(canonicalize_url(url), expected)
+
+    def test_idempotent(self):
+        """Тест повторной канонизации"""
+        for url, expected in CANONICAL_CASES:
+            with self.subTest(url=url):
+                self.assertEqual(canonicalize_url(expected), expected)
+
+    def test_unwrap_redirect(self):
+        """Тест разворачивания вложенных редиректов"""
+        inner = 'https://duckduckgo.com/l/?uddg=https%3A%2F%2Fexample.org%2Fjane'
+        outer = 'https://www.google.com/url?q=' + inner.replace('%', '%25').replace('?', '%3F').replace('=', '%3D')
+        self.assertEqual(unwrap_redirect(outer), 'https://example.org/jane')
+        self.assertEqual(unwrap_redirect('https://example.org/url?q=x'), 'https://example.org/url?q=x')
+
+
+class TestCacheKey(unittest.TestCase):
+    """Тесты cache_key"""
+
+    def test_cache_key_cases(self):
+        """Тест таблицы исходных URL и ключей кэша"""
+        for url, expected in CACHE_KEY_CASES:
+            with self.subTest(url=url):
+                self.assertEqual(cache_key(url), expected)
+
+
+class TestUrlDeduplicator(unittest.TestCase):
+    """Тесты UrlDeduplicator"""
+
+    def test_unique(self):
+        """Тест удаления дубликатов с учетом статистики"""
+        deduplicator = UrlDeduplicator()
+        urls = [url for url, _ in CANONICAL_CASES[:5]] + ['https://example.org/other']
+        self.assertEqual(deduplicator.unique(urls), [CANONICAL_CASES[0][0], 'https://example.org/other'])
+        self.assertEqual(deduplicator.get_stats(), {'urls': 4})
+        self.assertTrue(deduplicator.contains('http://www.example.org/people/jane/'))
+
+
+if __name__ == '__main__':
+    unittest.main()
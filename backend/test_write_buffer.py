@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Тесты буфера отложенной записи
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import unittest
+
+# Добавляем путь к модулям
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool, NullPool
+
+from database.models import Base, EmailProfile, SearchHistory
+from database.write_buffer import WriteBehindBuffer
+from modules.fulltext_index import fulltext_index, FullTextBackend
+
+
+class TestWriteBehindBuffer(unittest.TestCase):
+    """Тесты WriteBehindBuffer"""
+
+    def setUp(self):
+        # Сессии запросов - общее соединение (StaticPool), буфер - собственные соединения
+        self.tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{self.tmpdir.name}/buffer.sqlite"
+        self.request_engine = create_engine(url, poolclass=StaticPool,
+                                            connect_args={"check_same_thread": False})
+        self.buffer_engine = create_engine(url, poolclass=NullPool,
+                                           connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=self.request_engine)
+        self.request_session = sessionmaker(autoflush=False, bind=self.request_engine)
+        # Индекс без хранилища: тест не создает файлов индекса
+        self.backend, fulltext_index._backend = fulltext_index._backend, FullTextBackend()
+        self.buffer = WriteBehindBuffer(max_size=100, flush_interval=60,
+                                        session_factory=sessionmaker(bind=self.buffer_engine))
+
+    def tearDown(self):
+        fulltext_index.process_pending()
+        fulltext_index._backend = self.backend
+        self.request_engine.dispose()
+        self.buffer_engine.dispose()
+        self.tmpdir.cleanup()
+
+    def flush_during_request(self, db) -> int:
+        """Запись буфера в потоке, пока сессия запроса держит незафиксированные изменения"""
+        written = []
+        thread = threading.Thread(target=lambda: written.append(self.buffer.flush()))
+        thread.start()
+        time.sleep(0.2)
+        db.commit()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        return written[0]
+
+    def test_flush_batches_rows(self):
+        """Тест пакетной записи накопленных строк"""
+        for i in range(3):
+            self.buffer.add_search_history(f"user{i}@example.com", 'single', results_found=i)
+        self.buffer.add_api_usage('/api/search', 'POST', 200, 0.1)
+        self.assertEqual(self.buffer.pending_count(), 4)
+
+        self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(self.buffer.pending_count(), 0)
+        self.assertEqual(self.buffer.get_stats()['rows_written'], 4)
+
+        db = self.request_session()
+        try:
+            self.assertEqual(db.query(SearchHistory).count(), 3)
+        finally:
+            db.close()
+
+    def test_buffered_write_with_concurrent_request(self):
+        """Тест записи буфера во время незафиксированной транзакции запроса"""
+        db = self.request_session()
+        try:
+            db.add(EmailProfile(email='jane@example.com', data={}))
+            db.flush()
+            self.buffer.add_search_history('jane@example.com', 'single', results_found=1)
+
+            self.assertEqual(self.flush_during_request(db), 1)
+            self.assertEqual(db.query(EmailProfile).count(), 1)
+            self.assertEqual(db.query(SearchHistory).count(), 1)
+        finally:
+            db.close()
+
+    def test_failed_flush_keeps_request_changes(self):
+        """Тест отката неудачной записи буфера без потери изменений запроса"""
+        db = self.request_session()
+        try:
+            db.add(EmailProfile(email='jane@example.com', data={}))
+            db.flush()
+            # email NOT NULL: пакет буфера откатывается
+            self.buffer.add(SearchHistory, email=None, search_type='single')
+
+            self.assertEqual(self.flush_during_request(db), 0)
+            self.assertEqual(self.buffer.get_stats()['rows_dropped'], 1)
+        finally:
+            db.close()
+
+        db = self.request_session()
+        try:
+            self.assertEqual(db.query(EmailProfile).count(), 1)
+            self.assertEqual(db.query(SearchHistory).count(), 0)
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()